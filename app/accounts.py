@@ -0,0 +1,44 @@
+# app/accounts.py
+
+# Account administration, from the server's command line:
+#   python -m app.accounts deactivate s0@example.com
+#   python -m app.accounts reactivate s0@example.com
+#
+# Deliberately not an API route: anyone can sign up as a lecturer through
+# POST /users/, so "lecturers only" wouldn't stop a stranger from locking
+# students out. Until there is an admin role (or lecturer signup is gated),
+# whoever runs the server does this.
+#
+# A deactivated account can't log in, and its tokens stop working on every
+# worker within REVOCATION_REFRESH_SECONDS (see revocation.py). Reactivating
+# lets it log in again; tokens from before stay revoked.
+
+import sys
+
+from . import crud, database
+
+
+def set_active(email: str, active: bool):
+    """
+    Deactivates or reactivates the account with this email.
+    Returns the user, or None if there is no such account.
+    """
+    with database.SessionLocal() as db:
+        user = crud.get_user_by_email(db, email)
+        if user is None:
+            return None
+        if active:
+            return crud.reactivate_user(db, user)
+        return crud.deactivate_user(db, user)
+
+
+COMMANDS = {"deactivate": False, "reactivate": True}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in COMMANDS:
+        sys.exit("usage: python -m app.accounts deactivate|reactivate <email>")
+    command, email = sys.argv[1:]
+    if set_active(email, COMMANDS[command]) is None:
+        sys.exit(f"No account with email {email}")
+    print(f"{email}: {command}d")
@@ -0,0 +1,377 @@
+# app/admission.py
+
+# Admission control for submission uploads.
+#
+# Right before a deadline most of a cohort uploads at once. Instead of letting
+# every request stream its file and write to the database at the same time,
+# an upload has to get a slot first:
+#   - at most UPLOAD_MAX_CONCURRENT uploads run at once,
+#   - at most UPLOAD_MAX_PER_USER per student (running + waiting); beyond
+#     that the student gets a 429,
+#   - everyone else waits their turn in a first-come-first-served queue of
+#     UPLOAD_QUEUE_SIZE. A full queue, or a wait longer than
+#     UPLOAD_QUEUE_TIMEOUT_SECONDS, gets a 503. Both carry Retry-After.
+#
+# The time a request arrived is stamped before it waits (see arrival_time),
+# and the deadline check uses that. Waiting here never makes a submission late:
+#   - a 503 (turned away by the queue) carries an Upload-Arrival token with
+#     that time. A retry that sends it back (same student, same URL) keeps the
+#     original arrival time. The token expires UPLOAD_ARRIVAL_TOKEN_SECONDS
+#     after it was first issued; one re-issued to a retry keeps that expiry,
+#     so retrying can't stretch it. A 429 (the student's own uploads) gets none;
+#   - the body, though, has to have finished arriving within
+#     UPLOAD_BODY_GRACE_SECONDS of the deadline, or of the upload getting its
+#     slot if that was later (see received_too_late), so a file can't be
+#     trickled in for hours after starting just before the deadline. Either
+#     way nothing is taken more than UPLOAD_ARRIVAL_TOKEN_SECONDS +
+#     UPLOAD_BODY_GRACE_SECONDS after the deadline.
+#
+# The counts are per process ("local") unless ADMISSION_BACKEND="redis". Then
+# every worker shares them, and the local queue only decides who in this
+# worker asks next.
+
+import asyncio
+import collections
+import logging
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# The routes that need a slot: single-shot uploads, and completing a resumable one
+ADMITTED_ROUTES = [
+    ("POST", re.compile(r"^/submissions/\d+/?$")),
+    ("POST", re.compile(r"^/submissions/uploads/[^/]+/complete/?$")),
+]
+
+RETRY_AFTER_SECONDS = 5
+
+# How often the head of the queue asks a shared backend again
+# (slots freed by other workers don't wake us up)
+SHARED_POLL_SECONDS = 0.05
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LocalBackend:
+    """
+    Slot and per-user counts kept in this process. The default, and the
+    stand-in for the shared backend when there is only one worker.
+    """
+    shared = False
+
+    def __init__(self):
+        self._running = 0
+        self._users = {}
+
+    async def enter(self, user_key: str, limit: int) -> bool:
+        if limit and self._users.get(user_key, 0) >= limit:
+            return False
+        self._users[user_key] = self._users.get(user_key, 0) + 1
+        return True
+
+    async def leave(self, user_key: str):
+        count = self._users.get(user_key, 0) - 1
+        if count > 0:
+            self._users[user_key] = count
+        else:
+            self._users.pop(user_key, None)
+
+    async def try_acquire(self, limit: int):
+        if limit and self._running >= limit:
+            return None
+        self._running += 1
+        return True
+
+    async def release(self, token):
+        self._running -= 1
+
+
+class RedisBackend:
+    """
+    The same counts in Redis, shared by every worker. Slots are leases that
+    expire after ADMISSION_LEASE_SECONDS, so a worker that dies holding
+    some doesn't shrink the pool for good.
+    """
+    shared = True
+
+    # KEYS[1] user counter; ARGV limit, ttl
+    _ENTER = """
+    local count = redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    if tonumber(ARGV[1]) > 0 and count > tonumber(ARGV[1]) then
+        redis.call('DECR', KEYS[1])
+        return 0
+    end
+    return 1
+    """
+    # KEYS[1] sorted set of leases (score = expiry); ARGV limit, now, expiry, token
+    _ACQUIRE = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+    if tonumber(ARGV[1]) > 0 and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    return 1
+    """
+
+    def __init__(self, url: str, lease_seconds: int, prefix: str = "admission:uploads"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError('ADMISSION_BACKEND="redis" needs the redis package (pip install redis)')
+        self._redis = redis.from_url(url)
+        self._lease_seconds = lease_seconds
+        self._slots_key = f"{prefix}:slots"
+        self._user_prefix = f"{prefix}:user:"
+        self._enter = self._redis.register_script(self._ENTER)
+        self._acquire = self._redis.register_script(self._ACQUIRE)
+
+    async def enter(self, user_key: str, limit: int) -> bool:
+        return bool(await self._enter(keys=[self._user_prefix + user_key], args=[limit, self._lease_seconds]))
+
+    async def leave(self, user_key: str):
+        await self._redis.decr(self._user_prefix + user_key)
+
+    async def try_acquire(self, limit: int):
+        token = uuid.uuid4().hex
+        now = time.time()
+        admitted = await self._acquire(
+            keys=[self._slots_key], args=[limit, now, now + self._lease_seconds, token]
+        )
+        return token if admitted else None
+
+    async def release(self, token):
+        await self._redis.zrem(self._slots_key, token)
+
+
+class AdmissionController:
+    """
+    Hands out upload slots in arrival order (see the top of this file).
+    Only the request at the head of the queue asks the backend for a slot,
+    so nobody overtakes anyone who arrived earlier.
+    """
+
+    def __init__(self, backend, max_concurrent: int, max_per_user: int, queue_size: int, queue_timeout: float):
+        self.backend = backend
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._waiters = collections.deque()  # one asyncio.Event per waiting request
+        self._counts = {"admitted": 0, "running": 0, "rejected_user_limit": 0, "rejected_queue_full": 0, "timed_out": 0}
+
+    async def acquire(self, user_key: str):
+        """
+        Waits for a slot. Returns a lease for release(), or raises AdmissionRejected.
+        """
+        if not await self.backend.enter(user_key, self.max_per_user):
+            self._counts["rejected_user_limit"] += 1
+            raise AdmissionRejected(429, "You already have an upload in progress. Try again when it has finished.")
+        try:
+            token = await self._acquire_slot()
+        except BaseException:
+            await self.backend.leave(user_key)
+            raise
+        self._counts["admitted"] += 1
+        self._counts["running"] += 1
+        return user_key, token
+
+    async def release(self, lease):
+        user_key, token = lease
+        self._counts["running"] -= 1
+        try:
+            await self.backend.release(token)
+            await self.backend.leave(user_key)
+        finally:
+            self._wake_head()
+
+    async def _acquire_slot(self):
+        # Nobody waiting here: straight in if a slot is free
+        if not self._waiters:
+            token = await self.backend.try_acquire(self.max_concurrent)
+            if token is not None:
+                return token
+        if len(self._waiters) >= self.queue_size:
+            self._counts["rejected_queue_full"] += 1
+            raise AdmissionRejected(503, "The server is busy with other uploads. Try again shortly.")
+
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.queue_timeout
+        turn = asyncio.Event()
+        self._waiters.append(turn)
+        try:
+            while True:
+                if self._waiters[0] is turn:
+                    token = await self.backend.try_acquire(self.max_concurrent)
+                    if token is not None:
+                        return token
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    self._counts["timed_out"] += 1
+                    raise AdmissionRejected(503, "Timed out waiting for an upload slot. Try again shortly.")
+                if self.backend.shared and self._waiters[0] is turn:
+                    remaining = min(remaining, SHARED_POLL_SECONDS)
+                turn.clear()
+                try:
+                    await asyncio.wait_for(turn.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.remove(turn)
+            # Whoever is next in line gets to ask now
+            self._wake_head()
+
+    def _wake_head(self):
+        if self._waiters:
+            self._waiters[0].set()
+
+    def stats(self) -> dict:
+        return {**self._counts, "waiting": len(self._waiters)}
+
+
+def _make_backend():
+    if settings.ADMISSION_BACKEND == "redis":
+        return RedisBackend(settings.ADMISSION_REDIS_URL, settings.ADMISSION_LEASE_SECONDS)
+    return LocalBackend()
+
+
+upload_admission = AdmissionController(
+    _make_backend(),
+    max_concurrent=settings.UPLOAD_MAX_CONCURRENT,
+    max_per_user=settings.UPLOAD_MAX_PER_USER,
+    queue_size=settings.UPLOAD_QUEUE_SIZE,
+    queue_timeout=settings.UPLOAD_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+def arrival_time(request) -> float:
+    """
+    When the request arrived (time.time()), stamped by AdmissionMiddleware
+    before any waiting. Now, for requests that didn't go through it.
+    """
+    return request.scope.get("state", {}).get("arrived_at") or time.time()
+
+
+def received_too_late(request, deadline: datetime | None) -> bool:
+    """
+    Whether the request body finished arriving (i.e. now, in the handler)
+    more than UPLOAD_BODY_GRACE_SECONDS after the deadline (naive UTC), or
+    after the upload got its slot if that was later.
+    """
+    if deadline is None:
+        return False
+    state = request.scope.get("state", {})
+    admitted = datetime.utcfromtimestamp(state.get("admitted_at") or arrival_time(request))
+    # However long the queue and its retries took, never past this
+    admitted = min(admitted, deadline + timedelta(seconds=settings.UPLOAD_ARRIVAL_TOKEN_SECONDS))
+    return datetime.utcnow() > max(deadline, admitted) + timedelta(seconds=settings.UPLOAD_BODY_GRACE_SECONDS)
+
+
+def arrival_token(user_key: str, path: str, arrived_at: float, expires_at: int = None) -> str:
+    """
+    Signed proof of when a turned-away request arrived, for its retry.
+    `expires_at` is the expiry of the token the request came with, if any.
+    """
+    return jwt.encode(
+        {
+            "arr": arrived_at,
+            "key": user_key,
+            "path": path,
+            "exp": expires_at or int(time.time()) + settings.UPLOAD_ARRIVAL_TOKEN_SECONDS,
+        },
+        settings.JWT_SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+
+def _presented_arrival(scope, user_key: str):
+    # (arrival time, expiry) from an Upload-Arrival token, if the request
+    # sent a valid one that was issued to this student for this URL
+    for name, value in scope.get("headers", ()):
+        if name == b"upload-arrival":
+            try:
+                claims = jwt.decode(value.decode("latin-1"), settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except JWTError:
+                return None, None
+            if claims.get("key") != user_key or claims.get("path") != scope["path"]:
+                return None, None
+            arrived_at = claims.get("arr")
+            if isinstance(arrived_at, (int, float)) and arrived_at <= time.time():
+                return arrived_at, claims["exp"]
+            return None, None
+    return None, None
+
+
+def _user_key(scope) -> str:
+    # Who is uploading, from the bearer token without touching the database.
+    # Requests without a valid token are grouped by address; the route
+    # rejects them anyway once they are let in.
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+                except JWTError:
+                    break
+                user = payload.get("uid") or payload.get("sub")
+                if user:
+                    return f"user:{user}"
+            break
+    client = scope.get("client")
+    return f"addr:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI, so it runs before FastAPI reads the request body: a waiting
+    upload has not been read into memory or onto disk yet.
+    """
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or upload_admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            scope["method"] == method and pattern.match(scope["path"]) for method, pattern in ADMITTED_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        user_key = _user_key(scope)
+        state = scope.setdefault("state", {})
+        presented_at, token_expires_at = _presented_arrival(scope, user_key)
+        state["arrived_at"] = presented_at or time.time()
+        try:
+            lease = await self.controller.acquire(user_key)
+        except AdmissionRejected as e:
+            headers = {"Retry-After": str(RETRY_AFTER_SECONDS)}
+            if e.status_code == 503:
+                # Send it back on the retry to keep this arrival time. Only
+                # for waiting on the queue: a student over their own limit
+                # (429) isn't held up by us.
+                headers["Upload-Arrival"] = arrival_token(
+                    user_key, scope["path"], state["arrived_at"], expires_at=token_expires_at
+                )
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=headers)
+            await response(scope, receive, send)
+            return
+        state["admitted_at"] = time.time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.controller.release(lease)
@@ -1,14 +1,19 @@
 # app/auth.py
 
-import bcrypt
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from enum import Enum
+from typing import NamedTuple
 
-from . import database
+from . import database, models, schemas
+from .revocation import revocations
+from .cache import TTLCache
+from .hashing import PasswordPool, PasswordPoolBusy
 from .settings import settings
 
 class UserRole(str, Enum):
@@ -16,21 +21,35 @@ class UserRole(str, Enum):
     lecturer = "lecturer"
 
 # <--- 1. NEW HASHING LOGIC (Using bcrypt directly, NO passlib) ---
-def get_password_hash(password: str):
-    # Convert the password to bytes
-    pwd_bytes = password.encode('utf-8')
-    # Generate a salt and hash the password
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(pwd_bytes, salt)
-    # Return as a string for storage in the database
-    return hashed_password.decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str):
-    # Convert both to bytes for comparison
-    password_bytes = plain_password.encode('utf-8')
-    hashed_password_bytes = hashed_password.encode('utf-8')
-    # Check if they match
-    return bcrypt.checkpw(password_bytes, hashed_password_bytes)
+# All bcrypt work runs on its own pool, never on the request threadpool.
+password_pool = PasswordPool(
+    backend=settings.PASSWORD_POOL_BACKEND,
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_queue=settings.PASSWORD_POOL_MAX_QUEUE,
+    rounds=settings.BCRYPT_ROUNDS,
+)
+
+def _pool_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again.",
+        headers={"Retry-After": "1"},
+    )
+
+async def get_password_hash_async(password: str):
+    try:
+        return await password_pool.hash_async(password)
+    except PasswordPoolBusy:
+        raise _pool_busy_exception()
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    try:
+        return await password_pool.verify_async(plain_password, hashed_password)
+    except PasswordPoolBusy:
+        raise _pool_busy_exception()
+
+def password_needs_rehash(hashed_password: str):
+    return password_pool.needs_rehash(hashed_password)
 
 # <--- 2. TOKEN LOGIC (Standard JWT creation) ---
 def create_access_token(data: dict):
@@ -40,28 +59,103 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: models.User) -> dict:
+    # Everything get_current_principal needs, so most requests never load the user
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role.value if hasattr(user.role, "value") else user.role,
+        "tv": user.token_version or 0,
+    }
+
 # <--- 3. SECURITY GUARD (Validates the token) ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+# Authenticated users, keyed by the token subject (email).
+# We store a detached schemas.User snapshot, never the ORM object,
+# so a cached entry is safe to hand out to any request/session.
+user_cache = TTLCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    # Drop the cached copy whenever the user row changes.
+    # If the email itself changed, the old key has to go too.
+    user_cache.invalidate(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        user_cache.invalidate(old_email)
+
+def _credentials_exception(detail: str = "Could not validate credentials"):
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> dict:
+    """
+    The token's claims, once the signature and expiry check out and
+    it hasn't been revoked (see revocation.py).
+    """
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
     except Exception:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    # Tokens issued before "uid"/"tv" existed have no version to check;
+    # they are looked up in the database instead and expire soon enough
+    if "uid" in payload and revocations.is_revoked(payload["uid"], payload.get("tv", 0)):
+        raise _credentials_exception("Token has been revoked")
+    return payload
+
+class Principal(NamedTuple):
+    """
+    Who is calling, straight from the access token: enough for the
+    role and ownership checks most routes do, without a database read.
+    """
+    id: int
+    email: str
+    role: UserRole
+    token_version: int
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    payload = _decode_token(token)
+    if "uid" not in payload:
+        user = await run_in_threadpool(_load_user, payload["sub"])
+        return Principal(user.id, user.email, UserRole(user.role), 0)
+    try:
+        return Principal(payload["uid"], payload["sub"], UserRole(payload["role"]), payload.get("tv", 0))
+    except (KeyError, ValueError):
+        raise _credentials_exception()
+
+def _load_user(email: str, db: Session = None):
+    cached_user = user_cache.get(email)
+    if cached_user is not None:
+        return cached_user
+
     # Import crud here to avoid circular imports
-    from . import crud 
-    user = crud.get_user_by_email(db, email=email)
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+    from . import crud
+    if db is None:
+        with database.SessionLocal() as db:
+            user = crud.get_user_by_email(db, email=email)
+    else:
+        user = crud.get_user_by_email(db, email=email)
+    if user is None or user.is_active is False:
+        raise _credentials_exception()
+
+    current_user = schemas.User.model_validate(user)
+    user_cache.set(email, current_user)
+    return current_user
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    """
+    The full user record, for routes that need more than get_current_principal gives.
+    """
+    payload = _decode_token(token)
+    return _load_user(payload["sub"], db)
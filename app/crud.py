@@ -1,70 +1,333 @@
 # app/crud.py
 
+from datetime import datetime
+from sqlalchemy import case, delete, func, literal, select, update
 from sqlalchemy.orm import Session
-from . import models, schemas, auth # Import our new auth file
-from .models import UserRole
+from . import models, schemas, etags, gradebook, jobs
+from .revocation import revocations
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_user_by_reg_number(db: Session, reg_number: str):
-    return db.query(models.User).filter(models.User.reg_number == reg_number).first()
-
-def create_user(db: Session, user: schemas.UserCreate):
-    
-    # Get the hashed password
-    hashed_password = auth.get_password_hash(user.password)
-    
-    # Get the validated role from the schema
-    # (The validator already converted it to lowercase and an Enum)
-    validated_role = user.role 
-    
-    db_user = models.User(
-        email=user.email,
-        full_name=user.full_name,
-        reg_number=user.reg_number,
-        hashed_password=hashed_password,
-        role=validated_role
-    )
-    
-    db.add(db_user)
+def revoke_user_tokens(user: models.User):
+    """
+    Makes every access token issued to `user` so far invalid (see revocation.py).
+    Call revocation.revocations.add(user.id, user.token_version) once committed.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    user.tokens_revoked_at = datetime.utcnow()
+
+def deactivate_user(db: Session, user: models.User):
+    # The account can't log in any more, and its tokens stop working
+    user.is_active = False
+    revoke_user_tokens(user)
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    revocations.add(user.id, user.token_version)
+    return user
+
+def reactivate_user(db: Session, user: models.User):
+    # Tokens from before the deactivation stay revoked; they log in again
+    user.is_active = True
+    db.commit()
+    return user
+
+def _schema_columns(model, schema):
+    """
+    The model's columns for every field of an output schema. select(*these)
+    gives plain rows with exactly the response's keys, without building ORM
+    objects (see responses.rows_response).
+    """
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _split_page(rows, limit: int):
+    # We fetch one extra row just to know whether another page exists
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+# app/crud.py
+
+def _insert_for(dialect_name: str):
+    """
+    The dialect's INSERT construct that supports ON CONFLICT, or None.
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+def cache_version_bump_statement(dialect_name: str, scopes: list):
+    """
+    One INSERT ... ON CONFLICT (scope) DO UPDATE that bumps every scope's
+    version (creating it at 1), or None if the dialect can't do it.
+    """
+    insert = _insert_for(dialect_name)
+    if insert is None:
+        return None
+
+    now = datetime.utcnow()
+    # Sorted and de-duplicated: Postgres refuses to touch one row twice in a
+    # statement, and a fixed order keeps concurrent bumps from deadlocking
+    stmt = insert(models.CacheVersion).values(
+        [{"scope": scope, "version": 1, "updated_at": now} for scope in sorted(set(scopes))]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[models.CacheVersion.scope],
+        set_={"version": models.CacheVersion.version + 1, "updated_at": stmt.excluded.updated_at},
+    )
+
+def bump_cache_versions(db: Session, scopes: list):
+    """
+    Marks these resources as changed (see etags.py). Runs in the caller's
+    transaction, so the caller's commit publishes the data and the new
+    version together.
+    """
+    stmt = cache_version_bump_statement(db.get_bind().dialect.name, scopes)
+    if stmt is None:
+        return _bump_cache_versions_fallback(db, scopes)
+    db.execute(stmt)
+
+def _bump_cache_versions_fallback(db: Session, scopes: list):
+    now = datetime.utcnow()
+    for scope in sorted(set(scopes)):
+        result = db.execute(
+            update(models.CacheVersion)
+            .where(models.CacheVersion.scope == scope)
+            .values(version=models.CacheVersion.version + 1, updated_at=now)
+        )
+        if not result.rowcount:
+            db.execute(models.CacheVersion.__table__.insert().values(scope=scope, version=1, updated_at=now))
 
-def create_assignment(db: Session, assignment: schemas.AssignmentCreate, user_id: int):
+def get_cache_version(db: Session, scope: str):
     """
-    Creates a new assignment linked to a specific lecturer (user_id).
+    (version, updated_at) for a scope, or None if it was never bumped.
     """
-    db_assignment = models.Assignment(
-        title=assignment.title,
-        description=assignment.description,
-        lecturer_id=user_id  # Link it to the lecturer who is logged in
+    return db.execute(
+        select(models.CacheVersion.version, models.CacheVersion.updated_at)
+        .where(models.CacheVersion.scope == scope)
+    ).first()
+
+def submission_upsert_statement(
+    dialect_name: str,
+    submission: schemas.SubmissionCreate,
+    user_id: int,
+    assignment_id: int,
+    update_existing: bool = True,
+    submitted_at: datetime | None = None,
+):
+    """
+    INSERT ... ON CONFLICT (student_id, assignment_id) DO UPDATE ... RETURNING
+    for the given dialect, or None if the dialect can't do it.
+    With update_existing=False it is ON CONFLICT DO NOTHING instead, which
+    returns no row if the submission already exists.
+    submitted_at defaults to now (see admission.arrival_time).
+    Used by crud_async.create_submission.
+    """
+    insert = _insert_for(dialect_name)
+    if insert is None:
+        return None
+
+    values = submission.dict()
+    stmt = insert(models.Submission).values(
+        **values,
+        student_id=user_id,
+        assignment_id=assignment_id,
+        submitted_at=submitted_at or datetime.utcnow(),
     )
-    db.add(db_assignment)
+    if not update_existing:
+        return stmt.on_conflict_do_nothing(
+            index_elements=[models.Submission.student_id, models.Submission.assignment_id],
+        ).returning(models.Submission)
+    return stmt.on_conflict_do_update(
+        index_elements=[models.Submission.student_id, models.Submission.assignment_id],
+        set_={
+            **{field: stmt.excluded[field] for field in values},
+            # Reset grade/feedback since it's a new file
+            "grade": None,
+            "feedback": None,
+            # ...and process it again (see jobs.py)
+            "processing_status": jobs.PENDING,
+            "content_type": None,
+        },
+    ).returning(models.Submission)
+
+def assignment_stats_statements(dialect_name: str, change: gradebook.StatsChange):
+    """
+    The INSERT ... ON CONFLICT DO UPDATE statements that add a StatsChange
+    to assignment_stats and assignment_grade_counts (at most one each), or
+    None if the dialect can't do it. Relative updates ("count = count + n"),
+    so writers touching the same assignment never overwrite each other.
+    """
+    insert = _insert_for(dialect_name)
+    if insert is None:
+        return None
+
+    statements = []
+    counter_rows = change.counter_rows()
+    if counter_rows:
+        now = datetime.utcnow()
+        stmt = insert(models.AssignmentStats).values([{**row, "updated_at": now} for row in counter_rows])
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[models.AssignmentStats.assignment_id],
+            set_={
+                **{name: getattr(models.AssignmentStats, name) + stmt.excluded[name] for name in change.COUNTERS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ))
+    grade_rows = change.grade_rows()
+    if grade_rows:
+        stmt = insert(models.AssignmentGradeCount).values(grade_rows)
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[models.AssignmentGradeCount.assignment_id, models.AssignmentGradeCount.grade],
+            set_={"count": models.AssignmentGradeCount.count + stmt.excluded["count"]},
+        ))
+    return statements
+
+def apply_stats_change(db: Session, change: gradebook.StatsChange):
+    """
+    Adds a StatsChange to the gradebook tables, in the caller's transaction.
+    """
+    statements = assignment_stats_statements(db.get_bind().dialect.name, change)
+    if statements is None:
+        return _apply_stats_change_fallback(db, change)
+    for stmt in statements:
+        db.execute(stmt)
+
+def _apply_stats_change_fallback(db: Session, change: gradebook.StatsChange):
+    now = datetime.utcnow()
+    stats, counts = models.AssignmentStats, models.AssignmentGradeCount
+    for row in change.counter_rows():
+        result = db.execute(
+            update(stats)
+            .where(stats.assignment_id == row["assignment_id"])
+            .values(**{name: getattr(stats, name) + row[name] for name in change.COUNTERS}, updated_at=now)
+        )
+        if not result.rowcount:
+            db.execute(stats.__table__.insert().values(**row, updated_at=now))
+    for row in change.grade_rows():
+        result = db.execute(
+            update(counts)
+            .where(counts.assignment_id == row["assignment_id"], counts.grade == row["grade"])
+            .values(count=counts.count + row["count"])
+        )
+        if not result.rowcount:
+            db.execute(counts.__table__.insert().values(**row))
+
+def rebuild_assignment_stats(db: Session, assignment_id: int | None = None):
+    """
+    Recomputes the gradebook tables from the submissions table, for one
+    assignment or all of them. For repairs, and after bulk loads that
+    write submissions without going through crud.
+    """
+    s, a = models.Submission, models.Assignment
+    stats, counts = models.AssignmentStats, models.AssignmentGradeCount
+    clear_stats, clear_counts = delete(stats), delete(counts)
+    totals = (
+        select(
+            s.assignment_id,
+            func.count(),
+            func.count(s.grade),
+            func.coalesce(func.sum(s.grade), 0),
+            func.coalesce(func.sum(case((s.submitted_at > a.deadline, 1), else_=0)), 0),
+            literal(datetime.utcnow()),
+        )
+        .join(a, a.id == s.assignment_id)
+        .group_by(s.assignment_id)
+    )
+    grades = (
+        select(s.assignment_id, s.grade, func.count())
+        .where(s.grade.isnot(None), s.assignment_id.isnot(None))
+        .group_by(s.assignment_id, s.grade)
+    )
+    if assignment_id is not None:
+        clear_stats = clear_stats.where(stats.assignment_id == assignment_id)
+        clear_counts = clear_counts.where(counts.assignment_id == assignment_id)
+        totals = totals.where(s.assignment_id == assignment_id)
+        grades = grades.where(s.assignment_id == assignment_id)
+
+    db.execute(clear_stats)
+    db.execute(clear_counts)
+    db.execute(stats.__table__.insert().from_select(
+        ["assignment_id", "submission_count", "graded_count", "grade_sum", "late_count", "updated_at"], totals
+    ))
+    db.execute(counts.__table__.insert().from_select(["assignment_id", "grade", "count"], grades))
     db.commit()
-    db.refresh(db_assignment)
-    return db_assignment
 
-def get_assignments(db: Session):
-    return db.query(models.Assignment).all()
+def processing_job_statement(submission_id: int, checksum: str | None):
+    """
+    INSERT of a pending submission_jobs row: queues the file for the
+    background pipeline (see jobs.py). Run it in the same transaction as the
+    write it belongs to; jobs.notify() once that has committed.
+    """
+    now = datetime.utcnow()
+    return models.SubmissionJob.__table__.insert().values(
+        submission_id=submission_id, checksum=checksum, status=jobs.PENDING, attempts=0, run_after=now, created_at=now,
+    )
 
-# app/crud.py
+def submission_state_statement(user_id: int, assignment_id: int):
+    """
+    SELECT the student's current grade and submitted_at for an assignment,
+    locking the row until commit (FOR UPDATE; SQLite serializes writers anyway).
+    What the gradebook needs to know about the submission being replaced.
+    """
+    return (
+        select(models.Submission.grade, models.Submission.submitted_at)
+        .where(
+            models.Submission.student_id == user_id,
+            models.Submission.assignment_id == assignment_id,
+        )
+        .with_for_update()
+    )
+
+def submission_stats_change(assignment_id: int, old, new_submission, deadline: datetime | None):
+    """
+    The gradebook change for replacing `old` (a submission_state_statement
+    row, or None for a first submission) with `new_submission`, which is ungraded.
+    """
+    change = gradebook.StatsChange()
+    change.add(
+        assignment_id,
+        old_grade=old.grade if old else None,
+        old_late=gradebook.is_late(old.submitted_at, deadline) if old else False,
+        new_late=gradebook.is_late(new_submission.submitted_at, deadline),
+        new_submission=old is None,
+    )
+    return change
 
-def create_submission(db: Session, submission: schemas.SubmissionCreate, user_id: int, assignment_id: int):
+def _create_submission_fallback(
+    db: Session,
+    submission: schemas.SubmissionCreate,
+    user_id: int,
+    assignment_id: int,
+    deadline: datetime | None = None,
+    submitted_at: datetime | None = None,
+):
+    # For databases without ON CONFLICT: the original select-then-write
     # 1. Check if submission already exists
-    existing_submission = db.query(models.Submission).filter(
-        models.Submission.student_id == user_id,
-        models.Submission.assignment_id == assignment_id
-    ).first()
+    existing_submission = get_student_submission(db, student_id=user_id, assignment_id=assignment_id)
+    bump_cache_versions(db, [etags.submission_scope(user_id, assignment_id)])
 
     if existing_submission:
-        # 2. UPDATE existing
-        existing_submission.file_path = submission.file_path
+        change = gradebook.StatsChange()
+        late = gradebook.is_late(existing_submission.submitted_at, deadline)
+        change.add(assignment_id, old_grade=existing_submission.grade, old_late=late, new_late=late)
+        apply_stats_change(db, change)
+
+        # 2. UPDATE existing (file_path, file_size, checksum)
+        for field, value in submission.dict().items():
+            setattr(existing_submission, field, value)
         # Reset grade/feedback since it's a new file
         existing_submission.grade = None 
         existing_submission.feedback = None
+        existing_submission.processing_status = jobs.PENDING
+        existing_submission.content_type = None
+        db.execute(processing_job_statement(existing_submission.id, existing_submission.checksum))
         db.commit()
+        jobs.notify()
         db.refresh(existing_submission)
         return existing_submission
     else:
@@ -72,32 +335,30 @@ def create_submission(db: Session, submission: schemas.SubmissionCreate, user_id
         db_submission = models.Submission(
             **submission.dict(), 
             student_id=user_id, 
-            assignment_id=assignment_id
+            assignment_id=assignment_id,
+            submitted_at=submitted_at or datetime.utcnow(),
         )
         db.add(db_submission)
+        apply_stats_change(db, submission_stats_change(assignment_id, None, db_submission, deadline))
+        db.flush()
+        db.execute(processing_job_statement(db_submission.id, db_submission.checksum))
         db.commit()
+        jobs.notify()
         db.refresh(db_submission)
         return db_submission
 
-def grade_submission(db: Session, submission_id: int, grade_data: schemas.SubmissionGrade):
+def get_submissions_for_export(db: Session, assignment_id: int):
     """
-    Updates a submission with a grade and feedback.
+    Every submission for an assignment with its student, as (Submission, User)
+    rows in one joined query, ordered by reg number (see exports.py).
     """
-    # 1. Find the submission
-    db_submission = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
-    
-    # 2. Update the fields
-    if db_submission:
-        db_submission.grade = grade_data.grade
-        db_submission.feedback = grade_data.feedback
-        db.commit()
-        db.refresh(db_submission)
-        
-    return db_submission
-
-# To list submissions for a Lecturer
-def get_submissions_by_assignment(db: Session, assignment_id: int):
-    return db.query(models.Submission).filter(models.Submission.assignment_id == assignment_id).all()
+    return (
+        db.query(models.Submission, models.User)
+        .join(models.User, models.User.id == models.Submission.student_id)
+        .filter(models.Submission.assignment_id == assignment_id)
+        .order_by(models.User.reg_number, models.Submission.id)
+        .all()
+    )
 
 def get_student_submission(db: Session, student_id: int, assignment_id: int):
     return db.query(models.Submission).filter(
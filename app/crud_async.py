@@ -0,0 +1,320 @@
+# app/crud_async.py
+
+# The database functions the async routes use. They take an AsyncSession
+# (database.get_async_db) and must be awaited. The statements and the
+# gradebook/cache bookkeeping they share with the sync code paths (jobs,
+# roster, the non-ON CONFLICT fallbacks) are built in crud.py, so there is
+# one copy of each write.
+
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas, crud, auth, etags, gradebook, jobs, revocation
+
+# What the list endpoints select: just the columns their schema needs
+ASSIGNMENT_COLUMNS = crud._schema_columns(models.Assignment, schemas.Assignment)
+SUBMISSION_COLUMNS = crud._schema_columns(models.Submission, schemas.Submission)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email).limit(1))
+
+async def get_user_by_reg_number(db: AsyncSession, reg_number: str):
+    return await db.scalar(select(models.User).where(models.User.reg_number == reg_number).limit(1))
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # bcrypt runs on the password pool; we just await it
+    hashed_password = await auth.get_password_hash_async(user.password)
+    db_user = models.User(
+        email=user.email,
+        full_name=user.full_name,
+        reg_number=user.reg_number,
+        hashed_password=hashed_password,
+        role=user.role
+    )
+    db.add(db_user)
+    await db.commit()
+    return db_user
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def change_password(db: AsyncSession, user: models.User, new_password: str):
+    # Tokens issued with the old password stop working (see revocation.py)
+    user.hashed_password = await auth.get_password_hash_async(new_password)
+    crud.revoke_user_tokens(user)
+    await db.commit()
+    revocation.revocations.add(user.id, user.token_version)
+    return user
+
+async def create_assignment(db: AsyncSession, assignment: schemas.AssignmentCreate, user_id: int):
+    db_assignment = models.Assignment(**assignment.dict(), lecturer_id=user_id)
+    db.add(db_assignment)
+    await bump_cache_versions(db, etags.assignment_scopes(user_id))
+    await db.commit()
+    return db_assignment
+
+async def get_assignment(db: AsyncSession, assignment_id: int):
+    return await db.get(models.Assignment, assignment_id)
+
+async def bump_cache_versions(db: AsyncSession, scopes: list):
+    """
+    See crud.bump_cache_versions (runs in the caller's transaction).
+    """
+    stmt = crud.cache_version_bump_statement(db.bind.dialect.name, scopes)
+    if stmt is None:
+        return await db.run_sync(crud._bump_cache_versions_fallback, scopes)
+    await db.execute(stmt)
+
+async def get_cache_version(db: AsyncSession, scope: str):
+    return (await db.execute(
+        select(models.CacheVersion.version, models.CacheVersion.updated_at)
+        .where(models.CacheVersion.scope == scope)
+    )).first()
+
+async def get_assignments(
+    db: AsyncSession,
+    lecturer_id: int | None = None,
+    deadline_after: datetime | None = None,
+    deadline_before: datetime | None = None,
+    cursor: int | None = None,
+    limit: int = 50,
+):
+    """
+    Lists assignments page by page (keyset on id), optionally filtered.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    The rows are plain rows of ASSIGNMENT_COLUMNS, not ORM objects.
+    """
+    stmt = select(*ASSIGNMENT_COLUMNS)
+    if lecturer_id is not None:
+        stmt = stmt.where(models.Assignment.lecturer_id == lecturer_id)
+    if deadline_after is not None:
+        stmt = stmt.where(models.Assignment.deadline >= deadline_after)
+    if deadline_before is not None:
+        stmt = stmt.where(models.Assignment.deadline <= deadline_before)
+    if cursor is not None:
+        stmt = stmt.where(models.Assignment.id > cursor)
+    rows = (await db.execute(stmt.order_by(models.Assignment.id).limit(limit + 1))).all()
+    return crud._split_page(rows, limit)
+
+async def create_submission(
+    db: AsyncSession,
+    submission: schemas.SubmissionCreate,
+    user_id: int,
+    assignment_id: int,
+    deadline: datetime | None = None,
+    submitted_at: datetime | None = None,
+):
+    """
+    Creates the student's submission for an assignment, or replaces the file
+    on the one they already have (resetting grade/feedback).
+    submitted_at: when the upload arrived (UTC), if not now.
+
+    On Postgres and SQLite the write is a single INSERT ... ON CONFLICT
+    ... RETURNING against the (student_id, assignment_id) unique constraint,
+    so it is safe under concurrent resubmits. The row is locked and read
+    first so the gradebook totals can be updated (deadline: the
+    assignment's, for the late count). The file is queued for background
+    processing in the same transaction (see jobs.py).
+    """
+    dialect_name = db.bind.dialect.name
+    if crud._insert_for(dialect_name) is None:
+        return await db.run_sync(
+            crud._create_submission_fallback, submission, user_id, assignment_id, deadline, submitted_at
+        )
+
+    old = (await db.execute(crud.submission_state_statement(user_id, assignment_id))).first()
+    db_submission = None
+    if old is None:
+        stmt = crud.submission_upsert_statement(
+            dialect_name, submission, user_id, assignment_id, update_existing=False, submitted_at=submitted_at
+        )
+        db_submission = (await db.scalars(stmt, execution_options={"populate_existing": True})).first()
+        if db_submission is None:
+            # A concurrent request inserted it first; replace that one
+            old = (await db.execute(crud.submission_state_statement(user_id, assignment_id))).first()
+    if db_submission is None:
+        stmt = crud.submission_upsert_statement(dialect_name, submission, user_id, assignment_id, submitted_at=submitted_at)
+        db_submission = (await db.scalars(stmt, execution_options={"populate_existing": True})).one()
+
+    await apply_stats_change(db, crud.submission_stats_change(assignment_id, old, db_submission, deadline))
+    await bump_cache_versions(db, [etags.submission_scope(user_id, assignment_id)])
+    await db.execute(crud.processing_job_statement(db_submission.id, db_submission.checksum))
+    await db.commit()
+    jobs.notify()
+    return db_submission
+
+async def apply_stats_change(db: AsyncSession, change: gradebook.StatsChange):
+    """
+    See crud.apply_stats_change (runs in the caller's transaction).
+    """
+    statements = crud.assignment_stats_statements(db.bind.dialect.name, change)
+    if statements is None:
+        return await db.run_sync(crud._apply_stats_change_fallback, change)
+    for stmt in statements:
+        await db.execute(stmt)
+
+async def get_submission_with_lecturer(db: AsyncSession, submission_id: int, for_update: bool = False):
+    """
+    The submission plus the id of the lecturer who owns its assignment,
+    in one query. Returns (submission, lecturer_id), or (None, None).
+    for_update=True locks the submission row until commit (before grading it).
+    """
+    stmt = (
+        select(models.Submission, models.Assignment.lecturer_id)
+        .join(models.Assignment, models.Assignment.id == models.Submission.assignment_id)
+        .where(models.Submission.id == submission_id)
+    )
+    if for_update:
+        stmt = stmt.with_for_update(of=models.Submission)
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+async def grade_submission(db: AsyncSession, submission_id: int, grade_data: schemas.SubmissionGrade):
+    """
+    Updates a submission with a grade and feedback.
+    (If the submission is already loaded in this session, finding it costs no
+    query; load it with get_submission_with_lecturer(for_update=True) so the
+    grade it replaces can't change underneath the gradebook.)
+    """
+    db_submission = await db.get(models.Submission, submission_id)
+    if db_submission:
+        change = gradebook.StatsChange()
+        change.add(db_submission.assignment_id, old_grade=db_submission.grade, new_grade=grade_data.grade)
+        await apply_stats_change(db, change)
+        db_submission.grade = grade_data.grade
+        db_submission.feedback = grade_data.feedback
+        await bump_cache_versions(db, [etags.submission_scope(db_submission.student_id, db_submission.assignment_id)])
+        await db.commit()
+    return db_submission
+
+async def grade_submissions_bulk(db: AsyncSession, items: list, lecturer_id: int):
+    """
+    Grades many submissions in one transaction.
+
+    Ownership of every submission is checked with one joined query, then all
+    the allowed grades are written with one executemany UPDATE. Returns a
+    per-item list of (submission_id, status) in the order given.
+    """
+    ids = {item.submission_id for item in items}
+    rows = (await db.execute(
+        select(
+            models.Submission.id,
+            models.Assignment.lecturer_id,
+            models.Submission.student_id,
+            models.Submission.assignment_id,
+            models.Submission.grade,
+        )
+        .join(models.Assignment, models.Assignment.id == models.Submission.assignment_id)
+        .where(models.Submission.id.in_(ids))
+        .with_for_update(of=models.Submission)
+    )).all()
+    owners = {row.id: row.lecturer_id for row in rows}
+    by_id = {row.id: row for row in rows}
+
+    results = []
+    updates = []
+    seen = set()
+    for item in items:
+        if item.submission_id in seen:
+            status = "duplicate"
+        elif item.submission_id not in owners:
+            status = "not_found"
+        elif owners[item.submission_id] != lecturer_id:
+            status = "forbidden"
+        else:
+            status = "graded"
+            updates.append({"id": item.submission_id, "grade": item.grade, "feedback": item.feedback})
+        seen.add(item.submission_id)
+        results.append((item.submission_id, status))
+
+    if updates:
+        change = gradebook.StatsChange()
+        for u in updates:
+            row = by_id[u["id"]]
+            change.add(row.assignment_id, old_grade=row.grade, new_grade=u["grade"])
+        await db.execute(update(models.Submission), updates)
+        await apply_stats_change(db, change)
+        await bump_cache_versions(
+            db, [etags.submission_scope(by_id[u["id"]].student_id, by_id[u["id"]].assignment_id) for u in updates]
+        )
+        await db.commit()
+    return results
+
+# To list submissions for a Lecturer
+async def get_submissions_by_assignment(
+    db: AsyncSession,
+    assignment_id: int,
+    graded: bool | None = None,
+    cursor: int | None = None,
+    limit: int = 50,
+):
+    """
+    Lists an assignment's submissions page by page (keyset on id).
+    graded=True/False keeps only graded/ungraded ones.
+    Returns plain rows of SUBMISSION_COLUMNS rather than ORM objects.
+    """
+    stmt = select(*SUBMISSION_COLUMNS).where(models.Submission.assignment_id == assignment_id)
+    if graded is True:
+        stmt = stmt.where(models.Submission.grade.isnot(None))
+    elif graded is False:
+        stmt = stmt.where(models.Submission.grade.is_(None))
+    if cursor is not None:
+        stmt = stmt.where(models.Submission.id > cursor)
+    rows = (await db.execute(stmt.order_by(models.Submission.id).limit(limit + 1))).all()
+    return crud._split_page(rows, limit)
+
+async def get_student_submission(db: AsyncSession, student_id: int, assignment_id: int):
+    return await db.scalar(
+        select(models.Submission).where(
+            models.Submission.student_id == student_id,
+            models.Submission.assignment_id == assignment_id
+        ).limit(1)
+    )
+
+# --- Gradebook (read from the summary tables, never from submissions) ---
+
+STATS_COLUMNS = [getattr(models.AssignmentStats, name) for name in gradebook.StatsChange.COUNTERS]
+
+async def get_assignment_stats(db: AsyncSession, assignment_id: int):
+    """
+    (counters, {grade: count}) for one assignment; counters is None if
+    nothing was submitted yet.
+    """
+    totals = (await db.execute(
+        select(*STATS_COLUMNS).where(models.AssignmentStats.assignment_id == assignment_id)
+    )).first()
+    grades = (await db.execute(
+        select(models.AssignmentGradeCount.grade, models.AssignmentGradeCount.count)
+        .where(models.AssignmentGradeCount.assignment_id == assignment_id, models.AssignmentGradeCount.count > 0)
+    )).all()
+    return (totals._mapping if totals else None), {row.grade: row.count for row in grades}
+
+async def get_lecturer_stats(db: AsyncSession, lecturer_id: int):
+    """
+    Every assignment of the lecturer with its counters (None where nothing
+    was submitted), ordered by id, plus {assignment_id: {grade: count}}.
+    """
+    assignments = (await db.execute(
+        select(models.Assignment.id, models.Assignment.title, models.Assignment.deadline, *STATS_COLUMNS)
+        .outerjoin(models.AssignmentStats, models.AssignmentStats.assignment_id == models.Assignment.id)
+        .where(models.Assignment.lecturer_id == lecturer_id)
+        .order_by(models.Assignment.id)
+    )).all()
+    grades = (await db.execute(
+        select(models.AssignmentGradeCount.assignment_id, models.AssignmentGradeCount.grade, models.AssignmentGradeCount.count)
+        .join(models.Assignment, models.Assignment.id == models.AssignmentGradeCount.assignment_id)
+        .where(models.Assignment.lecturer_id == lecturer_id, models.AssignmentGradeCount.count > 0)
+    )).all()
+    grade_counts = {}
+    for row in grades:
+        grade_counts.setdefault(row.assignment_id, {})[row.grade] = row.count
+    return assignments, grade_counts
+
+async def count_active_students(db: AsyncSession) -> int:
+    return await db.scalar(
+        select(func.count()).select_from(models.User).where(
+            models.User.role == models.UserRole.student, models.User.is_active.is_(True)
+        )
+    )
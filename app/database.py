@@ -1,26 +1,242 @@
 # app/database.py
 
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from .settings import settings  # Import our settings object
 
-# 1. The Engine
-# This is the main connection point to our database.
-# It uses the DATABASE_URL from our settings.py file.
-engine = create_engine(
-    settings.DATABASE_URL
-)
-
-# 2. The Session
-# This creates a "session factory". Think of it as a
-# template for creating new database sessions (conversations)
-# Each API request will get its own session.
-SessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine
-)
+
+class PoolWaitStats:
+    """
+    How long requests waited to get a connection out of an engine's pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+def _timed_pool_class(stats: PoolWaitStats, base=QueuePool):
+    # A QueuePool that times every checkout. It's a subclass per engine so
+    # the pool SQLAlchemy rebuilds on dispose() keeps reporting to `stats`.
+    class TimedQueuePool(base):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                connection = super().connect()
+            except PoolTimeoutError:
+                stats.observe(time.perf_counter() - start, timed_out=True)
+                raise
+            stats.observe(time.perf_counter() - start)
+            return connection
+
+    return TimedQueuePool
+
+
+def _engine_kwargs(url: str, stats: PoolWaitStats, is_async: bool = False):
+    """
+    create_engine() arguments for the pool settings in Settings.
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool.
+    """
+    parsed = make_url(url)
+    kwargs = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return kwargs
+
+    kwargs.update(
+        poolclass=_timed_pool_class(stats, AsyncAdaptedQueuePool if is_async else QueuePool),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if parsed.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        # Sent to the server on connect; a runaway query is cancelled after this long
+        if is_async:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return kwargs
+
+
+def _create_engine(url: str, stats: PoolWaitStats):
+    return create_engine(url, **_engine_kwargs(url, stats))
+
+
+# Sync driver -> the async driver for the same database
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def _async_url(url: str):
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {parsed.get_backend_name()!r}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _create_async_engine(url: str, stats: PoolWaitStats):
+    return create_async_engine(url, **_engine_kwargs(url, stats, is_async=True))
+
+
+# 1. The Engines and Sessions
+# Created on first use (or by init_engines() in main.py's lifespan), not at
+# import: importing the app never touches the database, and with
+# `gunicorn --preload` no pool is made in the master and shared by the
+# forked workers. `database.engine`, `database.SessionLocal` etc. work as
+# before; the first access builds everything below.
+#
+#   engine / SessionLocal                      the primary (DATABASE_URL)
+#   replica_engine / ReadSessionLocal          read-only routes (see get_read_db);
+#                                              the primary without DATABASE_REPLICA_URL
+#   async_engine / AsyncSessionLocal           the same databases through an async
+#   async_replica_engine / AsyncReadSessionLocal  driver (asyncpg/aiosqlite)
+#
+# Pool sizing, pre-ping and timeouts come from settings. The async sessions
+# have expire_on_commit=False because an async session can't lazily reload
+# attributes while the response is built.
+_LAZY_NAMES = {
+    "engine", "replica_engine", "async_engine", "async_replica_engine",
+    "SessionLocal", "ReadSessionLocal", "AsyncSessionLocal", "AsyncReadSessionLocal",
+    "primary_wait_stats", "replica_wait_stats", "async_wait_stats", "async_replica_wait_stats",
+}
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def init_engines() -> dict:
+    """
+    Creates the engines and session factories, once per process.
+    Nothing connects yet (see warm_up).
+    """
+    if _engines:
+        return _engines
+    with _engines_lock:
+        if _engines:
+            return _engines
+        made = {}
+        made["primary_wait_stats"] = PoolWaitStats()
+        made["engine"] = _create_engine(settings.DATABASE_URL, made["primary_wait_stats"])
+        if settings.DATABASE_REPLICA_URL:
+            made["replica_wait_stats"] = PoolWaitStats()
+            made["replica_engine"] = _create_engine(settings.DATABASE_REPLICA_URL, made["replica_wait_stats"])
+        else:
+            made["replica_wait_stats"] = made["primary_wait_stats"]
+            made["replica_engine"] = made["engine"]
+
+        made["async_wait_stats"] = PoolWaitStats()
+        made["async_engine"] = _create_async_engine(
+            settings.ASYNC_DATABASE_URL or _async_url(settings.DATABASE_URL), made["async_wait_stats"]
+        )
+        if settings.ASYNC_DATABASE_REPLICA_URL or settings.DATABASE_REPLICA_URL:
+            made["async_replica_wait_stats"] = PoolWaitStats()
+            made["async_replica_engine"] = _create_async_engine(
+                settings.ASYNC_DATABASE_REPLICA_URL or _async_url(settings.DATABASE_REPLICA_URL),
+                made["async_replica_wait_stats"],
+            )
+        else:
+            made["async_replica_wait_stats"] = made["async_wait_stats"]
+            made["async_replica_engine"] = made["async_engine"]
+
+        # 2. The Session factories. Each API request gets its own session.
+        made["SessionLocal"] = sessionmaker(autocommit=False, autoflush=False, bind=made["engine"])
+        made["ReadSessionLocal"] = sessionmaker(autocommit=False, autoflush=False, bind=made["replica_engine"])
+        made["AsyncSessionLocal"] = async_sessionmaker(
+            bind=made["async_engine"], autoflush=False, expire_on_commit=False
+        )
+        made["AsyncReadSessionLocal"] = async_sessionmaker(
+            bind=made["async_replica_engine"], autoflush=False, expire_on_commit=False
+        )
+
+        # Plain module attributes from now on (no more __getattr__)
+        globals().update(made)
+        _engines.update(made)
+    return _engines
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        return init_engines()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _distinct_engines():
+    # (name, sync engine, wait stats) per pool, replicas only if they're separate
+    engines = init_engines()
+    pools = [
+        ("primary", engines["engine"], engines["primary_wait_stats"]),
+        ("primary_async", engines["async_engine"].sync_engine, engines["async_wait_stats"]),
+    ]
+    if engines["replica_engine"] is not engines["engine"]:
+        pools.append(("replica", engines["replica_engine"], engines["replica_wait_stats"]))
+    if engines["async_replica_engine"] is not engines["async_engine"]:
+        pools.append(("replica_async", engines["async_replica_engine"].sync_engine, engines["async_replica_wait_stats"]))
+    return pools
+
+
+async def warm_up(connections: int):
+    """
+    Opens up to `connections` connections in each pool (never more than
+    DB_POOL_SIZE) and puts them back, so the first requests after a worker
+    starts don't each pay for connecting.
+    """
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    engines = init_engines()
+
+    def _warm_sync(eng):
+        opened = [eng.connect() for _ in range(connections)]
+        for connection in opened:
+            connection.close()
+
+    for eng in {engines["engine"], engines["replica_engine"]}:
+        await run_in_threadpool(_warm_sync, eng)
+    for eng in {engines["async_engine"], engines["async_replica_engine"]}:
+        opened = [await eng.connect() for _ in range(connections)]
+        for connection in opened:
+            await connection.close()
+
+
+async def dispose_engines():
+    """
+    Closes every pooled connection (at shutdown).
+    """
+    if not _engines:
+        return
+    for eng in {_engines["engine"], _engines["replica_engine"]}:
+        eng.dispose()
+    for eng in {_engines["async_engine"], _engines["async_replica_engine"]}:
+        await eng.dispose()
 
 # 3. The Base
 # This is a "base class" for our database models.
@@ -30,8 +246,52 @@ SessionLocal = sessionmaker(
 Base = declarative_base()
 
 def get_db():
-    db = SessionLocal()
+    db = init_engines()["SessionLocal"]()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """
+    Like get_db, but for routes that only read. Goes to the replica when
+    one is configured, so it may lag slightly behind the primary.
+    """
+    db = init_engines()["ReadSessionLocal"]()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with init_engines()["AsyncSessionLocal"]() as db:
+        yield db
+
+async def get_async_read_db():
+    """
+    Async counterpart of get_read_db (replica when configured).
+    """
+    async with init_engines()["AsyncReadSessionLocal"]() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """
+    Current pool occupancy plus checkout wait times, per engine.
+    Empty until the engines exist.
+    """
+    if not _engines:
+        return {}
+
+    stats = {}
+    for name, eng, wait_stats in _distinct_engines():
+        pool = eng.pool
+        entry = wait_stats.snapshot()
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        stats[name] = entry
+    return stats
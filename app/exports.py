@@ -0,0 +1,141 @@
+# app/exports.py
+
+# "Download all" for an assignment: every submission in one ZIP, built while
+# it is being sent. Nothing is staged on disk and memory stays at about one
+# chunk no matter how many (or how large) the files are.
+
+import csv
+import io
+import logging
+import os
+import re
+import zipfile
+from datetime import datetime
+
+from . import storage
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Formats that are already compressed go into the archive as-is (ZIP_STORED)
+ALREADY_COMPRESSED = storage.ALREADY_COMPRESSED
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = [
+    "file", "reg_number", "full_name", "email", "original_filename",
+    "file_size", "submitted_at", "grade", "feedback", "status",
+]
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Write-only file object for ZipFile. Whatever ZipFile writes is kept
+    until the generator below takes it with drain(). It isn't seekable, so
+    ZipFile writes data descriptors instead of going back to patch headers.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _safe_name(value: str) -> str:
+    # Reg numbers like "CS/2024/001" would otherwise become folders
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value).strip("._") or "student"
+
+
+def _entry_name(submission, student, taken: set) -> str:
+    """
+    <reg_number><ext of the uploaded file>, e.g. "CS_2024_001.pdf".
+    Falls back to the student id, and adds -2, -3... if a name repeats.
+    """
+    base = _safe_name(student.reg_number) if student.reg_number else f"student-{student.id}"
+    ext = os.path.splitext(submission.original_filename or submission.file_path)[1].lower()
+    name = f"{base}{ext}"
+    n = 2
+    while name in taken:
+        name = f"{base}-{n}{ext}"
+        n += 1
+    taken.add(name)
+    return name
+
+
+def stream_submissions_zip(rows, chunk_size: int = None):
+    """
+    rows: (Submission, User) pairs, e.g. from crud.get_submissions_for_export.
+    Yields the bytes of a ZIP with one file per submission plus manifest.csv
+    (who, which file, grade, feedback).
+
+    A plain (sync) generator: StreamingResponse runs it on the threadpool,
+    so the blocking file reads never touch the event loop.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    out = _ZipStream()
+    manifest = io.StringIO()
+    writer = csv.DictWriter(manifest, fieldnames=MANIFEST_COLUMNS)
+    writer.writeheader()
+    taken = {MANIFEST_NAME}
+
+    with zipfile.ZipFile(out, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for submission, student in rows:
+            name = _entry_name(submission, student, taken)
+            status = "ok"
+            try:
+                # Compressed blobs are read back as the original bytes
+                source = storage.open_blob(submission.file_path, submission.content_encoding)
+            except OSError:
+                logger.warning("Export: file for submission %s is missing (%s)", submission.id, submission.file_path)
+                status = "missing"
+            else:
+                with source:
+                    info = zipfile.ZipInfo(name, date_time=(submission.submitted_at or datetime.utcnow()).timetuple()[:6])
+                    info.compress_type = (
+                        zipfile.ZIP_STORED if os.path.splitext(name)[1] in ALREADY_COMPRESSED else zipfile.ZIP_DEFLATED
+                    )
+                    # Knowing the size up front lets ZipFile pick ZIP64 for huge files
+                    info.file_size = (
+                        submission.file_size if submission.content_encoding else os.fstat(source.fileno()).st_size
+                    )
+                    with archive.open(info, mode="w") as entry:
+                        while True:
+                            chunk = source.read(chunk_size)
+                            if not chunk:
+                                break
+                            entry.write(chunk)
+                            data = out.drain()
+                            if data:
+                                yield data
+
+            writer.writerow({
+                "file": name if status == "ok" else "",
+                "reg_number": student.reg_number or "",
+                "full_name": student.full_name or "",
+                "email": student.email,
+                "original_filename": submission.original_filename or "",
+                "file_size": submission.file_size if submission.file_size is not None else "",
+                "submitted_at": submission.submitted_at.isoformat() if submission.submitted_at else "",
+                "grade": submission.grade if submission.grade is not None else "",
+                "feedback": submission.feedback or "",
+                "status": status,
+            })
+            data = out.drain()
+            if data:
+                yield data
+
+        archive.writestr(MANIFEST_NAME, manifest.getvalue())
+
+    # Closing the archive writes the central directory
+    data = out.drain()
+    if data:
+        yield data
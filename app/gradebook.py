@@ -0,0 +1,138 @@
+# app/gradebook.py
+
+# Class statistics for lecturers, served from two small summary tables
+# instead of the submissions table:
+#   assignment_stats         one row per assignment: counts and the grade sum
+#   assignment_grade_counts  how many submissions got each grade
+#
+# Every write to a submission (crud_async.create_submission, grade_submission,
+# the bulk grader) turns what it changed into a StatsChange, and crud applies it
+# in the same transaction as relative "+= n" updates. Mean, median and the
+# histogram are then worked out from at most a few hundred grade counts.
+
+from datetime import datetime
+
+
+def is_late(submitted_at: datetime | None, deadline: datetime | None) -> bool:
+    # Both naive UTC, as stored (deadlines included, since migration 0008)
+    return bool(deadline and submitted_at and submitted_at > deadline)
+
+
+class StatsChange:
+    """
+    What some submission writes do to their assignments' aggregates.
+    add() once per submission changed; changes to the same assignment
+    (or grade) are added up, so a bulk grade still makes one row per key.
+    """
+
+    COUNTERS = ("submission_count", "graded_count", "grade_sum", "late_count")
+
+    def __init__(self):
+        self._counters = {}  # assignment_id -> {counter: delta}
+        self._grades = {}    # (assignment_id, grade) -> delta
+
+    def add(
+        self,
+        assignment_id: int,
+        old_grade: int | None = None,
+        new_grade: int | None = None,
+        old_late: bool = False,
+        new_late: bool = False,
+        new_submission: bool = False,
+    ):
+        counters = self._counters.setdefault(assignment_id, dict.fromkeys(self.COUNTERS, 0))
+        counters["submission_count"] += int(new_submission)
+        counters["graded_count"] += (new_grade is not None) - (old_grade is not None)
+        counters["grade_sum"] += (new_grade or 0) - (old_grade or 0)
+        counters["late_count"] += int(new_late) - int(old_late)
+        if old_grade is not None:
+            self._grades[(assignment_id, old_grade)] = self._grades.get((assignment_id, old_grade), 0) - 1
+        if new_grade is not None:
+            self._grades[(assignment_id, new_grade)] = self._grades.get((assignment_id, new_grade), 0) + 1
+
+    def counter_rows(self) -> list:
+        """
+        [{"assignment_id", <counter deltas>}] for assignments that changed,
+        sorted so concurrent writers lock rows in the same order.
+        """
+        return [
+            {"assignment_id": assignment_id, **counters}
+            for assignment_id, counters in sorted(self._counters.items())
+            if any(counters.values())
+        ]
+
+    def grade_rows(self) -> list:
+        """
+        [{"assignment_id", "grade", "count"}] for grade counts that changed.
+        """
+        return [
+            {"assignment_id": assignment_id, "grade": grade, "count": delta}
+            for (assignment_id, grade), delta in sorted(self._grades.items())
+            if delta
+        ]
+
+
+def median(grade_counts: dict) -> float | None:
+    """
+    Median of the grades given as {grade: how many}.
+    """
+    total = sum(grade_counts.values())
+    if not total:
+        return None
+    # The middle position(s), 0-based; the same one twice when total is odd
+    wanted = [(total - 1) // 2, total // 2]
+    found = []
+    seen = 0
+    for grade in sorted(grade_counts):
+        seen += grade_counts[grade]
+        while wanted and wanted[0] < seen:
+            found.append(grade)
+            wanted.pop(0)
+    return (found[0] + found[1]) / 2
+
+
+def histogram(grade_counts: dict, bucket_width: int = 10) -> list:
+    """
+    [{"min", "max", "count"}] in buckets of bucket_width grades, from the
+    lowest grade given to the highest (empty buckets in between included).
+    """
+    counts = {grade: n for grade, n in grade_counts.items() if n > 0}
+    if not counts:
+        return []
+    low = min(counts) // bucket_width * bucket_width
+    buckets = {start: 0 for start in range(low, max(counts) + 1, bucket_width)}
+    for grade, n in counts.items():
+        buckets[grade // bucket_width * bucket_width] += n
+    return [{"min": start, "max": start + bucket_width - 1, "count": n} for start, n in buckets.items()]
+
+
+def add_totals(rows) -> dict:
+    """
+    Sums assignment_stats rows (or dicts) into one dict of StatsChange.COUNTERS.
+    """
+    totals = dict.fromkeys(StatsChange.COUNTERS, 0)
+    for row in rows:
+        for name in StatsChange.COUNTERS:
+            totals[name] += row[name] or 0
+    return totals
+
+
+def summarize(totals, grade_counts: dict, student_count: int, assignment_count: int = 1, bucket_width: int = 10) -> dict:
+    """
+    The figures a dashboard shows, from the counters of an assignment_stats
+    row (or add_totals of several) and the matching {grade: how many}.
+    "Missing" is every active student who hasn't submitted, per assignment.
+    """
+    totals = totals or dict.fromkeys(StatsChange.COUNTERS, 0)
+    submission_count = totals["submission_count"] or 0
+    graded_count = totals["graded_count"] or 0
+    return {
+        "submission_count": submission_count,
+        "graded_count": graded_count,
+        "ungraded_count": submission_count - graded_count,
+        "late_count": totals["late_count"] or 0,
+        "missing_count": max(student_count * assignment_count - submission_count, 0),
+        "mean": round(totals["grade_sum"] / graded_count, 2) if graded_count else None,
+        "median": median(grade_counts),
+        "histogram": histogram(grade_counts, bucket_width),
+    }
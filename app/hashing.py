@@ -0,0 +1,147 @@
+# app/hashing.py
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+
+
+# These two run inside the worker pool. They must stay at module level
+# so they can be pickled when the pool is a ProcessPoolExecutor.
+def _hash_password(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordPoolBusy(Exception):
+    """
+    Raised when the password pool already has as much work as it is allowed to queue.
+    """
+
+
+class PasswordPool:
+    """
+    A dedicated worker pool for bcrypt work.
+
+    bcrypt is deliberately slow, so running it on Starlette's shared
+    threadpool lets a login storm starve every other endpoint. This pool
+    caps how many hashes run at once (`workers`) and how many may wait
+    behind them (`max_queue`); anything beyond that is rejected with
+    PasswordPoolBusy instead of piling up.
+    """
+
+    def __init__(self, backend: str = "thread", workers: int = 4, max_queue: int = 64, rounds: int = 12):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown password pool backend: {backend!r}")
+        self.backend = backend
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not spawn workers
+        if self._executor is None:
+            if self.backend == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self._pending -= 1
+                raise
+        future.add_done_callback(self._done)
+        return future
+
+    # --- Blocking API (for sync callers; the roster import uses hash_many) ---
+    def hash(self, password: str) -> str:
+        return self.submit(_hash_password, password, self.rounds).result()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.submit(_check_password, plain_password, hashed_password).result()
+
+    def hash_many(self, passwords: list) -> list:
+        """
+        Hashes a batch of passwords (e.g. a roster import) in parallel.
+        Only `workers` of them are handed to the pool at a time, so a big
+        batch never fills the queue and logins only wait for one round.
+        """
+        results = [None] * len(passwords)
+        in_flight = deque()
+        for i, password in enumerate(passwords):
+            while True:
+                if len(in_flight) >= self.workers:
+                    j, future = in_flight.popleft()
+                    results[j] = future.result()
+                try:
+                    in_flight.append((i, self.submit(_hash_password, password, self.rounds)))
+                    break
+                except PasswordPoolBusy:
+                    # Interactive work has the queue; let it drain
+                    if in_flight:
+                        j, future = in_flight.popleft()
+                        results[j] = future.result()
+                    else:
+                        time.sleep(0.05)
+        for j, future in in_flight:
+            results[j] = future.result()
+        return results
+
+    # --- Async API (frees the event loop AND the request threadpool while waiting) ---
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(_hash_password, password, self.rounds))
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self.submit(_check_password, plain_password, hashed_password))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        True if the hash was made with a different cost than the one configured.
+        bcrypt hashes look like "$2b$12$<salt+hash>", the 12 being the cost.
+        """
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+            return {
+                "backend": self.backend,
+                "workers": self.workers,
+                "in_flight": min(pending, self.workers),
+                "queue_depth": max(0, pending - self.workers),
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,279 @@
+# app/jobs.py
+
+# Background post-processing of uploaded submissions.
+#
+# The upload request only makes the bytes durable and records the submission.
+# Everything after that (checking the file, working out what it is, and later
+# text extraction, previews, scanning...) happens here, off the request path:
+#   1. crud_async.create_submission adds a submission_jobs row in the same
+#      transaction as the submission, so a job is never lost even if we crash
+#      right after the commit. Once committed it pokes the runner (notify()).
+#   2. run_worker (started from main.py's lifespan) claims due jobs and runs
+#      PIPELINE for each on a pool of JOB_WORKERS threads.
+#   3. Success sets the submission's processing_status to "done", plus whatever
+#      the steps found. An exception puts the job back with a growing delay;
+#      after JOB_MAX_ATTEMPTS the submission is marked "failed".
+#
+# Claiming is a conditional UPDATE, so every worker process can run a runner
+# against the same table. A job left "running" for longer than
+# JOB_TIMEOUT_SECONDS (its process died) goes back in the queue.
+
+import asyncio
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, database, etags, models, storage
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a step when trying again can't help (e.g. the file is corrupt).
+    The submission is marked failed straight away.
+    """
+
+
+# --- The pipeline ---
+# Each step gets the Submission and returns a dict of Submission columns to
+# set (or None). Steps may run more than once for the same file, so they must
+# not have side effects beyond that dict.
+
+def check_file(submission):
+    """
+    The stored file is there and still has its recorded size and checksum.
+    """
+    size, checksum = storage._hash_file(submission.file_path, settings.UPLOAD_CHUNK_SIZE, submission.content_encoding)
+    if submission.file_size is not None and size != submission.file_size:
+        raise PermanentJobError(f"File is {size} bytes, expected {submission.file_size}")
+    if submission.checksum and checksum != submission.checksum:
+        raise PermanentJobError("File contents don't match the checksum taken at upload")
+
+
+# Leading bytes of common formats -> MIME type
+MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"{\\rtf", "application/rtf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),  # old .doc/.xls/.ppt
+    (b"\x1f\x8b", "application/gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+]
+
+
+def detect_content_type(submission):
+    """
+    What the file really is, from its first bytes rather than its name.
+    ZIP-based formats (.docx, .odt...) and plain text fall back to the
+    uploaded file name to tell them apart.
+    """
+    with storage.open_blob(submission.file_path, submission.content_encoding) as f:
+        head = f.read(512)
+    guessed = mimetypes.guess_type(submission.original_filename or "")[0]
+
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            if content_type in ("application/zip", "application/x-ole-storage") and guessed:
+                content_type = guessed
+            return {"content_type": content_type}
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError:
+        # (a multi-byte character cut off at byte 512 is still text)
+        if not _is_truncated_utf8(head):
+            return {"content_type": "application/octet-stream"}
+    if guessed and guessed.startswith("text/"):
+        return {"content_type": guessed}
+    return {"content_type": "text/plain"}
+
+
+def _is_truncated_utf8(data: bytes) -> bool:
+    for cut in range(1, 4):
+        try:
+            data[:-cut].decode("utf-8")
+            return True
+        except UnicodeDecodeError:
+            continue
+    return False
+
+
+PIPELINE = [check_file, detect_content_type]
+
+
+# --- Running jobs ---
+
+def claim_jobs(limit: int) -> list:
+    """
+    Marks up to `limit` due jobs as running and returns their ids.
+    """
+    now = datetime.utcnow()
+    job = models.SubmissionJob
+    with database.SessionLocal() as db:
+        # Jobs whose worker died mid-run go back in the queue
+        db.execute(
+            update(job)
+            .where(job.status == RUNNING, job.claimed_at < now - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS))
+            .values(status=PENDING)
+        )
+        candidates = db.scalars(
+            select(job.id).where(job.status == PENDING, job.run_after <= now).order_by(job.run_after, job.id).limit(limit)
+        ).all()
+        claimed = []
+        for job_id in candidates:
+            # Only one runner wins each job, whichever process it is in
+            result = db.execute(
+                update(job)
+                .where(job.id == job_id, job.status == PENDING)
+                .values(status=RUNNING, claimed_at=now, attempts=job.attempts + 1)
+            )
+            if result.rowcount:
+                claimed.append(job_id)
+        db.commit()
+    return claimed
+
+
+def run_job(job_id: int):
+    """
+    Runs PIPELINE for one claimed job and records the outcome.
+    """
+    with database.SessionLocal() as db:
+        job = db.get(models.SubmissionJob, job_id)
+        submission = db.get(models.Submission, job.submission_id)
+        if submission is None or submission.checksum != job.checksum:
+            # Replaced since this job was queued; the new file has its own job
+            _finish_job(db, job_id, DONE)
+            db.commit()
+            return
+
+        try:
+            found = {}
+            for step in PIPELINE:
+                found.update(step(submission) or {})
+        except Exception as e:
+            db.rollback()
+            permanent = isinstance(e, PermanentJobError)
+            logger.warning("Processing submission %s failed (job %s): %s", job.submission_id, job_id, e,
+                           exc_info=not permanent)
+            _job_failed(db, job_id, f"{type(e).__name__}: {e}", permanent)
+            return
+
+        _set_submission(db, submission, job.checksum, processing_status=DONE, **found)
+        _finish_job(db, job_id, DONE)
+        db.commit()
+
+
+def _job_failed(db, job_id: int, error: str, permanent: bool):
+    job = db.get(models.SubmissionJob, job_id)
+    if permanent or job.attempts >= settings.JOB_MAX_ATTEMPTS:
+        _set_submission(db, db.get(models.Submission, job.submission_id), job.checksum, processing_status=FAILED)
+        _finish_job(db, job_id, FAILED, error)
+    else:
+        # 1x, 2x, 4x... the base delay
+        delay = settings.JOB_RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+        job.status = PENDING
+        job.last_error = error
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    db.commit()
+
+
+def _finish_job(db, job_id: int, status: str, error: str = None):
+    db.execute(
+        update(models.SubmissionJob)
+        .where(models.SubmissionJob.id == job_id)
+        .values(status=status, last_error=error, finished_at=datetime.utcnow())
+    )
+
+
+def _set_submission(db, submission, checksum: str, **values):
+    # Only if it still holds the file this job looked at
+    if submission is None:
+        return
+    result = db.execute(
+        update(models.Submission)
+        .where(models.Submission.id == submission.id, models.Submission.checksum == checksum)
+        .values(**values)
+    )
+    if result.rowcount:
+        # processing_status is part of the student's cached submission
+        crud.bump_cache_versions(db, [etags.submission_scope(submission.student_id, submission.assignment_id)])
+
+
+# Set while run_worker is running, so notify() can wake it from any thread
+_loop = None
+_wakeup = None
+
+
+def notify():
+    """
+    Tells the runner there is new work. Safe to call from any thread;
+    does nothing if no runner is going in this process.
+    """
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def run_worker():
+    """
+    Background loop (started from main.py's lifespan) that keeps up to
+    JOB_WORKERS jobs running. Checks the queue when notify()'d, when a job
+    ends, and every JOB_POLL_INTERVAL_SECONDS (for retries and for jobs
+    queued by other processes).
+    """
+    global _loop, _wakeup
+    _loop, _wakeup = asyncio.get_running_loop(), asyncio.Event()
+    executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix="submission-jobs")
+    running = set()
+
+    def _done(future):
+        running.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            # Left "running"; it is retried once JOB_TIMEOUT_SECONDS is up
+            logger.error("Job runner crashed", exc_info=future.exception())
+        if _wakeup is not None:
+            _wakeup.set()
+
+    try:
+        while True:
+            _wakeup.clear()
+            free = settings.JOB_WORKERS - len(running)
+            if free > 0:
+                try:
+                    for job_id in await run_in_threadpool(claim_jobs, free):
+                        future = _loop.run_in_executor(executor, run_job, job_id)
+                        running.add(future)
+                        future.add_done_callback(_done)
+                except Exception:
+                    logger.exception("Job runner pass failed")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _loop = _wakeup = None
+        # Jobs cut short here are picked up again after JOB_TIMEOUT_SECONDS
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    # python -m app.jobs   -> run every due job now, in this process
+    count = 0
+    while True:
+        claimed = claim_jobs(settings.JOB_WORKERS)
+        if not claimed:
+            break
+        for job_id in claimed:
+            run_job(job_id)
+        count += len(claimed)
+    print(f"Ran {count} jobs")
@@ -1,41 +1,116 @@
 # app/main.py
 
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base  
-from . import models 
-from .routers import users, auth, assignments, submissions
-from fastapi.responses import JSONResponse
-# This line tells SQLAlchemy to look at all the classes
-# that inherited from Base (like our User model) and
-# create the corresponding tables in the database.
-models.Base.metadata.create_all(bind=engine)
-
-
-app = FastAPI(
-    title="Assignment App API",
-    description="Backend for the assignment management system.",
-    version="0.1.0",
-)
-# <--- ADD THIS DEBUG BLOCK --->
-@app.middleware("http")
-async def debug_logging(request: Request, call_next):
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from .settings import settings
+# NOTE: The schema is owned by the Alembic migrations in migrations/.
+# Run `alembic upgrade head` before starting the app; importing it no
+# longer creates tables.
+#
+# Run it with the factory so each worker builds its own app:
+#   uvicorn --factory app.main:create_app
+#   gunicorn -k uvicorn.workers.UvicornWorker "app.main:create_app()"
+# Importing this module is cheap and never touches the database: routers are
+# imported by create_app(), and the engines are made and warmed up in the
+# lifespan (see database.init_engines). So `gunicorn --preload` is safe, and
+# workers forked from it only pay for the lifespan.
+# `uvicorn app.main:app` still works too (see __getattr__ below).
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from . import database, jobs, metrics, revocation, storage, uploads
+
+    started = time.perf_counter()
+    database.init_engines()
+    try:
+        await database.warm_up(settings.DB_POOL_WARMUP)
+    except Exception:
+        # Not fatal: the pools connect on demand once the database is back
+        logger.exception("Warming up the database pools failed")
+    # Before taking requests, so no revoked token gets through a new worker.
+    # Tried even if the warm-up failed; if this fails too, the refresher
+    # keeps retrying every second until it has loaded once.
     try:
-        return await call_next(request)
-    except Exception as e:
-        print(f"🔥 SERVER CRASHED: {e}")
-        return JSONResponse(status_code=500, content={"detail": str(e)})
-# <--- END DEBUG BLOCK --->
+        await run_in_threadpool(revocation.refresh)
+    except Exception:
+        logger.exception("Loading revoked tokens failed")
 
-app.include_router(users.router)
-app.include_router(auth.router)
-app.include_router(assignments.router)
-app.include_router(submissions.router)
+    # Background housekeeping for the lifetime of the worker
+    tasks = [
+        asyncio.create_task(uploads.run_janitor()),
+        asyncio.create_task(storage.run_gc()),
+        asyncio.create_task(jobs.run_worker()),
+        asyncio.create_task(revocation.run_refresher()),
+    ]
+    metrics.startup_seconds.set(time.perf_counter() - started, phase="lifespan")
+    logger.info("Worker ready: import %.3fs, lifespan %.3fs",
+                app.state.import_seconds, time.perf_counter() - started)
+    yield
+    for task in tasks:
+        task.cancel()
+    await database.dispose_engines()
+
+
+def create_app() -> FastAPI:
+    """
+    Builds the application: middleware and routers, no database work.
+    """
+    # Imported here rather than at the top, so importing app.main stays cheap
+    from . import admission, metrics, profiling, uploads
+    from .routers import users, auth, assignments, submissions
+    from .routers import uploads as upload_sessions
+
+    app = FastAPI(
+        title="Assignment App API",
+        description="Backend for the assignment management system.",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
+    # Oversized uploads get a 413 while the body is coming in, not after
+    # Starlette has spooled all of it (see uploads.py). Innermost, so it only
+    # counts the bodies of uploads that got a slot.
+    app.add_middleware(uploads.UploadSizeLimitMiddleware)
+    # Uploads wait their turn for a slot instead of all running at once near a
+    # deadline (see admission.py). Added first so metrics see its 429s/503s.
+    app.add_middleware(admission.AdmissionMiddleware)
+    # Request counts, latency histograms and in-flight gauges per route, and a
+    # plain 500 for unhandled errors (see metrics.py). Scraped from GET /metrics.
+    app.add_middleware(metrics.MetricsMiddleware)
+    if settings.SQL_PROFILING:
+        # Query count / DB time per request, in headers and logs (see profiling.py)
+        app.add_middleware(profiling.ProfilingMiddleware)
+    if settings.METRICS_ENABLED:
+        app.add_api_route("/metrics", metrics.metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+    app.include_router(users.router)
+    app.include_router(auth.router)
+    app.include_router(assignments.router)
+    # Before submissions.router so /submissions/uploads isn't read as an assignment id
+    app.include_router(upload_sessions.router)
+    app.include_router(submissions.router)
+
+    # NOTE: uploads/ is no longer mounted publicly. Files are downloaded through
+    # GET /submissions/{id}/file, which checks who is asking (see storage.file_response).
+
+    app.add_api_route("/", read_root, methods=["GET"])
+
+    # Module import plus building the app; the lifespan adds its own phase
+    app.state.import_seconds = time.perf_counter() - _import_started
+    metrics.startup_seconds.set(app.state.import_seconds, phase="import")
+    return app
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # --- A simple "Hello World" endpoint ---
-@app.get("/")
 def read_root():
     """
     A simple root endpoint to confirm the API is running.
@@ -43,5 +118,9 @@ def read_root():
     return {"message": "Welcome to the Assignment App API!"}
 
 
-
-# We will later add our routers here
\ No newline at end of file
+def __getattr__(name):
+    # `app.main:app` for servers/scripts that expect an instance: built on first access
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,334 @@
+# app/metrics.py
+
+# Minimal Prometheus instrumentation, exposed on GET /metrics.
+#
+#   http_requests_total{method,route,status}          counter
+#   http_request_duration_seconds{method,route}       histogram
+#   http_requests_in_flight{method,route}             gauge
+#   upload_bytes_total{kind}                          counter (bytes received)
+#   app_startup_seconds{phase}                        gauge (see main.py)
+#   + whatever the registered collectors report at scrape time
+#     (DB pools, password pool, user cache, upload admission)
+#
+# `route` is the route's path template ("/submissions/{submission_id}/grade"),
+# never the raw URL, so the number of series stays small.
+# Everything is per worker process; Prometheus adds them up across workers.
+
+import bisect
+import logging
+import threading
+import time
+
+from starlette.responses import PlainTextResponse
+from starlette.routing import get_route_path
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Uploads near a deadline can take a while, hence the long tail.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [count per bucket (+Inf last), sum]
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# --- The metrics themselves ---
+http_requests = Counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.", ("method", "route")
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled.", ("method", "route")
+)
+upload_bytes = Counter(
+    "upload_bytes_total", "Submission bytes received, by upload kind (direct or resumable).", ("kind",)
+)
+startup_seconds = Gauge(
+    "app_startup_seconds", "How long this worker took to start, by phase (import, lifespan).", ("phase",)
+)
+
+_metrics = [http_requests, http_request_duration, http_in_flight, upload_bytes, startup_seconds]
+
+# Functions called at scrape time. Each returns [(name, type, help, [(labels_dict, value)])].
+_collectors = []
+
+
+def register_collector(fn):
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception:
+            logger.exception("Metrics collector %s failed", getattr(collector, "__name__", collector))
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Collectors for things that already keep their own numbers ---
+# (imported lazily so this module stays importable from anywhere)
+
+@register_collector
+def _db_pool_metrics():
+    from .database import pool_stats
+    stats = pool_stats()
+    families = [
+        ("db_pool_checkouts_total", "counter", "Connections checked out of the pool.", "checkouts"),
+        ("db_pool_checkout_timeouts_total", "counter", "Checkouts that gave up after DB_POOL_TIMEOUT.", "timeouts"),
+        ("db_pool_checkout_wait_seconds_total", "counter", "Total time spent waiting for a connection.", "wait_seconds_total"),
+        ("db_pool_checkout_wait_seconds_max", "gauge", "Longest wait for a connection so far.", "wait_seconds_max"),
+        ("db_pool_size", "gauge", "Configured pool size.", "size"),
+        ("db_pool_checked_out", "gauge", "Connections in use right now.", "checked_out"),
+        ("db_pool_checked_in", "gauge", "Idle connections in the pool.", "checked_in"),
+        ("db_pool_overflow", "gauge", "Connections open beyond pool_size (negative: pool not full yet).", "overflow"),
+    ]
+    return [
+        (name, kind, documentation, [({"pool": pool}, entry[key]) for pool, entry in stats.items() if key in entry])
+        for name, kind, documentation, key in families
+    ]
+
+@register_collector
+def _password_pool_metrics():
+    from .auth import password_pool
+    stats = password_pool.stats()
+    labels = {"backend": stats["backend"]}
+    return [
+        ("password_pool_workers", "gauge", "bcrypt workers.", [(labels, stats["workers"])]),
+        ("password_pool_in_flight", "gauge", "bcrypt jobs running.", [(labels, stats["in_flight"])]),
+        ("password_pool_queue_depth", "gauge", "bcrypt jobs waiting for a worker.", [(labels, stats["queue_depth"])]),
+        ("password_pool_completed_total", "counter", "bcrypt jobs finished.", [(labels, stats["completed"])]),
+        ("password_pool_rejected_total", "counter", "bcrypt jobs turned away because the queue was full.", [(labels, stats["rejected"])]),
+    ]
+
+@register_collector
+def _user_cache_metrics():
+    from .auth import user_cache
+    stats = user_cache.stats()
+    return [
+        ("user_cache_size", "gauge", "Users in the auth cache.", [({}, stats["size"])]),
+        ("user_cache_hits_total", "counter", "Auth cache hits.", [({}, stats["hits"])]),
+        ("user_cache_misses_total", "counter", "Auth cache misses.", [({}, stats["misses"])]),
+        ("user_cache_evictions_total", "counter", "Auth cache evictions.", [({}, stats["evictions"])]),
+    ]
+
+@register_collector
+def _revocation_metrics():
+    from .revocation import revocations
+    return [
+        ("revoked_token_users", "gauge", "Users whose older access tokens this worker rejects.", [({}, len(revocations))]),
+    ]
+
+@register_collector
+def _admission_metrics():
+    from .admission import upload_admission
+    stats = upload_admission.stats()
+    return [
+        ("upload_admission_running", "gauge", "Uploads holding a slot in this worker.", [({}, stats["running"])]),
+        ("upload_admission_waiting", "gauge", "Uploads queued for a slot in this worker.", [({}, stats["waiting"])]),
+        ("upload_admission_admitted_total", "counter", "Uploads given a slot.", [({}, stats["admitted"])]),
+        ("upload_admission_rejected_total", "counter", "Uploads turned away, by reason.", [
+            ({"reason": "user_limit"}, stats["rejected_user_limit"]),
+            ({"reason": "queue_full"}, stats["rejected_queue_full"]),
+            ({"reason": "timeout"}, stats["timed_out"]),
+        ]),
+    ]
+
+
+def metrics_endpoint():
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+
+def _flat_routes(routes):
+    # Included routers are nested on newer FastAPI; flatten them to routes
+    # that carry the full path (prefix included)
+    for route in routes:
+        contexts = getattr(route, "effective_route_contexts", None)
+        if contexts is not None:
+            yield from contexts()
+        else:
+            yield route
+
+
+def _route_table(app):
+    """
+    [(path_regex, methods, path_template)] for every route of the app,
+    in the router's order. Built once per app.
+    """
+    table = []
+    for route in _flat_routes(getattr(getattr(app, "router", None), "routes", ())):
+        regex = getattr(route, "path_regex", None)
+        path = getattr(route, "path", None)
+        if regex is not None and path is not None:
+            table.append((regex, getattr(route, "methods", None), path))
+    return table
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware, so streamed responses keep
+    streaming). Times each request until its body is fully sent.
+
+    It also takes over from the old debug block: an unhandled exception is
+    logged with its traceback and the client gets a plain 500 (without
+    the exception text), counted under status="500".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_template(self, scope) -> str:
+        """
+        The path template of the route this request will hit. Worked out up
+        front (a few regex matches) so in-flight and latency share the label.
+        """
+        if self._routes is None:
+            self._routes = _route_table(scope.get("app"))
+        path, method = get_route_path(scope), scope["method"]
+        for regex, methods, template in self._routes:
+            if regex.match(path) and (not methods or method in methods):
+                return template
+        return "<unmatched>"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            if scope["type"] == "lifespan" and self._routes is None:
+                # Build the table at startup rather than on the first request
+                self._routes = _route_table(scope.get("app"))
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        status = 500
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal status, response_started
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_started = True
+            await send(message)
+
+        http_in_flight.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Unhandled error in %s %s", method, scope.get("path"))
+            status = 500
+            if not response_started:
+                response = PlainTextResponse("Internal Server Error", status_code=500)
+                await response(scope, receive, send)
+        finally:
+            http_in_flight.dec(method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status)
+            http_request_duration.observe(time.perf_counter() - start, method=method, route=route)
@@ -1,6 +1,6 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey, Index, UniqueConstraint
 from .database import Base  # Import the 'Base' we created in database.py
 from sqlalchemy.orm import relationship
 import enum
@@ -29,6 +29,11 @@ class User(Base):
 
     is_active = Column(Boolean, default=True)
 
+    # Access tokens carry the token_version they were issued with; bumping it
+    # (password change, deactivation) revokes all of them (see revocation.py)
+    token_version = Column(Integer, nullable=False, default=0)
+    tokens_revoked_at = Column(DateTime, nullable=True, index=True)
+
 # This lets us access a lecturer's assignments easily (e.g., user.assignments)
     assignments = relationship("Assignment", back_populates="lecturer")
 
@@ -38,11 +43,15 @@ class Assignment(Base):
     It stores the homework details and links back to the lecturer who created it.
     """
     __tablename__ = "assignments"
+    __table_args__ = (
+        # Backs the lecturer's paginated listing (WHERE lecturer_id = ? AND id > ? ORDER BY id)
+        Index("ix_assignments_lecturer_id_id", "lecturer_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     description = Column(String, nullable=False)
-    deadline = Column(DateTime, nullable=True)
+    deadline = Column(DateTime, nullable=True, index=True)  # UTC, like every other timestamp here
     
     # ForeignKey links this column to the 'id' column of the 'users' table.
     # This is how we know WHICH lecturer created this assignment.
@@ -57,18 +66,96 @@ class Submission(Base):
     It links a Student, an Assignment, and a File Path together.
     """
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Backs the paginated per-assignment listing (WHERE assignment_id = ? AND id > ? ORDER BY id)
+        Index("ix_submissions_assignment_id_id", "assignment_id", "id"),
+        # One submission per student per assignment. crud_async.create_submission
+        # upserts against this, and it also serves lookups by student_id.
+        UniqueConstraint("student_id", "assignment_id", name="uq_submissions_student_assignment"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     file_path = Column(String, nullable=False) # Where the file is on your PC
+    file_size = Column(Integer, nullable=True)  # Size in bytes (as uploaded)
+    stored_size = Column(Integer, nullable=True)  # Bytes on disk; smaller than file_size if compressed
+    content_encoding = Column(String, nullable=True)  # "gzip"/"zstd" if the blob is compressed (see storage.py)
+    checksum = Column(String, nullable=True, index=True)  # SHA-256 of the contents; also the blob's key in storage.py
+    original_filename = Column(String, nullable=True)     # The name the student uploaded it as
     submitted_at = Column(DateTime, default=datetime.utcnow) # Automatic timestamp
 
     grade = Column(Integer, nullable=True)     # Teacher fills this later
     feedback = Column(String, nullable=True)   # Teacher fills this later
 
+    # Filled in after the upload by the background pipeline (see jobs.py)
+    processing_status = Column(String, nullable=False, default="pending")  # "pending", "done" or "failed"
+    content_type = Column(String, nullable=True)  # What the file really is, from its first bytes
+
     # Links to other tables
     student_id = Column(Integer, ForeignKey("users.id"))
     assignment_id = Column(Integer, ForeignKey("assignments.id"))
 
     # Relationships
     student = relationship("User")
-    assignment = relationship("Assignment")
\ No newline at end of file
+    assignment = relationship("Assignment")
+
+class CacheVersion(Base):
+    """
+    A counter per cached resource, bumped whenever that resource changes
+    (see etags.py). GET routes turn it into an ETag, so a client that
+    already has the current version gets a 304 without us loading anything.
+    """
+    __tablename__ = "cache_versions"
+
+    scope = Column(String, primary_key=True)  # e.g. "assignments", "submission:<student>:<assignment>"
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Sent as Last-Modified
+
+class AssignmentStats(Base):
+    """
+    Running totals for one assignment's submissions, kept up to date by
+    every submission write (see gradebook.py). Dashboards read this row
+    instead of counting the submissions table.
+    """
+    __tablename__ = "assignment_stats"
+
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), primary_key=True)
+    submission_count = Column(Integer, nullable=False, default=0)
+    graded_count = Column(Integer, nullable=False, default=0)
+    grade_sum = Column(Integer, nullable=False, default=0)   # mean = grade_sum / graded_count
+    late_count = Column(Integer, nullable=False, default=0)  # submitted after the deadline
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class AssignmentGradeCount(Base):
+    """
+    How many of an assignment's submissions have each grade.
+    Median and histogram come from these rows.
+    """
+    __tablename__ = "assignment_grade_counts"
+
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), primary_key=True)
+    grade = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class SubmissionJob(Base):
+    """
+    One run of the post-processing pipeline for a submission's file
+    (see jobs.py). The rows are the queue: a worker claims a pending one,
+    and a failed run goes back to pending with a later run_after until
+    JOB_MAX_ATTEMPTS is used up.
+    """
+    __tablename__ = "submission_jobs"
+    __table_args__ = (
+        # Backs the worker's "what's due?" query
+        Index("ix_submission_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False, index=True)
+    checksum = Column(String, nullable=True)  # The file this job is for; a resubmit makes the job stale
+    status = Column(String, nullable=False, default="pending")  # "pending", "running", "done" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not before this (retry backoff)
+    claimed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,185 @@
+# app/profiling.py
+
+# Per-request SQL profiling.
+#
+# Hooks SQLAlchemy's cursor events on every engine (sync and async) and adds
+# each statement to the profile of whatever is running:
+#   - a request, when SQL_PROFILING is on (ProfilingMiddleware). The totals
+#     go out as X-DB-Query-Count / X-DB-Time-Ms headers and the slowest
+#     statements are logged.
+#   - a `with query_budget(n):` block, which fails if more than n statements
+#     ran inside it. That is how a query budget per endpoint is pinned down
+#     (see benchmarks/query_budgets.py).
+
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfile:
+    """
+    Statement count, total time and the slowest few statements.
+    """
+
+    def __init__(self, keep_slowest: int = 5):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.total_seconds = 0.0
+        self._slowest = []  # min-heap of (seconds, sequence, statement)
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            entry = (seconds, self.count, statement)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif self.keep_slowest:
+                heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """
+        [(seconds, statement)], slowest first.
+        """
+        with self._lock:
+            return [(seconds, statement) for seconds, _, statement in sorted(self._slowest, reverse=True)]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} queries, {self.total_seconds * 1000:.1f} ms"]
+        for seconds, statement in self.slowest:
+            lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())[:300]}")
+        return "\n".join(lines)
+
+
+# The profile of the request running in this context (None = not profiling)
+_current_profile = contextvars.ContextVar("sql_profile", default=None)
+
+# Profiles that see every statement in the process, whatever thread or
+# event loop it runs on (query_budget uses these so it works with TestClient)
+_global_profiles = []
+_global_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is None and not _global_profiles:
+        return  # nobody is profiling; keep the normal path cheap
+    conn.info.setdefault("_profiling_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_profiling_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+    if _global_profiles:
+        with _global_lock:
+            profiles = list(_global_profiles)
+        for profile in profiles:
+            profile.record(statement, seconds)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("_profiling_started"):
+        connection.info["_profiling_started"].pop()
+
+
+@contextmanager
+def profile_queries(keep_slowest: int = 5):
+    """
+    Profiles every statement run in this context (and in threadpool calls
+    made from it) until the block exits.
+    """
+    profile = QueryProfile(keep_slowest)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    More SQL statements ran than the budget allows (usually an N+1).
+    """
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = ""):
+    """
+    Fails with QueryBudgetExceeded if the block runs more than max_queries
+    statements, listing the slowest ones. Counts statements from any thread,
+    so it works around a TestClient request:
+
+        with query_budget(3, "GET /assignments/"):
+            client.get("/assignments/", headers=headers)
+
+    Meant for tests/CI, where one request runs at a time.
+    """
+    profile = QueryProfile(keep_slowest=max(max_queries + 1, 5))
+    with _global_lock:
+        _global_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        with _global_lock:
+            _global_profiles.remove(profile)
+    if profile.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label or 'Block'} ran {profile.count} queries, budget is {max_queries}\n{profile.summary()}"
+        )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles each request's SQL (only added when SQL_PROFILING is on).
+    Adds X-DB-Query-Count and X-DB-Time-Ms to the response, logs the slowest
+    statements at DEBUG, and warns when a request passes SQL_QUERY_WARN_COUNT.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries(settings.SQL_PROFILING_SLOWEST) as profile:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(profile.count).encode()))
+                    headers.append((b"x-db-time-ms", f"{profile.total_seconds * 1000:.1f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                request = f"{scope['method']} {scope['path']}"
+                if settings.SQL_QUERY_WARN_COUNT and profile.count > settings.SQL_QUERY_WARN_COUNT:
+                    logger.warning("%s: %s", request, profile.summary())
+                elif logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("%s: %s", request, profile.summary())
@@ -0,0 +1,108 @@
+# app/revocation.py
+
+# Which access tokens are no longer good, without a database read per request.
+#
+# Tokens carry the user's id, role and token_version ("tv") from when they
+# were issued, so auth.get_current_principal can trust them as they are.
+# Changing the password or deactivating the account bumps token_version and
+# stamps tokens_revoked_at (crud.revoke_user_tokens). After that every older
+# token is stale, but only until it expires anyway. So the only users that
+# need to be remembered are those revoked within the last
+# ACCESS_TOKEN_EXPIRE_MINUTES. For them this process keeps
+# {user_id: current token_version}.
+#
+# The set is reloaded from the users table every REVOCATION_REFRESH_SECONDS,
+# so a revocation made by another worker applies within that time. One made
+# in this process (revocations.add) applies straight away.
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from . import database, models
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationSet:
+    """
+    {user_id: token_version} for recently revoked users. A token is revoked
+    if its user is in here with a higher version than the token's.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._added = {}  # revocations made here since the last reload: user_id -> (version, time)
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    def is_revoked(self, user_id: int, token_version: int) -> bool:
+        current = self._versions.get(user_id)
+        return current is not None and token_version < current
+
+    def add(self, user_id: int, token_version: int):
+        with self._lock:
+            if token_version > self._versions.get(user_id, -1):
+                self._versions[user_id] = token_version
+            self._added[user_id] = (token_version, time.time())
+
+    def replace(self, versions: dict, started_at: float):
+        """
+        Swaps in a fresh load that began at `started_at` (time.time()).
+        Local revocations made since then may not have been committed when
+        the load read the table, so they are kept.
+        """
+        with self._lock:
+            versions = dict(versions)
+            for user_id, (version, added_at) in list(self._added.items()):
+                if added_at >= started_at:
+                    versions[user_id] = max(version, versions.get(user_id, -1))
+                else:
+                    del self._added[user_id]
+            self._versions = versions
+            self.loaded_at = started_at
+
+    def __len__(self):
+        return len(self._versions)
+
+
+revocations = RevocationSet()
+
+
+def load(db) -> dict:
+    """
+    {user_id: token_version} for users whose tokens were revoked recently
+    enough that some of them may not have expired yet.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    rows = db.execute(
+        select(models.User.id, models.User.token_version).where(models.User.tokens_revoked_at >= cutoff)
+    )
+    return dict(rows.all())
+
+
+def refresh():
+    started_at = time.time()
+    with database.SessionLocal() as db:
+        revocations.replace(load(db), started_at)
+    return len(revocations)
+
+
+async def run_refresher():
+    """
+    Background loop (started from main.py's lifespan, after its first
+    refresh()) that reloads the set. Until a load has worked (the first one
+    can fail if the database is down at startup) it tries every second.
+    """
+    while True:
+        await asyncio.sleep(settings.REVOCATION_REFRESH_SECONDS if revocations.loaded_at else 1)
+        try:
+            await run_in_threadpool(refresh)
+        except Exception:
+            logger.exception("Reloading revoked tokens failed")
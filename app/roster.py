@@ -0,0 +1,224 @@
+# app/roster.py
+
+# Bulk import of user accounts (a whole intake of students at once).
+#
+# Input is CSV (with a header row) or JSONL, with the same fields as
+# POST /users/: email, password, full_name, reg_number, role.
+# Rows are handled in batches: uniqueness is checked with one query per
+# batch, passwords are hashed in parallel on the password pool, and the
+# batch is written with one bulk INSERT (COPY on Postgres).
+# Every row gets a line in the report, which is streamed back as it goes.
+#
+# From the command line:
+#   python -m app.roster students.csv > report.jsonl
+
+import csv
+import io
+import json
+import sys
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import auth, database, models, schemas
+
+BATCH_SIZE = 500
+
+# Every column a new user needs: COPY doesn't apply the model's Python-side
+# defaults, so NOT NULL ones without a server default must be listed here
+USER_COLUMNS = ("email", "full_name", "reg_number", "hashed_password", "role", "is_active", "token_version")
+
+
+def parse_rows(lines, fmt: str):
+    """
+    Yields (line_number, row_dict) from CSV or JSONL text lines.
+    A row that can't be parsed comes through as (line_number, error_message).
+    """
+    if fmt == "jsonl":
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, "Expected a JSON object"
+                continue
+            yield line_number, row
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Line 1 is the header; empty cells mean "not given"
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in (None, "")}
+
+
+def _validate(row: dict):
+    """
+    Same rules as POST /users/. Returns (UserCreate, None) or (None, error).
+    """
+    try:
+        user = schemas.UserCreate(**row)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+    if user.role == models.UserRole.student and not user.reg_number:
+        return None, "Registration number is required for students."
+    if user.role == models.UserRole.lecturer and user.reg_number:
+        return None, "Lecturer cannot have a registration number."
+    return user, None
+
+
+def _copy_users(db: Session, rows: list):
+    # COPY ... FROM STDIN through the session's own connection/transaction
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in USER_COLUMNS])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY users ({', '.join(USER_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_users(db: Session, rows: list):
+    if db.get_bind().dialect.name == "postgresql" and db.get_bind().dialect.driver == "psycopg2":
+        _copy_users(db, rows)
+    else:
+        db.execute(insert(models.User), rows)
+
+
+def _import_batch(db: Session, batch: list):
+    """
+    batch: [(line_number, UserCreate)] that already passed validation.
+    Returns {line_number: error or None}.
+    """
+    outcome = {}
+
+    emails = {user.email for _, user in batch}
+    reg_numbers = {user.reg_number for _, user in batch if user.reg_number}
+    taken_emails = set(db.scalars(select(models.User.email).where(models.User.email.in_(emails))))
+    taken_regs = set(db.scalars(
+        select(models.User.reg_number).where(models.User.reg_number.in_(reg_numbers))
+    )) if reg_numbers else set()
+
+    accepted = []
+    for line_number, user in batch:
+        if user.email in taken_emails:
+            outcome[line_number] = "Email already registered"
+        elif user.reg_number and user.reg_number in taken_regs:
+            outcome[line_number] = "Registration number already registered"
+        else:
+            accepted.append((line_number, user))
+            # Later rows in the same file can't reuse these either
+            taken_emails.add(user.email)
+            if user.reg_number:
+                taken_regs.add(user.reg_number)
+
+    if not accepted:
+        return outcome
+
+    hashes = auth.password_pool.hash_many([user.password for _, user in accepted])
+    rows = [
+        {
+            "email": user.email,
+            "full_name": user.full_name,
+            "reg_number": user.reg_number,
+            "hashed_password": hashed,
+            "role": models.UserRole(user.role).name,
+            "is_active": True,
+            "token_version": 0,
+        }
+        for (_, user), hashed in zip(accepted, hashes)
+    ]
+
+    # COPY goes through the raw DBAPI cursor, so a clash there raises the
+    # driver's own IntegrityError (e.g. psycopg2's UniqueViolation), not SQLAlchemy's
+    integrity_errors = (IntegrityError, db.get_bind().dialect.loaded_dbapi.IntegrityError)
+    try:
+        _insert_users(db, rows)
+        db.commit()
+        for line_number, _ in accepted:
+            outcome[line_number] = None
+    except integrity_errors:
+        # Someone registered one of these while we were hashing.
+        # Redo this batch row by row so only the clashing rows fail.
+        db.rollback()
+        for (line_number, _), row in zip(accepted, rows):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(models.User), [row])
+                outcome[line_number] = None
+            except IntegrityError:
+                outcome[line_number] = "Email or registration number already registered"
+        db.commit()
+    return outcome
+
+
+def import_roster(db: Session, rows, batch_size: int = BATCH_SIZE):
+    """
+    Imports (line_number, row) pairs from parse_rows().
+    Yields one report dict per row, then a final {"summary": ...}.
+    """
+    created = failed = 0
+    batch = []
+
+    def flush():
+        nonlocal created, failed
+        outcome = _import_batch(db, batch)
+        for line_number, user in batch:
+            error = outcome[line_number]
+            if error is None:
+                created += 1
+                yield {"line": line_number, "email": user.email, "status": "created"}
+            else:
+                failed += 1
+                yield {"line": line_number, "email": user.email, "status": "error", "error": error}
+        batch.clear()
+
+    for line_number, row in rows:
+        if isinstance(row, str):
+            failed += 1
+            yield {"line": line_number, "status": "error", "error": row}
+            continue
+        user, error = _validate(row)
+        if error:
+            failed += 1
+            yield {"line": line_number, "email": row.get("email"), "status": "error", "error": error}
+            continue
+        batch.append((line_number, user))
+        if len(batch) >= batch_size:
+            yield from flush()
+
+    if batch:
+        yield from flush()
+    yield {"summary": {"created": created, "failed": failed}}
+
+
+def stream_report(lines, fmt: str):
+    """
+    Runs an import in its own session and yields the report as JSONL.
+    Used by POST /users/import (as a streaming response) and the CLI.
+    """
+    db = database.SessionLocal()
+    try:
+        for entry in import_roster(db, parse_rows(lines, fmt)):
+            yield json.dumps(entry) + "\n"
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1]
+    fmt = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+    with open(path, newline="", encoding="utf-8") as f:
+        for line in stream_report(f, fmt):
+            sys.stdout.write(line)
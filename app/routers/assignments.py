@@ -1,11 +1,13 @@
 # app/routers/assignments.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 # Import our app modules
-from .. import models, schemas, database, auth
+from .. import schemas, database, auth, crud_async, etags, gradebook, responses
+from ..settings import settings
 
 router = APIRouter(
     prefix="/assignments",
@@ -14,38 +16,127 @@ router = APIRouter(
 
 # 1. CREATE ASSIGNMENT (This is the missing function!)
 @router.post("/", response_model=schemas.Assignment)
-def create_assignment(
+async def create_assignment(
     assignment: schemas.AssignmentCreate, 
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
     # Only lecturers can create assignments
     if current_user.role != auth.UserRole.lecturer:
          raise HTTPException(status_code=403, detail="Not authorized")
 
-    # The magic part: **assignment.dict() automatically unpacks title, description, AND DEADLINE
-    new_assignment = models.Assignment(
-        **assignment.dict(), 
-        lecturer_id=current_user.id
-    )
-    
-    db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
-    return new_assignment
+    # Title, description AND DEADLINE, plus the cache version bump (see crud_async)
+    return await crud_async.create_assignment(db, assignment, current_user.id)
 
 
 
 @router.get("/", response_model=List[schemas.Assignment])
-def read_assignments(
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+async def read_assignments(
+    request: Request,
+    response: Response,
+    lecturer_id: Optional[int] = None,
+    deadline_after: Optional[datetime] = None,
+    deadline_before: Optional[datetime] = None,
+    cursor: Optional[int] = Query(None, description="Last assignment id of the previous page (from X-Next-Cursor)"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
     # Rule 1: If User is a Lecturer, only show THEIR assignments
     if current_user.role == auth.UserRole.lecturer:
-        return db.query(models.Assignment).filter(
-            models.Assignment.lecturer_id == current_user.id
-        ).all()
+        lecturer_id = current_user.id
+
+    # Unchanged since the client's copy (If-None-Match)? Then 304 right away.
+    scope = etags.assignments_scope(lecturer_id if current_user.role == auth.UserRole.lecturer else None)
+    version = await crud_async.get_cache_version(db, scope)
+    not_modified = etags.conditional(request, response, scope, version, variant=request.url.query)
+    if not_modified is not None:
+        return not_modified
     
-    # Rule 2: If User is a Student, show EVERYTHING
-    return db.query(models.Assignment).all()
\ No newline at end of file
+    # Rule 2: If User is a Student, show EVERYTHING (optionally filtered)
+    assignments, next_cursor = await crud_async.get_assignments(
+        db,
+        lecturer_id=lecturer_id,
+        # Stored in UTC; without an offset these are server local time, like deadlines
+        deadline_after=schemas.utc_naive(deadline_after),
+        deadline_before=schemas.utc_naive(deadline_before),
+        cursor=cursor,
+        limit=limit,
+    )
+    # More pages? The client passes this back as ?cursor=
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    # Plain rows, encoded straight to JSON (see responses.py)
+    return responses.rows_response(assignments, response, utc_columns=("deadline",))
+
+
+@router.get("/stats", response_model=schemas.LecturerStats)
+async def read_my_gradebook(
+    bucket_width: int = Query(10, ge=1, le=100, description="Histogram bucket size, in grade points"),
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Class statistics over all of the lecturer's assignments, and per assignment.
+    Served from the gradebook summary tables, so it costs the same at 10 or
+    10,000 submissions.
+    """
+    if current_user.role != auth.UserRole.lecturer:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    assignments, grade_counts = await crud_async.get_lecturer_stats(db, current_user.id)
+    students = await crud_async.count_active_students(db)
+
+    all_grades = {}
+    for counts in grade_counts.values():
+        for grade, n in counts.items():
+            all_grades[grade] = all_grades.get(grade, 0) + n
+    per_assignment = [
+        schemas.AssignmentStats(
+            assignment_id=row.id,
+            title=row.title,
+            deadline=row.deadline,
+            **gradebook.summarize(
+                row._mapping if row.submission_count is not None else None,
+                grade_counts.get(row.id, {}), students, bucket_width=bucket_width,
+            ),
+        )
+        for row in assignments
+    ]
+    return schemas.LecturerStats(
+        lecturer_id=current_user.id,
+        assignment_count=len(assignments),
+        assignments=per_assignment,
+        **gradebook.summarize(
+            gradebook.add_totals(row._mapping for row in assignments),
+            all_grades, students, assignment_count=len(assignments), bucket_width=bucket_width,
+        ),
+    )
+
+
+@router.get("/{assignment_id}/stats", response_model=schemas.AssignmentStats)
+async def read_assignment_gradebook(
+    assignment_id: int,
+    bucket_width: int = Query(10, ge=1, le=100, description="Histogram bucket size, in grade points"),
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Class statistics for one assignment: counts, mean, median, histogram,
+    late and missing students. Only for the lecturer who owns it.
+    """
+    assignment = await crud_async.get_assignment(db, assignment_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    if assignment.lecturer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view these statistics")
+
+    totals, grade_counts = await crud_async.get_assignment_stats(db, assignment_id)
+    students = await crud_async.count_active_students(db)
+    return schemas.AssignmentStats(
+        assignment_id=assignment.id,
+        title=assignment.title,
+        deadline=assignment.deadline,
+        **gradebook.summarize(totals, grade_counts, students, bucket_width=bucket_width),
+    )
@@ -1,23 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from .. import crud, auth
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import crud_async, auth
+from ..database import get_async_db
 
 router = APIRouter(tags=["Authentication"])
 
 @router.post("/login/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    # This route is fully async: neither the DB lookup nor bcrypt
+    # (which runs on its own pool) holds a request thread.
+    user = await crud_async.get_user_by_email(db, email=form_data.username)
     
-    user = crud.get_user_by_email(db, email=form_data.username)
-    
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user or not await auth.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if user.is_active is False:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="This account has been deactivated")
     
-    access_token = auth.create_access_token(data={"sub": user.email,
-                                                  "role": user.role.value if hasattr(user.role, 'value') else user.role})
+    # id, role and token version go in the token so requests don't
+    # have to load the user again (see auth.get_current_principal)
+    access_token = auth.create_access_token(data=auth.token_claims(user))
+
+    # If BCRYPT_ROUNDS changed since this hash was made, upgrade it now
+    # while we still have the plain password.
+    if auth.password_needs_rehash(user.hashed_password):
+        user.hashed_password = await auth.get_password_hash_async(form_data.password)
+        await db.commit()
+
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,14 +1,15 @@
 # app/routers/submissions.py
+import os
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import shutil
-import os
-import time # To generate unique filenames
+from typing import List, Optional
 
 # Import everything we need
-from .. import models, schemas, database, crud, auth 
+from .. import models, schemas, database, crud, crud_async, auth, uploads, storage, etags, exports, responses, admission, gradebook
+from ..settings import settings
 
 router = APIRouter(
     prefix="/submissions",
@@ -18,95 +19,197 @@ router = APIRouter(
 @router.post("/{assignment_id}", response_model=schemas.Submission)
 async def submit_assignment(
     assignment_id: int, 
+    request: Request,
     file: UploadFile = File(...), 
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
+    # NOTE: This handler runs on the event loop, so nothing in it may block:
+    # the DB goes through the async session, disk writes through the threadpool.
+
     # 1. Validate Assignment exists
-    assignment = db.query(models.Assignment).filter(models.Assignment.id == assignment_id).first()
+    assignment = await crud_async.get_assignment(db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     # <---  CHECK DEADLINE
-    if assignment.deadline and datetime.now() > assignment.deadline:
+    # Against when the upload arrived, not now: time spent waiting for an
+    # upload slot doesn't count (see admission.py). The same time is stored
+    # as submitted_at, so the gradebook agrees with this check.
+    submitted_at = datetime.utcfromtimestamp(admission.arrival_time(request))
+    if gradebook.is_late(submitted_at, assignment.deadline):
          raise HTTPException(status_code=400, detail="Deadline has passed! Submission rejected.")
+    # ...but receiving the file does, past a grace period
+    if admission.received_too_late(request, assignment.deadline):
+         raise HTTPException(status_code=400, detail="The file finished arriving too long after the deadline. Submission rejected.")
     
 
     # 2. Save the File
-    # Create the directory if it doesn't exist
-    upload_dir = "uploads/submissions"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate a unique filename (student_id_assignment_id_timestamp.pdf) to avoid overwrites on disk
-    timestamp = int(time.time())
-    file_extension = file.filename.split(".")[-1]
-    saved_filename = f"{current_user.id}_{assignment_id}_{timestamp}.{file_extension}"
-    file_location = f"{upload_dir}/{saved_filename}"
-    
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Streamed in chunks into the content-addressed store (enforces
+    # MAX_UPLOAD_BYTES and hashes as it goes). Identical files share one blob.
+    # Compressed on the way if STORAGE_COMPRESSION is on and it's worth it.
+    stored = await storage.store_stream(uploads.iter_upload_file(file), filename=file.filename)
 
     # 3. Create the Schema Object (The missing link!)
-    submission_data = schemas.SubmissionCreate(file_path=file_location)
+    submission_data = schemas.SubmissionCreate(
+        file_path=stored.path,
+        file_size=stored.size,
+        stored_size=stored.stored_size,
+        content_encoding=stored.content_encoding,
+        checksum=stored.checksum,
+        original_filename=file.filename,
+    )
 
     # 4. Call CRUD (Upsert logic)
-    return crud.create_submission(
+    return await crud_async.create_submission(
         db=db, 
         submission=submission_data, 
         user_id=current_user.id, 
-        assignment_id=assignment_id
+        assignment_id=assignment_id,
+        deadline=assignment.deadline,
+        submitted_at=submitted_at,
     )
 
 @router.get("/assignment/{assignment_id}", response_model=List[schemas.Submission])
-def read_submissions_for_assignment(
+async def read_submissions_for_assignment(
     assignment_id: int, 
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    response: Response,
+    graded: Optional[bool] = None,
+    cursor: Optional[int] = Query(None, description="Last submission id of the previous page (from X-Next-Cursor)"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
     # Only the lecturer who created the assignment should see submissions
-    assignment = db.query(models.Assignment).filter(models.Assignment.id == assignment_id).first()
+    assignment = await crud_async.get_assignment(db, assignment_id)
     if not assignment:
          raise HTTPException(status_code=404, detail="Assignment not found")
          
     if assignment.lecturer_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view these submissions")
         
-    submissions = db.query(models.Submission).filter(models.Submission.assignment_id == assignment_id).all()
-    return submissions
+    submissions, next_cursor = await crud_async.get_submissions_by_assignment(
+        db, assignment_id=assignment_id, graded=graded, cursor=cursor, limit=limit
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    # Plain rows, encoded straight to JSON (see responses.py)
+    return responses.rows_response(submissions, response)
+
+@router.get("/assignment/{assignment_id}/export")
+def export_submissions_for_assignment(
+    assignment_id: int,
+    db: Session = Depends(database.get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Downloads every submission for the assignment as one ZIP, plus a
+    manifest.csv of grades. Files are named by the student's reg number.
+    The archive is built while it streams, so it starts immediately and
+    never sits in memory or on disk.
+    """
+    assignment = db.query(models.Assignment).filter(models.Assignment.id == assignment_id).first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    if assignment.lecturer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view these submissions")
+
+    rows = crud.get_submissions_for_export(db, assignment_id)
+    return StreamingResponse(
+        exports.stream_submissions_zip(rows),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="assignment-{assignment_id}-submissions.zip"'},
+    )
 
 
 @router.put("/{submission_id}/grade", response_model=schemas.Submission)
-def grade_submission(
+async def grade_submission(
     submission_id: int, 
     grade_data: schemas.SubmissionGrade,
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    # 1. Find the submission
-    submission = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
+    # 1. Find the submission (and who owns its assignment, in the same query)
+    # (locked until we commit, so the gradebook sees the grade being replaced)
+    submission, lecturer_id = await crud_async.get_submission_with_lecturer(db, submission_id, for_update=True)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
 
-    # 2. Find the assignment related to this submission
-    assignment = db.query(models.Assignment).filter(models.Assignment.id == submission.assignment_id).first()
-    
-    # 3. SECURITY CHECK: Is the current user the owner of this assignment?
-    if assignment.lecturer_id != current_user.id:
+    # 2. SECURITY CHECK: Is the current user the owner of this assignment?
+    if lecturer_id != current_user.id:
         raise HTTPException(status_code=403, detail="You are not authorized to grade this assignment.")
         
-    # 4. Save Grade
-    submission.grade = grade_data.grade
-    submission.feedback = grade_data.feedback
-    db.commit()
-    db.refresh(submission)
-    return submission
+    # 3. Save Grade
+    return await crud_async.grade_submission(db, submission_id, grade_data)
+
+@router.put("/grades", response_model=schemas.BulkGradeResult)
+async def grade_submissions_bulk(
+    grades: schemas.BulkGradeRequest,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Grade many submissions in one call. Each item is reported on separately;
+    submissions that don't exist or belong to another lecturer are skipped.
+    """
+    if current_user.role != auth.UserRole.lecturer:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    results = await crud_async.grade_submissions_bulk(db, grades.items, lecturer_id=current_user.id)
+    graded = sum(1 for _, item_status in results if item_status == "graded")
+    return schemas.BulkGradeResult(
+        graded=graded,
+        failed=len(results) - graded,
+        results=[
+            schemas.BulkGradeItemResult(submission_id=submission_id, status=item_status)
+            for submission_id, item_status in results
+        ],
+    )
+
+@router.get("/{submission_id}/file")
+async def download_submission_file(
+    submission_id: int,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Downloads the submitted file. Only the student who submitted it and the
+    lecturer who owns the assignment may. Supports Range requests (for a
+    compressed file, only when the client takes it compressed).
+    """
+    submission, lecturer_id = await crud_async.get_submission_with_lecturer(db, submission_id)
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    if current_user.id not in (submission.student_id, lecturer_id):
+        raise HTTPException(status_code=403, detail="Not authorized to download this file")
+
+    filename = submission.original_filename or os.path.basename(submission.file_path)
+    return await storage.file_response(
+        submission.file_path,
+        filename,
+        content_encoding=submission.content_encoding,
+        file_size=submission.file_size,
+        accept_encoding=request.headers.get("accept-encoding"),
+    )
 
 @router.get("/me/{assignment_id}", response_model=schemas.Submission)
-def read_my_submission(
+async def read_my_submission(
     assignment_id: int, 
-    db: Session = Depends(database.get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
 ):
-    submission = crud.get_student_submission(db, student_id=current_user.id, assignment_id=assignment_id)
+    # Unchanged since the client's copy (If-None-Match)? Then 304 right away.
+    scope = etags.submission_scope(current_user.id, assignment_id)
+    version = await crud_async.get_cache_version(db, scope)
+    not_modified = etags.conditional(request, response, scope, version)
+    if not_modified is not None:
+        return not_modified
+
+    submission = await crud_async.get_student_submission(db, student_id=current_user.id, assignment_id=assignment_id)
     
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -0,0 +1,138 @@
+# app/routers/uploads.py
+
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas, database, crud_async, auth, uploads, storage, admission, gradebook
+
+# Resumable uploads for large submissions (mainly the mobile app):
+#   1. POST   /submissions/uploads/                  -> start a session
+#   2. PUT    /submissions/uploads/{id}?offset=N     -> send the next chunk (raw body)
+#   3. GET    /submissions/uploads/{id}              -> ask where to resume from
+#   4. POST   /submissions/uploads/{id}/complete     -> turn it into a submission
+# If the connection drops, the client asks (3) and carries on from there.
+router = APIRouter(
+    prefix="/submissions/uploads",
+    tags=["Uploads"]
+)
+
+
+def _session_response(session: dict):
+    return schemas.UploadSession(
+        upload_id=session["upload_id"],
+        assignment_id=session["assignment_id"],
+        filename=session["filename"],
+        total_size=session["total_size"],
+        offset=session["offset"],
+        expires_at=datetime.fromtimestamp(session["expires_at"]),
+    )
+
+
+async def _get_open_assignment(db: AsyncSession, assignment_id: int, submitted_at: datetime = None):
+    # submitted_at: when the request arrived (UTC, from admission.arrival_time), if not now
+    assignment = await crud_async.get_assignment(db, assignment_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if gradebook.is_late(submitted_at or datetime.utcnow(), assignment.deadline):
+        raise HTTPException(status_code=400, detail="Deadline has passed! Submission rejected.")
+    return assignment
+
+
+async def _get_session_or_404(upload_id: str, current_user):
+    session = await uploads.get_session(upload_id, current_user.id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+@router.post("/", response_model=schemas.UploadSession, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload: schemas.UploadSessionCreate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    await _get_open_assignment(db, upload.assignment_id)
+    session = await uploads.create_session(
+        user_id=current_user.id,
+        assignment_id=upload.assignment_id,
+        filename=upload.filename,
+        total_size=upload.total_size,
+    )
+    return _session_response(session)
+
+
+@router.get("/{upload_id}", response_model=schemas.UploadSession)
+async def read_upload(
+    upload_id: str,
+    response: Response,
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    session = await _get_session_or_404(upload_id, current_user)
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return _session_response(session)
+
+
+@router.put("/{upload_id}", response_model=schemas.UploadSession)
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    response: Response,
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    session = await _get_session_or_404(upload_id, current_user)
+    # The body is streamed straight into the .part file, never held in memory
+    session = await uploads.append_chunk(session, offset, request.stream())
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return _session_response(session)
+
+
+@router.post("/{upload_id}/complete", response_model=schemas.Submission)
+async def complete_upload(
+    upload_id: str,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    session = await _get_session_or_404(upload_id, current_user)
+    if session["offset"] != session["total_size"]:
+        raise HTTPException(
+            status_code=409,
+            detail="Upload is not complete yet",
+            headers={"Upload-Offset": str(session["offset"])},
+        )
+    assignment_id = session["assignment_id"]
+    # One time for both the deadline check and the stored submitted_at
+    submitted_at = datetime.utcfromtimestamp(admission.arrival_time(request))
+    assignment = await _get_open_assignment(db, assignment_id, submitted_at)
+
+    # Same store and upsert as the single-shot POST /submissions/{assignment_id}
+    stored = await storage.store_file(uploads.session_data_path(session), filename=session["filename"])
+    await uploads.discard_session(session)
+
+    submission_data = schemas.SubmissionCreate(
+        file_path=stored.path,
+        file_size=stored.size,
+        stored_size=stored.stored_size,
+        content_encoding=stored.content_encoding,
+        checksum=stored.checksum,
+        original_filename=session["filename"],
+    )
+    return await crud_async.create_submission(
+        db=db,
+        submission=submission_data,
+        user_id=current_user.id,
+        assignment_id=assignment_id,
+        deadline=assignment.deadline,
+        submitted_at=submitted_at,
+    )
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    upload_id: str,
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    session = await _get_session_or_404(upload_id, current_user)
+    await uploads.discard_session(session)
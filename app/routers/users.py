@@ -1,9 +1,12 @@
 # app/routers/users.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from .. import crud, schemas, models, auth
-from ..database import get_db, SessionLocal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import crud_async, schemas, models, auth, roster
+from ..settings import settings
+from ..database import get_async_db
 
 # Create a "router"
 router = APIRouter(
@@ -12,10 +15,12 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    
+async def create_new_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Async, so a signup burst waits on the password pool without holding
+    # threadpool threads the sync routes need (see hashing.PasswordPool)
+
     # 1. Check if email or reg number already exists
-    db_user_email = crud.get_user_by_email(db, email=user.email)
+    db_user_email = await crud_async.get_user_by_email(db, email=user.email)
     if db_user_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,7 +36,7 @@ def create_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
                 detail="Registration number is required for students."
             )
         
-        db_user_reg = crud.get_user_by_reg_number(db, reg_number=user.reg_number)
+        db_user_reg = await crud_async.get_user_by_reg_number(db, reg_number=user.reg_number)
         if db_user_reg:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -47,7 +52,7 @@ def create_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         user.reg_number = None
 
     # 3. If all checks pass, create the user
-    return crud.create_user(db=db, user=user)
+    return await crud_async.create_user(db=db, user=user)
 
 @router.get("/me", response_model=schemas.User)
 def read_users_me(current_user: schemas.User = Depends(auth.get_current_user)):
@@ -60,4 +65,57 @@ def read_users_me(current_user: schemas.User = Depends(auth.get_current_user)):
     3. If valid, it gives us the 'current_user' object.
     4. If invalid, it kicks the user out (401 error).
     """
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.put("/me/password")
+async def change_my_password(
+    passwords: schemas.PasswordChange,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Changes the caller's password. Every token issued before this stops
+    working, including the one used here; a new one is returned.
+    """
+    user = await crud_async.get_user(db, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not await auth.verify_password_async(passwords.current_password, user.hashed_password):
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+
+    user = await crud_async.change_password(db, user, passwords.new_password)
+    return {"access_token": auth.create_access_token(data=auth.token_claims(user)), "token_type": "bearer"}
+
+@router.post("/import")
+async def import_users(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    """
+    Creates many accounts at once from a CSV (with header) or JSONL roster.
+    Columns/keys are the same as for POST /users/.
+
+    The response is a JSONL report streamed back as the import goes:
+    one line per row ("created" or "error" with the reason), then a summary.
+    Format is taken from ?format= or else the file name (.jsonl/.ndjson).
+    """
+    if current_user.role != auth.UserRole.lecturer:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    content = await file.read(settings.MAX_UPLOAD_BYTES + 1)
+    if len(content) > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Roster file is too large")
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Roster file must be UTF-8")
+
+    if format is None:
+        format = "jsonl" if (file.filename or "").endswith((".jsonl", ".ndjson")) else "csv"
+
+    # A plain generator, so Starlette runs it in the threadpool batch by batch
+    return StreamingResponse(
+        roster.stream_report(text.splitlines(keepends=True), format),
+        media_type="application/x-ndjson",
+    )
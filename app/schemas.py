@@ -3,8 +3,28 @@
 # Import field_validator from pydantic
 from pydantic import BaseModel, EmailStr,Field ,field_validator 
 from .models import UserRole  
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import List, Optional
+
+
+def utc_naive(value: datetime | None) -> datetime | None:
+    """
+    A datetime as the database keeps them all: naive UTC. Aware values are
+    converted; naive ones are taken as the server's local time, which is what
+    a deadline without an offset has always meant.
+    """
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    """
+    A naive UTC datetime from the database, marked as UTC for the client.
+    """
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
 
 # --- User Schemas ---
 
@@ -17,13 +37,6 @@ class UserBase(BaseModel):
     full_name: str | None = None
     reg_number: str | None = None
 
-# app/schemas.py
-
-from pydantic import BaseModel, field_validator
-from .models import UserRole
-
-# ... (UserBase class remains unchanged) ...
-
 class UserCreate(UserBase):
     """
     Schema for creating a new user.
@@ -63,6 +76,13 @@ class User(UserBase):
     class Config:
         from_attributes = True
         
+class PasswordChange(BaseModel):
+    """
+    INPUT: The current password and the new one.
+    """
+    current_password: str
+    new_password: str = Field(..., min_length=6)
+
 class AssignmentBase(BaseModel):
     """
     Shared properties for both creating and reading.
@@ -76,8 +96,14 @@ class AssignmentCreate(AssignmentBase):
     INPUT: What the teacher sends to us.
     We DON'T ask for teacher_id here, because we will grab it 
     securely from their Login Token instead.
+    The deadline may carry an offset; without one it is server local time.
+    It is stored in UTC.
     """
-    pass 
+
+    @field_validator('deadline')
+    @classmethod
+    def deadline_to_utc(cls, v: datetime | None) -> datetime | None:
+        return utc_naive(v)
 
 class Assignment(AssignmentBase):
     """
@@ -87,45 +113,130 @@ class Assignment(AssignmentBase):
     id: int
     lecturer_id: int 
 
+    # Sent with its offset (UTC), so the app shows it in the student's own time
+    @field_validator('deadline')
+    @classmethod
+    def deadline_as_utc(cls, v: datetime | None) -> datetime | None:
+        return as_utc(v)
+
     class Config:
         # This tells Pydantic to treat the SQLAlchemy model like a dict
         from_attributes = True
 
-class Submission(BaseModel):
-    id: int
+# --- Submission Schemas ---
+
+class SubmissionBase(BaseModel):
     file_path: str
-    submitted_at: datetime
+    file_size: int | None = None
+    stored_size: int | None = None
+    content_encoding: str | None = None
+    checksum: str | None = None
+    original_filename: str | None = None
+
+class SubmissionCreate(SubmissionBase):
+    pass
+
+class Submission(SubmissionBase):
+    """
+    OUTPUT: A submission as the app sees it.
+    """
+    id: int
     student_id: int
     assignment_id: int
+    submitted_at: datetime | None = None
     grade: int | None = None
     feedback: str | None = None
+    # "pending" until the background checks have run, then "done" or "failed"
+    processing_status: str | None = None
+    content_type: str | None = None
 
     class Config:
-        from_attributes = True   
-        
+        from_attributes = True
+
 class SubmissionGrade(BaseModel):
     """
     INPUT: What the lecturer sends to grade a student.
     """
     grade: int
-    feedback: str             
+    feedback: str
 
-class SubmissionBase(BaseModel):
-    file_path: str
+class BulkGradeItem(SubmissionGrade):
+    submission_id: int
 
-class SubmissionCreate(SubmissionBase):
-    pass
+class BulkGradeRequest(BaseModel):
+    """
+    INPUT: Many grades at once (e.g. a whole class).
+    """
+    items: List[BulkGradeItem] = Field(..., min_length=1, max_length=1000)
 
-class SubmissionGrade(BaseModel):
-    grade: int
-    feedback: str
+class BulkGradeItemResult(BaseModel):
+    submission_id: int
+    # "graded", "not_found", "forbidden" or "duplicate"
+    status: str
 
-class Submission(SubmissionBase):
-    id: int
-    student_id: int
+class BulkGradeResult(BaseModel):
+    """
+    OUTPUT: What happened to each item. Items that failed don't stop the others.
+    """
+    graded: int
+    failed: int
+    results: List[BulkGradeItemResult]
+
+class UploadSessionCreate(BaseModel):
+    """
+    INPUT: Starts a resumable upload for an assignment.
+    """
     assignment_id: int
-    grade: int | None = None
-    feedback: str | None = None
+    filename: str
+    total_size: int = Field(..., gt=0)
 
-    class Config:
-        orm_mode = True    
\ No newline at end of file
+class UploadSession(BaseModel):
+    """
+    OUTPUT: Where a resumable upload is at.
+    The client sends the next chunk starting at `offset`.
+    """
+    upload_id: str
+    assignment_id: int
+    filename: str
+    total_size: int
+    offset: int
+    expires_at: datetime
+
+# --- Gradebook Schemas ---
+
+class GradeBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+class GradeSummary(BaseModel):
+    """
+    OUTPUT: Class statistics (see gradebook.py).
+    mean/median are None until something is graded.
+    """
+    submission_count: int
+    graded_count: int
+    ungraded_count: int
+    late_count: int
+    missing_count: int
+    mean: float | None = None
+    median: float | None = None
+    histogram: List[GradeBucket]
+
+class AssignmentStats(GradeSummary):
+    assignment_id: int
+    title: str
+    deadline: datetime | None = None
+
+    @field_validator('deadline')
+    @classmethod
+    def deadline_as_utc(cls, v: datetime | None) -> datetime | None:
+        return as_utc(v)
+
+class LecturerStats(GradeSummary):
+    """
+    OUTPUT: Totals over all of a lecturer's assignments, plus each one.
+    """
+    lecturer_id: int
+    assignment_count: int
+    assignments: List[AssignmentStats]
@@ -18,11 +18,118 @@ class Settings(BaseSettings):
     # can't find it, which is good for debugging.
     DATABASE_URL: str
 
+    # Optional read replica for read-only routes (see database.get_read_db)
+    DATABASE_REPLICA_URL: str | None = None
+
+    # Connection pool, per worker process. STATEMENT_TIMEOUT is Postgres only; 0 disables it.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Connections each pool opens when a worker starts (see database.warm_up), so the
+    # first requests don't wait for connecting. 0 opens them on demand only.
+    DB_POOL_WARMUP: int = 2
+
+    # Async engine used by the hot routes. By default it is derived from
+    # DATABASE_URL / DATABASE_REPLICA_URL (postgresql -> asyncpg, sqlite -> aiosqlite).
+    ASYNC_DATABASE_URL: str | None = None
+    ASYNC_DATABASE_REPLICA_URL: str | None = None
+
     # JWT secret key 
     JWT_SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # In-process cache of authenticated users (see auth.get_current_user).
+    # Set USER_CACHE_MAX_SIZE to 0 to disable it.
+    USER_CACHE_MAX_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
+    # How often each worker reloads the set of revoked access tokens
+    # (see revocation.py); a revocation made elsewhere applies within this.
+    REVOCATION_REFRESH_SECONDS: float = 30.0
+
+    # Dedicated pool for bcrypt work (see hashing.PasswordPool).
+    # BACKEND is "thread" or "process". Changing BCRYPT_ROUNDS makes
+    # existing hashes get upgraded the next time their owner logs in.
+    PASSWORD_POOL_BACKEND: str = "thread"
+    PASSWORD_POOL_WORKERS: int = 4
+    PASSWORD_POOL_MAX_QUEUE: int = 64
+    BCRYPT_ROUNDS: int = 12
+
+    # Submission uploads are streamed to disk in chunks of this size,
+    # and rejected with 413 as soon as they pass MAX_UPLOAD_BYTES.
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+
+    # Resumable uploads: a session expires this long after its last chunk,
+    # and the janitor looks for expired sessions every INTERVAL seconds.
+    UPLOAD_SESSION_TTL_SECONDS: int = 6 * 60 * 60
+    UPLOAD_JANITOR_INTERVAL_SECONDS: int = 5 * 60
+
+    # Admission control for uploads (see admission.py): uploads running at once,
+    # per student (running + waiting), how many may wait and for how long (0 = no limit)
+    UPLOAD_MAX_CONCURRENT: int = 32
+    UPLOAD_MAX_PER_USER: int = 2
+    UPLOAD_QUEUE_SIZE: int = 512
+    UPLOAD_QUEUE_TIMEOUT_SECONDS: float = 60.0
+    # Where those counts live: "local" (per worker) or "redis" (shared by every
+    # worker; needs `pip install redis`). A shared slot is released after
+    # ADMISSION_LEASE_SECONDS even if its worker died.
+    ADMISSION_BACKEND: str = "local"
+    ADMISSION_REDIS_URL: str = "redis://localhost:6379/0"
+    ADMISSION_LEASE_SECONDS: int = 10 * 60
+    # A 503 from admission control carries an Upload-Arrival token; a retry
+    # sending it back within this long of the first 503 keeps its first arrival
+    # time for the deadline check. The file itself must have arrived within
+    # UPLOAD_BODY_GRACE_SECONDS of the deadline (or of getting a slot, if later,
+    # but at most UPLOAD_ARRIVAL_TOKEN_SECONDS after the deadline).
+    UPLOAD_ARRIVAL_TOKEN_SECONDS: int = 15 * 60
+    UPLOAD_BODY_GRACE_SECONDS: int = 5 * 60
+
+    # Background processing of uploads (see jobs.py): worker threads per process,
+    # tries before a submission is marked failed, the first retry delay (doubled
+    # each retry), how long a job may run before it's presumed dead, and how
+    # often the queue is checked when nothing new was queued here
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_DELAY_SECONDS: float = 10.0
+    JOB_TIMEOUT_SECONDS: int = 10 * 60
+    JOB_POLL_INTERVAL_SECONDS: float = 5.0
+
+    # How GET /submissions/{id}/file hands over the bytes (see storage.file_response):
+    # "direct" (the app sends it), "x-accel" (nginx) or "x-sendfile" (Apache/lighttpd).
+    # For nginx, FILE_ACCEL_PREFIX must be an `internal` location aliased to uploads/.
+    FILE_DELIVERY: str = "direct"
+    FILE_ACCEL_PREFIX: str = "/protected-uploads/"
+
+    # Storage GC (see storage.collect_garbage): how often it runs, and how old
+    # an unreferenced file must be before it is deleted.
+    STORAGE_GC_INTERVAL_SECONDS: int = 60 * 60
+    STORAGE_GC_GRACE_SECONDS: int = 60 * 60
+
+    # Compress compressible uploads on disk (see storage.py): "none", "gzip",
+    # or "zstd" (needs the zstandard package). Existing files keep their
+    # encoding when this changes. Level as for gzip (1-9) or zstd (1-22).
+    STORAGE_COMPRESSION: str = "none"
+    STORAGE_COMPRESSION_LEVEL: int = 6
+
+    # Serve Prometheus metrics on GET /metrics (keep it off the public internet)
+    METRICS_ENABLED: bool = True
+
+    # Per-request SQL profiling (see profiling.py): adds X-DB-Query-Count / X-DB-Time-Ms
+    # headers and logs the slowest statements. A request running more than
+    # SQL_QUERY_WARN_COUNT statements is logged as a warning (0 = never).
+    SQL_PROFILING: bool = False
+    SQL_PROFILING_SLOWEST: int = 3
+    SQL_QUERY_WARN_COUNT: int = 0
+
+    # Listing endpoints are paginated: page size if the client doesn't ask, and the most it may ask for
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+
 class Config:
         env_file = ".env"
         
@@ -0,0 +1,435 @@
+# app/storage.py
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+import uuid
+import zlib
+from typing import NamedTuple
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import database, models, uploads
+from .settings import settings
+
+# Optional: only needed for STORAGE_COMPRESSION="zstd"
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed store for submission files.
+# Every file is stored once, named by the SHA-256 of its contents, under a
+# two-level fan-out so no single directory grows too large:
+#   uploads/blobs/ab/cd/abcd1234...
+# Submission rows point at a blob through `checksum` (and `file_path`),
+# so the number of rows with a given checksum is that blob's reference count.
+UPLOAD_ROOT = "uploads"
+BLOB_DIR = "uploads/blobs"
+TMP_DIR = os.path.join(BLOB_DIR, "tmp")
+
+
+# Compression at rest (STORAGE_COMPRESSION). A compressible upload is
+# compressed while it streams to disk and stored as <checksum>.gz / .zst; the
+# checksum, file_size and deduplication are still about the original bytes.
+# The submission records which encoding its blob has (content_encoding) and
+# how much disk it takes (stored_size).
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Formats that are already compressed. Compressing them again costs CPU and
+# gains nothing, so they are stored (and exported) as-is.
+ALREADY_COMPRESSED = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".mp4", ".m4a", ".mov", ".webm", ".ogg",
+}
+# ...and the same by their first bytes, for files with a misleading name
+COMPRESSED_MAGIC = (
+    b"PK\x03\x04", b"%PDF-", b"\x1f\x8b", b"7z\xbc\xaf\x27\x1c", b"\x28\xb5\x2f\xfd",
+    b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"Rar!",
+)
+
+# A compressed blob has to be at least this much smaller than the original
+# to be kept; otherwise it is stored as-is
+MIN_SAVING = 0.1
+
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int                   # the original (logical) size
+    checksum: str               # SHA-256 of the original bytes
+    stored_size: int            # bytes on disk
+    content_encoding: str | None  # "gzip", "zstd" or None (as uploaded)
+
+
+def blob_path(checksum: str, encoding: str = None):
+    return os.path.join(BLOB_DIR, checksum[:2], checksum[2:4], checksum + CODEC_SUFFIXES.get(encoding, ""))
+
+
+def _existing_blob(checksum: str):
+    # Identical contents are stored once, in whichever encoding came first
+    for encoding in (None, *CODEC_SUFFIXES):
+        path = blob_path(checksum, encoding)
+        if os.path.exists(path):
+            return path, encoding
+    return None, None
+
+
+def _commit_blob(tmp_path: str, checksum: str, encoding: str = None):
+    """
+    Moves a fully written temp file to its content address.
+    If the blob already exists the temp copy is dropped (deduplication),
+    and the blob's mtime is refreshed so GC treats it as recently used.
+    Returns (path, encoding) of the blob that is kept.
+    """
+    path, existing_encoding = _existing_blob(checksum)
+    if path:
+        os.utime(path)
+        os.remove(tmp_path)
+        return path, existing_encoding
+    path = blob_path(checksum, encoding)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return path, encoding
+
+
+def storage_encoding(filename: str | None, head: bytes):
+    """
+    The encoding a new upload should be stored with, or None to store it as-is:
+    off unless STORAGE_COMPRESSION is set, and skipped for formats that are
+    already compressed (by extension or by their first bytes).
+    """
+    encoding = settings.STORAGE_COMPRESSION
+    if encoding in (None, "", "none"):
+        return None
+    if encoding not in CODEC_SUFFIXES:
+        raise RuntimeError(f"Unknown STORAGE_COMPRESSION {encoding!r}")
+    if encoding == "zstd" and zstandard is None:
+        raise RuntimeError('STORAGE_COMPRESSION="zstd" needs the zstandard package (pip install zstandard)')
+    if os.path.splitext(filename or "")[1].lower() in ALREADY_COMPRESSED:
+        return None
+    if head.startswith(COMPRESSED_MAGIC):
+        return None
+    return encoding
+
+
+def _encoder(encoding: str):
+    # Streaming compressor: .compress(chunk) -> bytes, .flush() -> bytes
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.STORAGE_COMPRESSION_LEVEL).compressobj()
+    # wbits=31: gzip framing, so the blob is a plain .gz file
+    return zlib.compressobj(settings.STORAGE_COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+
+def open_blob(path: str, encoding: str = None):
+    """
+    Opens a stored file for reading its original bytes, decompressing on the fly.
+    """
+    if encoding == "gzip":
+        return gzip.open(path, "rb")
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd blobs needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def iter_blob(path: str, encoding: str = None, chunk_size: int = None):
+    """
+    Yields the original bytes of a stored file in chunks (a sync generator).
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    with open_blob(path, encoding) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _hash_file(path: str, chunk_size: int, encoding: str = None):
+    # Size and SHA-256 of the original bytes, whatever the blob's encoding
+    checksum = hashlib.sha256()
+    size = 0
+    for chunk in iter_blob(path, encoding, chunk_size):
+        size += len(chunk)
+        checksum.update(chunk)
+    return size, checksum.hexdigest()
+
+
+def _new_tmp_path():
+    return os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.tmp")
+
+
+def _keep_if_smaller(tmp_path: str, size: int, encoding: str):
+    """
+    Checks a freshly compressed temp file. If compression didn't pay off
+    (an unrecognised compressed format, or a tiny file) it is swapped for the
+    original bytes. Returns the encoding the temp file ends up with.
+    """
+    if os.path.getsize(tmp_path) <= size * (1 - MIN_SAVING):
+        return encoding
+    plain_path = _new_tmp_path()
+    with open(plain_path, "wb") as out:
+        for chunk in iter_blob(tmp_path, encoding):
+            out.write(chunk)
+    os.replace(plain_path, tmp_path)
+    return None
+
+
+async def store_stream(chunks, max_bytes: int = None, filename: str = None):
+    """
+    Streams an async iterator of chunks into the store, hashing (and, if it
+    is worth it, compressing) as it writes. `filename` is the uploaded name,
+    used to skip formats that are already compressed.
+    """
+    tmp_path = _new_tmp_path()
+    chosen = {}
+
+    def encoder_for(head: bytes):
+        chosen["encoding"] = storage_encoding(filename, head)
+        return _encoder(chosen["encoding"]) if chosen["encoding"] else None
+
+    size, checksum = await uploads.stream_to_file(chunks, tmp_path, max_bytes, encoder_for=encoder_for)
+    return await run_in_threadpool(_commit_stored, tmp_path, size, checksum, chosen.get("encoding"))
+
+
+def _commit_stored(tmp_path: str, size: int, checksum: str, encoding: str = None):
+    if encoding:
+        encoding = _keep_if_smaller(tmp_path, size, encoding)
+    path, encoding = _commit_blob(tmp_path, checksum, encoding)
+    return StoredFile(path, size, checksum, os.path.getsize(path), encoding)
+
+
+def _store_file(source_path: str, filename: str = None):
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = _new_tmp_path()
+    with open(source_path, "rb") as f:
+        head = f.read(512)
+    encoding = storage_encoding(filename, head)
+    if not encoding:
+        size, checksum = _hash_file(source_path, settings.UPLOAD_CHUNK_SIZE)
+        # Rename into TMP_DIR first so the final move stays on one filesystem
+        os.replace(source_path, tmp_path)
+        return _commit_stored(tmp_path, size, checksum)
+
+    # Hash and compress in one pass over the finished upload
+    encoder = _encoder(encoding)
+    checksum = hashlib.sha256()
+    size = 0
+    try:
+        with open(source_path, "rb") as source, open(tmp_path, "wb") as out:
+            for chunk in iter(lambda: source.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                size += len(chunk)
+                checksum.update(chunk)
+                out.write(encoder.compress(chunk))
+            out.write(encoder.flush())
+    except BaseException:
+        uploads._remove_quietly(tmp_path)
+        raise
+    os.remove(source_path)
+    return _commit_stored(tmp_path, size, checksum.hexdigest(), encoding)
+
+
+async def store_file(source_path: str, filename: str = None):
+    """
+    Moves a file that is already on disk (e.g. a finished resumable upload)
+    into the store, compressing it on the way if that is worth it.
+    """
+    return await run_in_threadpool(_store_file, source_path, filename)
+
+
+def _resolve_stored_path(file_path: str):
+    """
+    The absolute path of a stored file, refusing anything outside uploads/.
+    """
+    root = os.path.realpath(UPLOAD_ROOT)
+    path = os.path.realpath(file_path)
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=404, detail="File not found")
+    return root, path
+
+
+def accepts_encoding(accept_encoding: str | None, encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows `encoding` (q=0 means no).
+    """
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if name not in (encoding, "*") and not (encoding == "gzip" and name == "x-gzip"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _content_disposition(filename: str):
+    # Same Content-Disposition as FileResponse would send
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def file_response(
+    file_path: str,
+    filename: str,
+    content_encoding: str = None,
+    file_size: int = None,
+    accept_encoding: str = None,
+):
+    """
+    The response that sends a stored file to an already-authorized client.
+
+    How depends on settings.FILE_DELIVERY:
+      - "x-accel":    an empty response with X-Accel-Redirect; nginx sends the file
+                      from an `internal` location mapped to uploads/ (FILE_ACCEL_PREFIX)
+      - "x-sendfile": an empty response with X-Sendfile (Apache mod_xsendfile, lighttpd)
+      - "direct":     FileResponse, with Range support; on ASGI servers that offer the
+                      "pathsend" extension the server sends the file itself (sendfile)
+    With either proxy mode no file bytes pass through the app worker.
+
+    Compressed blobs (`content_encoding`) always go through the app: clients
+    that accept the encoding get the stored bytes as they are, with
+    Content-Encoding (Range then applies to those bytes); anyone else gets
+    them decompressed on the fly, `file_size` bytes, without Range support.
+    """
+    root, path = _resolve_stored_path(file_path)
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if content_encoding:
+        try:
+            stat_result = await run_in_threadpool(os.stat, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        if accepts_encoding(accept_encoding, content_encoding):
+            return FileResponse(
+                path, media_type=media_type, filename=filename, stat_result=stat_result,
+                headers={"Content-Encoding": content_encoding, "Vary": "Accept-Encoding"},
+            )
+        headers = {
+            "Content-Disposition": _content_disposition(filename),
+            "Accept-Ranges": "none",
+            "Vary": "Accept-Encoding",
+        }
+        if file_size is not None:
+            headers["Content-Length"] = str(file_size)
+        # A sync generator: StreamingResponse runs it on the threadpool
+        return StreamingResponse(iter_blob(path, content_encoding), media_type=media_type, headers=headers)
+
+    if settings.FILE_DELIVERY in ("x-accel", "x-sendfile"):
+        headers = {"Content-Disposition": _content_disposition(filename)}
+        if settings.FILE_DELIVERY == "x-accel":
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            headers["X-Accel-Redirect"] = settings.FILE_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative)
+        else:
+            headers["X-Sendfile"] = path
+        return Response(media_type=media_type, headers=headers)
+
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type=media_type, filename=filename, stat_result=stat_result)
+
+
+def blob_refcounts(db: Session):
+    """
+    {checksum: number of submissions referencing it}
+    """
+    rows = db.query(models.Submission.checksum, func.count(models.Submission.id)).filter(
+        models.Submission.checksum.isnot(None)
+    ).group_by(models.Submission.checksum).all()
+    return dict(rows)
+
+
+def _is_older_than(path: str, cutoff: float):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(db: Session, grace_seconds: int = None):
+    """
+    Deletes files no submission refers to any more:
+      - blobs whose reference count is zero
+      - leftover temp files from interrupted uploads
+      - legacy per-upload files in uploads/submissions that were overwritten on resubmit
+    Only files older than `grace_seconds` are touched, so a blob that was just
+    written (but whose submission isn't committed yet) is never collected.
+    Returns the number of files removed.
+    """
+    grace_seconds = settings.STORAGE_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    removed = 0
+
+    referenced = set(blob_refcounts(db))
+    if os.path.isdir(BLOB_DIR):
+        for dirpath, dirnames, filenames in os.walk(BLOB_DIR):
+            in_tmp = os.path.abspath(dirpath) == os.path.abspath(TMP_DIR)
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                checksum = name.split(".", 1)[0]  # <checksum>[.gz|.zst]
+                if (in_tmp or checksum not in referenced) and _is_older_than(path, cutoff):
+                    uploads._remove_quietly(path)
+                    removed += 1
+
+    if os.path.isdir(uploads.UPLOAD_DIR):
+        legacy_paths = {
+            path for (path,) in db.query(models.Submission.file_path).filter(
+                models.Submission.file_path.like(f"{uploads.UPLOAD_DIR}/%")
+            )
+        }
+        for name in os.listdir(uploads.UPLOAD_DIR):
+            path = f"{uploads.UPLOAD_DIR}/{name}"
+            if path not in legacy_paths and _is_older_than(path, cutoff):
+                uploads._remove_quietly(path)
+                removed += 1
+
+    return removed
+
+
+def _collect_garbage_once():
+    db = database.SessionLocal()
+    try:
+        return collect_garbage(db)
+    finally:
+        db.close()
+
+
+async def run_gc():
+    """
+    Background loop (started from main.py's lifespan) that reclaims unreferenced files.
+    """
+    while True:
+        await asyncio.sleep(settings.STORAGE_GC_INTERVAL_SECONDS)
+        try:
+            removed = await run_in_threadpool(_collect_garbage_once)
+            if removed:
+                logger.info("Storage GC removed %d unreferenced files", removed)
+        except Exception:
+            logger.exception("Storage GC pass failed")
+
+
+if __name__ == "__main__":
+    # python -m app.storage   -> run one GC pass now
+    print(f"Removed {_collect_garbage_once()} unreferenced files")
@@ -0,0 +1,393 @@
+# app/uploads.py
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from . import metrics
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads/submissions"
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = None):
+    """
+    Yields the contents of an UploadFile in bounded chunks.
+    UploadFile.read() is async, so this never blocks the event loop.
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _too_large_exception():
+    return BodyTooLarge()
+
+
+# --- Request body limit ---
+# Starlette spools the whole multipart body to a temp file before the route
+# runs, so the check in stream_to_file alone comes after a 5 GB upload has
+# already been read. This one runs while the body is being received.
+
+# Routes whose body is a multipart file upload
+LIMITED_ROUTES = [
+    ("POST", re.compile(r"^/submissions/\d+/?$")),
+]
+
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class BodyTooLarge(HTTPException):
+    # An HTTPException, so FastAPI passes it through its body parsing as is
+    # instead of turning it into a 400
+    def __init__(self):
+        super().__init__(
+            status_code=413,
+            detail=f"File is too large. The limit is {settings.MAX_UPLOAD_BYTES} bytes.",
+        )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI. Rejects an upload with 413 from its Content-Length before
+    anything is read, and otherwise counts the body bytes as they come in
+    and stops at MAX_UPLOAD_BYTES (plus the multipart overhead).
+    """
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            scope["method"] == method and pattern.match(scope["path"]) for method, pattern in LIMITED_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = settings.MAX_UPLOAD_BYTES if self.max_bytes is None else self.max_bytes
+        limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+        if _content_length(scope) > limit:
+            await _send_too_large(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            # Normally FastAPI has already answered 413; this is for when the
+            # body was read somewhere that doesn't handle HTTPException
+            if response_started:
+                raise
+            await _send_too_large(scope, receive, send)
+
+
+def _content_length(scope) -> int:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+async def _send_too_large(scope, receive, send):
+    e = BodyTooLarge()
+    await JSONResponse({"detail": e.detail}, status_code=e.status_code)(scope, receive, send)
+
+
+async def stream_to_file(chunks, destination: str, max_bytes: int = None, encoder_for=None):
+    """
+    Writes an async iterator of byte chunks to `destination`.
+
+    All disk I/O happens on the threadpool. The size limit is enforced while
+    streaming, and the SHA-256 checksum and byte count are computed in the
+    same pass. On any failure the partial file is removed.
+
+    `encoder_for`, if given, is called with the first chunk and returns a
+    compressor (.compress()/.flush(), see storage._encoder) or None; the
+    size and checksum are still those of the bytes received.
+
+    Returns (size_in_bytes, sha256_hexdigest).
+    """
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    checksum = hashlib.sha256()
+    size = 0
+    encoder = None
+    buffer = await run_in_threadpool(open, destination, "wb")
+    try:
+        async for chunk in chunks:
+            if size == 0 and encoder_for is not None:
+                encoder = encoder_for(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large_exception()
+            checksum.update(chunk)
+            if encoder:
+                # Compressing is CPU work, so it goes to the threadpool too
+                await run_in_threadpool(_compress_into, buffer, encoder, chunk)
+            else:
+                await run_in_threadpool(buffer.write, chunk)
+            metrics.upload_bytes.inc(len(chunk), kind="direct")
+        if encoder:
+            await run_in_threadpool(buffer.write, encoder.flush())
+        await run_in_threadpool(buffer.close)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(_remove_quietly, destination)
+        raise
+
+    return size, checksum.hexdigest()
+
+
+def _compress_into(buffer, encoder, chunk: bytes):
+    buffer.write(encoder.compress(chunk))
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# --- Resumable uploads ---
+# A session is two files in RESUMABLE_UPLOAD_DIR:
+#   <upload_id>.json  who/what the upload is for and when it expires
+#   <upload_id>.part  the bytes received so far (its size IS the current offset)
+# Keeping the state on disk means a session survives a worker restart.
+
+RESUMABLE_UPLOAD_DIR = "uploads/partial"
+
+_UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# One lock per session so two PUTs for the same upload can't interleave
+_session_locks = {}
+
+
+def _session_paths(upload_id: str):
+    base = os.path.join(RESUMABLE_UPLOAD_DIR, upload_id)
+    return base + ".json", base + ".part"
+
+
+def _write_session(session: dict):
+    meta_path, _ = _session_paths(session["upload_id"])
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(session, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _read_session(upload_id: str):
+    meta_path, part_path = _session_paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            session = json.load(f)
+        session["offset"] = os.path.getsize(part_path)
+    except (FileNotFoundError, ValueError):
+        return None
+    return session
+
+
+def _create_session(user_id: int, assignment_id: int, filename: str, total_size: int):
+    os.makedirs(RESUMABLE_UPLOAD_DIR, exist_ok=True)
+    now = time.time()
+    session = {
+        "upload_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "assignment_id": assignment_id,
+        "filename": filename,
+        "total_size": total_size,
+        "created_at": now,
+        "expires_at": now + settings.UPLOAD_SESSION_TTL_SECONDS,
+    }
+    _, part_path = _session_paths(session["upload_id"])
+    open(part_path, "wb").close()
+    _write_session(session)
+    session["offset"] = 0
+    return session
+
+
+def _discard_session(upload_id: str):
+    meta_path, part_path = _session_paths(upload_id)
+    for path in (meta_path, meta_path + ".tmp", part_path):
+        _remove_quietly(path)
+    _session_locks.pop(upload_id, None)
+
+
+async def create_session(user_id: int, assignment_id: int, filename: str, total_size: int):
+    if total_size > settings.MAX_UPLOAD_BYTES:
+        raise _too_large_exception()
+    return await run_in_threadpool(_create_session, user_id, assignment_id, filename, total_size)
+
+
+async def get_session(upload_id: str, user_id: int):
+    """
+    Returns the session dict (including the current `offset`), or None if
+    it doesn't exist, has expired, or belongs to someone else.
+    """
+    if not _UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    session = await run_in_threadpool(_read_session, upload_id)
+    if session is None or session["user_id"] != user_id or session["expires_at"] < time.time():
+        return None
+    return session
+
+
+async def append_chunk(session: dict, offset: int, chunks):
+    """
+    Appends a chunk at `offset`, which must be the current end of the upload.
+    A failed or oversized chunk is cut off again, so the offset only ever
+    moves forward by whole chunks. Each chunk also extends the session's expiry.
+    """
+    upload_id = session["upload_id"]
+    lock = _session_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        _, part_path = _session_paths(upload_id)
+        # The asyncio lock only covers this worker; the flock covers the
+        # others, from the offset check until the chunk is written
+        try:
+            part = await run_in_threadpool(_open_locked, part_path)
+        except FileNotFoundError:
+            # Completed or cancelled by another request in the meantime
+            raise HTTPException(status_code=404, detail="Upload not found")
+        try:
+            current = (await run_in_threadpool(os.fstat, part.fileno())).st_size
+            if offset != current:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Offset mismatch",
+                    headers={"Upload-Offset": str(current)},
+                )
+
+            written = current
+            try:
+                async for chunk in chunks:
+                    written += len(chunk)
+                    if written > session["total_size"]:
+                        raise HTTPException(status_code=413, detail="Chunk goes past the declared upload size.")
+                    await run_in_threadpool(_write_all, part, chunk)
+                    metrics.upload_bytes.inc(len(chunk), kind="resumable")
+            except BaseException:
+                await run_in_threadpool(os.ftruncate, part.fileno(), current)
+                raise
+        finally:
+            # Closing the file releases the flock
+            await run_in_threadpool(part.close)
+
+        session["expires_at"] = time.time() + settings.UPLOAD_SESSION_TTL_SECONDS
+        stored = {k: v for k, v in session.items() if k != "offset"}
+        await run_in_threadpool(_write_session, stored)
+        session["offset"] = written
+        return session
+
+
+def _open_locked(part_path: str):
+    # Never creates the file: a session that's gone stays gone. Unbuffered,
+    # so cutting a failed chunk off can't be undone by a later flush.
+    part = os.fdopen(os.open(part_path, os.O_WRONLY | os.O_APPEND), "ab", buffering=0)
+    try:
+        fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+    except BaseException:
+        part.close()
+        raise
+    return part
+
+
+def _write_all(part, chunk: bytes):
+    # A raw file may write less than it was given
+    view = memoryview(chunk)
+    while view:
+        view = view[part.write(view):]
+
+
+def session_data_path(session: dict):
+    """
+    Path of the .part file holding the bytes received so far.
+    """
+    return _session_paths(session["upload_id"])[1]
+
+
+async def discard_session(session: dict):
+    await run_in_threadpool(_discard_session, session["upload_id"])
+
+
+def expire_stale_sessions():
+    """
+    Janitor pass: removes sessions past their expiry and any stray
+    .part/.json file whose other half is missing. Returns how many
+    sessions were removed.
+    """
+    if not os.path.isdir(RESUMABLE_UPLOAD_DIR):
+        return 0
+    now = time.time()
+    removed = 0
+    upload_ids = {name.split(".")[0] for name in os.listdir(RESUMABLE_UPLOAD_DIR)}
+    for upload_id in upload_ids:
+        meta_path, part_path = _session_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                expires_at = json.load(f)["expires_at"]
+        except (FileNotFoundError, ValueError, KeyError):
+            # Half-written or orphaned session; give it one TTL to settle
+            expires_at = _mtime(part_path) + settings.UPLOAD_SESSION_TTL_SECONDS
+        if expires_at < now:
+            _discard_session(upload_id)
+            removed += 1
+    return removed
+
+
+def _mtime(path: str):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+async def run_janitor():
+    """
+    Background loop (started from main.py's lifespan) that expires
+    abandoned resumable uploads.
+    """
+    while True:
+        await asyncio.sleep(settings.UPLOAD_JANITOR_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(expire_stale_sessions)
+        except Exception:
+            logger.exception("Upload janitor pass failed")
@@ -0,0 +1,411 @@
+# benchmarks/load.py
+
+# Load test for the hot endpoints.
+#
+# 1. Seeds a database with term-sized volumes (default: 2000 students,
+#    20 lecturers, 200 assignments, 20000 submissions). It writes
+#    straight to the tables, so seeding takes seconds and not hours of bcrypt.
+# 2. Drives each scenario at a fixed concurrency:
+#      login, list_assignments, upload, list_submissions, grade
+# 3. Reports p50/p95/p99 latency and throughput per scenario and saves it
+#    all to JSON, so runs can be compared between releases (--compare).
+#
+# By default everything runs in one process: a fresh SQLite file in a temp
+# dir, and the app called in-process over ASGI. To test a real deployment,
+# seed the database the server uses and point --base-url at the server:
+#
+#   python -m benchmarks.load
+#   python -m benchmarks.load --database-url postgresql://bench@localhost/bench \
+#       --base-url http://localhost:8000 --concurrency 64
+#   python -m benchmarks.load --compare benchmarks/results/load-<previous>.json
+#
+# Use an empty database: the schema is created if it is missing, and the
+# seeded rows are not cleaned up.
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCENARIOS = ("login", "list_assignments", "upload", "list_submissions", "grade")
+PASSWORD = "bench-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test for the hot endpoints.")
+    parser.add_argument("--database-url", help="Database to seed (default: a new SQLite file in --workdir)")
+    parser.add_argument("--base-url", help="Drive a running server instead of the app in-process")
+    parser.add_argument("--workdir", help="Where the SQLite file and uploads/ go (default: a temp dir)")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--lecturers", type=int, default=20)
+    parser.add_argument("--assignments", type=int, default=200)
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--skip-seed", action="store_true", help="The database is already seeded by an earlier run")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario (login: a tenth of it)")
+    parser.add_argument("--upload-size", type=int, default=64 * 1024, help="Bytes per uploaded file")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, for repeatable runs")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="An earlier results file to compare against")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    # Must happen before the app is imported: settings are read at import time
+    workdir = args.workdir or tempfile.mkdtemp(prefix="load-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    database_url = args.database_url or f"sqlite:///{os.path.join(os.path.abspath(workdir), 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    return os.path.abspath(workdir), database_url
+
+
+# --- Seeding ---
+
+def seed(args, rng: random.Random):
+    from sqlalchemy import insert, select
+
+    from app import crud, database, models
+    from app.hashing import _hash_password
+    from app.settings import settings
+
+    database.Base.metadata.create_all(database.engine)
+    # One real bcrypt hash (at the configured cost) shared by every account
+    hashed = _hash_password(PASSWORD, settings.BCRYPT_ROUNDS)
+    now = datetime.utcnow()
+
+    with database.SessionLocal() as db:
+        db.execute(insert(models.User), [
+            {"email": f"lecturer{i}@bench.example.com", "full_name": f"Lecturer {i}", "reg_number": None,
+             "hashed_password": hashed, "role": models.UserRole.lecturer, "is_active": True}
+            for i in range(args.lecturers)
+        ])
+        for start in range(0, args.students, 5000):
+            db.execute(insert(models.User), [
+                {"email": f"student{i}@bench.example.com", "full_name": f"Student {i}", "reg_number": f"B{i:06d}",
+                 "hashed_password": hashed, "role": models.UserRole.student, "is_active": True}
+                for i in range(start, min(start + 5000, args.students))
+            ])
+        lecturer_ids, student_ids = _bench_user_ids(db)
+
+        db.execute(insert(models.Assignment), [
+            {"title": f"Assignment {i}", "description": "Answer every question and show your working. " * 4,
+             "deadline": now + timedelta(days=30), "lecturer_id": lecturer_ids[i % len(lecturer_ids)]}
+            for i in range(args.assignments)
+        ])
+        assignment_ids = list(db.scalars(
+            select(models.Assignment.id).where(models.Assignment.lecturer_id.in_(lecturer_ids))
+        ))
+
+        # Every submission points at one small shared blob
+        checksum = "0" * 64
+        per_assignment = min(len(student_ids), args.submissions // max(len(assignment_ids), 1))
+        rows = []
+        for assignment_id in assignment_ids:
+            for student_id in rng.sample(student_ids, per_assignment):
+                graded = rng.random() < 0.5
+                rows.append({
+                    "file_path": f"uploads/blobs/00/00/{checksum}", "file_size": 1024, "checksum": checksum,
+                    "original_filename": "work.pdf", "submitted_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 7)),
+                    "grade": rng.randint(0, 100) if graded else None, "feedback": "Good work" if graded else None,
+                    "student_id": student_id, "assignment_id": assignment_id,
+                })
+            if len(rows) >= 5000:
+                db.execute(insert(models.Submission), rows)
+                rows = []
+        if rows:
+            db.execute(insert(models.Submission), rows)
+        db.commit()
+        # The rows above skipped crud, so fill the gradebook tables in one go
+        crud.rebuild_assignment_stats(db)
+
+
+def _bench_user_ids(db):
+    from sqlalchemy import select
+
+    from app import models
+
+    rows = db.execute(
+        select(models.User.id, models.User.role).where(models.User.email.like("%@bench.example.com")).order_by(models.User.id)
+    ).all()
+    lecturers = [row.id for row in rows if row.role == models.UserRole.lecturer]
+    students = [row.id for row in rows if row.role == models.UserRole.student]
+    return lecturers, students
+
+
+def load_fixture():
+    """
+    What the scenarios pick from: emails, assignments, and submissions per lecturer.
+    """
+    from sqlalchemy import select
+
+    from app import database, models
+
+    with database.SessionLocal() as db:
+        users = db.execute(
+            select(models.User.id, models.User.email, models.User.role).where(models.User.email.like("%@bench.example.com"))
+        ).all()
+        assignments = db.execute(
+            select(models.Assignment.id, models.Assignment.lecturer_id)
+            .join(models.User, models.User.id == models.Assignment.lecturer_id)
+            .where(models.User.email.like("%@bench.example.com"))
+        ).all()
+        submissions = db.execute(
+            select(models.Submission.id, models.Assignment.lecturer_id)
+            .join(models.Assignment, models.Assignment.id == models.Submission.assignment_id)
+            .where(models.Assignment.id.in_([a.id for a in assignments]))
+        ).all()
+
+    by_lecturer = {}
+    for row in submissions:
+        by_lecturer.setdefault(row.lecturer_id, []).append(row.id)
+    assignments_by_lecturer = {}
+    for row in assignments:
+        assignments_by_lecturer.setdefault(row.lecturer_id, []).append(row.id)
+    return {
+        "students": [(u.id, u.email) for u in users if u.role == models.UserRole.student],
+        "lecturers": [(u.id, u.email) for u in users if u.role == models.UserRole.lecturer],
+        "assignments": [a.id for a in assignments],
+        "assignments_by_lecturer": assignments_by_lecturer,
+        "submissions_by_lecturer": by_lecturer,
+    }
+
+
+# --- Driving the load ---
+
+async def login(client, email: str):
+    response = await client.post("/login/token", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_scenario(name: str, make_request, total: int, concurrency: int):
+    latencies = []
+    statuses = {}
+    counter = itertools.count()
+
+    async def worker():
+        while next(counter) < total:
+            start = time.perf_counter()
+            try:
+                response = await make_request()
+                status = response.status_code
+            except Exception as e:  # connection errors etc. count as failures
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(name, latencies, statuses, elapsed, concurrency)
+
+
+def summarize(name, latencies, statuses, elapsed, concurrency):
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered) * 1000, 2),
+            "p50": round(cuts[49] * 1000, 2),
+            "p95": round(cuts[94] * 1000, 2),
+            "p99": round(cuts[98] * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2),
+        },
+    }
+
+
+async def drive(args, fixture, rng: random.Random, app=None):
+    import httpx
+
+    if app is not None:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+
+    async with client:
+        # Tokens up front so only the login scenario pays for bcrypt
+        students = rng.sample(fixture["students"], min(200, len(fixture["students"])))
+        student_headers = [await login(client, email) for _, email in students]
+        lecturer_headers = {
+            user_id: await login(client, email)
+            for user_id, email in fixture["lecturers"]
+            if fixture["submissions_by_lecturer"].get(user_id)
+        }
+        lecturer_ids = list(lecturer_headers)
+        payload = os.urandom(args.upload_size)
+
+        def do_login():
+            return client.post("/login/token", data={"username": rng.choice(fixture["students"])[1], "password": PASSWORD})
+
+        def do_list_assignments():
+            return client.get("/assignments/", headers=rng.choice(student_headers))
+
+        def do_upload():
+            assignment_id = rng.choice(fixture["assignments"])
+            return client.post(
+                f"/submissions/{assignment_id}",
+                files={"file": ("work.pdf", payload, "application/pdf")},
+                headers=rng.choice(student_headers),
+            )
+
+        def do_list_submissions():
+            lecturer_id = rng.choice(lecturer_ids)
+            assignment_id = rng.choice(fixture["assignments_by_lecturer"][lecturer_id])
+            return client.get(f"/submissions/assignment/{assignment_id}", headers=lecturer_headers[lecturer_id])
+
+        def do_grade():
+            lecturer_id = rng.choice(lecturer_ids)
+            submission_id = rng.choice(fixture["submissions_by_lecturer"][lecturer_id])
+            return client.put(
+                f"/submissions/{submission_id}/grade",
+                json={"grade": rng.randint(0, 100), "feedback": "Benchmarked"},
+                headers=lecturer_headers[lecturer_id],
+            )
+
+        requests_for = {
+            "login": (do_login, max(args.requests // 10, 1)),
+            "list_assignments": (do_list_assignments, args.requests),
+            "upload": (do_upload, args.requests),
+            "list_submissions": (do_list_submissions, args.requests),
+            "grade": (do_grade, args.requests),
+        }
+        results = []
+        for name in args.scenarios.split(","):
+            name = name.strip()
+            if name not in requests_for:
+                raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+            make_request, total = requests_for[name]
+            result = await run_scenario(name, make_request, total, args.concurrency)
+            print_result(result)
+            results.append(result)
+        return results
+
+
+# --- Reporting ---
+
+def print_result(result):
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:<17} {result['requests']:>6} req  {result['throughput_rps']:>8.1f} req/s  "
+        f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms  "
+        f"errors {result['errors']}"
+    )
+
+
+def compare(previous_path: str, results: list):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {r["scenario"]: r for r in json.load(f)["scenarios"]}
+    print(f"\nCompared with {previous_path} (positive = slower / less throughput):")
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        p95_change = _percent(result["latency_ms"]["p95"], before["latency_ms"]["p95"])
+        rps_change = -_percent(result["throughput_rps"], before["throughput_rps"])
+        print(f"  {result['scenario']:<17} p95 {p95_change:+7.1f}%   throughput {rps_change:+7.1f}%")
+
+
+def _percent(new, old):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir, database_url = configure_environment(args)
+    rng = random.Random(args.seed)
+
+    from sqlalchemy.engine import make_url
+
+    from app.settings import settings
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(args, rng)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+    fixture = load_fixture()
+    print(
+        f"{len(fixture['students'])} students, {len(fixture['lecturers'])} lecturers, "
+        f"{len(fixture['assignments'])} assignments, "
+        f"{sum(map(len, fixture['submissions_by_lecturer'].values()))} submissions"
+    )
+
+    app = None
+    if not args.base_url:
+        os.chdir(workdir)  # uploads/ lands in the work dir, not the repo
+        from app.main import app
+
+    results = asyncio.run(drive(args, fixture, rng, app))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": make_url(database_url).get_backend_name(),
+            "target": args.base_url or "in-process",
+            "volumes": {
+                "students": len(fixture["students"]),
+                "lecturers": len(fixture["lecturers"]),
+                "assignments": len(fixture["assignments"]),
+                "submissions": sum(map(len, fixture["submissions_by_lecturer"].values())),
+            },
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "upload_size": args.upload_size,
+            "settings": {
+                "BCRYPT_ROUNDS": settings.BCRYPT_ROUNDS,
+                "PASSWORD_POOL_WORKERS": settings.PASSWORD_POOL_WORKERS,
+                "DB_POOL_SIZE": settings.DB_POOL_SIZE,
+                "DB_MAX_OVERFLOW": settings.DB_MAX_OVERFLOW,
+                "USER_CACHE_MAX_SIZE": settings.USER_CACHE_MAX_SIZE,
+            },
+        },
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        repo_root, "benchmarks", "results", f"load-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
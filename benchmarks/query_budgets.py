@@ -0,0 +1,104 @@
+# benchmarks/query_budgets.py
+
+# How many SQL statements each hot endpoint may run. Fails (exit code 1)
+# if any endpoint goes over its budget, so an N+1 or an extra lookup that
+# sneaks into a handler shows up in CI instead of under deadline load.
+#
+# Runs the real app against a throwaway SQLite database in a temp dir:
+#   python -m benchmarks.query_budgets
+# pytest runs it too (tests/test_query_budgets.py, against the tests' own
+# database), so going over a budget fails the test suite.
+#
+# When a change legitimately needs another query, raise its budget here
+# in the same commit.
+
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    _workdir = tempfile.mkdtemp(prefix="query-budgets-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'budgets.db')}"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ["USER_CACHE_MAX_SIZE"] = "0"  # count the user lookup (GET /users/me) every time, as on a cold cache
+    os.chdir(_workdir)  # uploads/ ends up in the temp dir
+
+from fastapi.testclient import TestClient
+
+from app import database
+from app.main import app
+from app.profiling import QueryBudgetExceeded, query_budget
+
+STUDENTS = 25
+
+
+def seed(client: TestClient):
+    database.Base.metadata.create_all(database.engine)
+    client.post("/users/", json={"email": "lecturer@example.com", "password": "secret1", "role": "lecturer"})
+    for i in range(STUDENTS):
+        client.post("/users/", json={"email": f"s{i}@example.com", "password": "secret1", "reg_number": f"R{i:04d}"})
+    lecturer = login(client, "lecturer@example.com")
+    assignment_id = client.post("/assignments/", json={"title": "A1", "description": "d"}, headers=lecturer).json()["id"]
+    for i in range(STUDENTS):
+        client.post(
+            f"/submissions/{assignment_id}",
+            files={"file": ("work.txt", f"student {i}".encode())},
+            headers=login(client, f"s{i}@example.com"),
+        )
+    return lecturer, login(client, "s0@example.com"), assignment_id
+
+
+def login(client: TestClient, email: str):
+    token = client.post("/login/token", data={"username": email, "password": "secret1"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def main():
+    client = TestClient(app)
+    lecturer, student, assignment_id = seed(client)
+    submission_id = client.get(f"/submissions/me/{assignment_id}", headers=student).json()["id"]
+
+    # (label, budget, request). The budgets hold no matter how many students
+    # there are; a loop over rows would blow them straight away. Apart from
+    # GET /users/me, who is asking comes from the token alone (no user lookup).
+    checks = [
+        ("POST /login/token", 1,
+         lambda: client.post("/login/token", data={"username": "s1@example.com", "password": "secret1"})),
+        ("GET /users/me", 1,
+         lambda: client.get("/users/me", headers=student)),
+        ("GET /assignments/", 2,
+         lambda: client.get("/assignments/", headers=student)),
+        ("GET /submissions/assignment/{id}", 2,
+         lambda: client.get(f"/submissions/assignment/{assignment_id}", headers=lecturer)),
+        ("GET /submissions/me/{id}", 2,
+         lambda: client.get(f"/submissions/me/{assignment_id}", headers=student)),
+        ("GET /assignments/stats", 3,
+         lambda: client.get("/assignments/stats", headers=lecturer)),
+        ("GET /assignments/{id}/stats", 4,
+         lambda: client.get(f"/assignments/{assignment_id}/stats", headers=lecturer)),
+        ("PUT /submissions/{id}/grade", 5,
+         lambda: client.put(f"/submissions/{submission_id}/grade", json={"grade": 70, "feedback": "ok"}, headers=lecturer)),
+        ("PUT /submissions/grades", 5,
+         lambda: client.put("/submissions/grades", json={"items": [
+             {"submission_id": i, "grade": 60, "feedback": "bulk"} for i in range(1, STUDENTS + 1)
+         ]}, headers=lecturer)),
+        ("POST /submissions/{id}", 7,
+         lambda: client.post(f"/submissions/{assignment_id}", files={"file": ("work.txt", b"again")}, headers=student)),
+    ]
+
+    failed = 0
+    for label, budget, request in checks:
+        try:
+            with query_budget(budget, label) as profile:
+                response = request()
+            assert response.status_code < 400, f"{label} returned {response.status_code}: {response.text}"
+            print(f"ok    {label:<36} {profile.count:>2} / {budget} queries")
+        except (QueryBudgetExceeded, AssertionError) as e:
+            failed += 1
+            print(f"FAIL  {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# benchmarks/serialization.py
+
+# Old vs new way of building a big list response.
+#
+#   old: ORM objects -> response_model validation (from_attributes) -> JSON
+#        (what FastAPI does when a route returns ORM objects)
+#   new: select(*columns) rows -> responses.rows_response (orjson if installed)
+#
+# Runs against a throwaway in-memory SQLite database:
+#   python -m benchmarks.serialization [--rows 5000] [--repeat 20]
+
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# The app's settings need these; nothing here touches the real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import crud, models, responses, schemas
+from app.database import Base
+
+
+def seed(session: Session, rows: int):
+    lecturer = models.User(email="lecturer@example.com", hashed_password="x", role=models.UserRole.lecturer)
+    session.add(lecturer)
+    session.flush()
+    now = datetime.utcnow()
+    session.add_all(
+        models.Assignment(
+            title=f"Assignment {i}",
+            description="Read chapter %d and answer the questions at the end." % i,
+            deadline=now + timedelta(days=i % 30),
+            lecturer_id=lecturer.id,
+        )
+        for i in range(rows)
+    )
+    session.commit()
+
+
+def old_path(session: Session, adapter: TypeAdapter):
+    session.expunge_all()  # a fresh session per request, like get_db
+    objects = session.scalars(select(models.Assignment).order_by(models.Assignment.id)).all()
+    return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+
+def new_path(session: Session, columns):
+    rows = session.execute(select(*columns).order_by(models.Assignment.id)).all()
+    return responses.rows_response(rows, utc_columns=("deadline",)).body
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - start)
+    return body, samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.rows)
+
+        adapter = TypeAdapter(List[schemas.Assignment])
+        columns = crud._schema_columns(models.Assignment, schemas.Assignment)
+        old_body, old_samples = timed(lambda: old_path(session, adapter), args.repeat)
+        new_body, new_samples = timed(lambda: new_path(session, columns), args.repeat)
+
+    assert old_body == new_body, "the two paths must produce identical JSON"
+
+    old_ms = statistics.median(old_samples) * 1000
+    new_ms = statistics.median(new_samples) * 1000
+    print(f"{args.rows} assignments, median of {args.repeat} runs "
+          f"(encoder: {'orjson' if responses.orjson else 'json'})")
+    print(f"  ORM + response_model : {old_ms:8.2f} ms")
+    print(f"  rows + rows_response : {new_ms:8.2f} ms")
+    print(f"  speedup              : {old_ms / new_ms:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
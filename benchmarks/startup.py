@@ -0,0 +1,219 @@
+# benchmarks/startup.py
+
+# How long a fresh worker takes to become useful, so cold starts and
+# scaling out don't quietly get slower. Each run is a new Python process:
+#   import            import app.main
+#   create_app        build the app (routers, middleware)
+#   lifespan          engines, pool warm-up, background tasks
+#   first_request     GET /
+#   first_db_request  POST /login/token for an unknown user (one query)
+# plus, with --server, the wall time from spawning uvicorn to its first
+# response (interpreter start included).
+#
+# Medians over --runs, saved to JSON like benchmarks/load.py:
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --server --runs 10
+#   python -m benchmarks.startup --compare benchmarks/results/startup-<previous>.json
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+PHASES = ("import", "create_app", "lifespan", "first_request", "first_db_request")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Worker startup time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="Database the app connects to (default: a new SQLite file)")
+    parser.add_argument("--server", action="store_true", help="Also time a real uvicorn worker to its first response")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/startup-<timestamp>.json)")
+    parser.add_argument("--compare", help="An earlier results file to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# --- One measured start, in a fresh process ---
+
+def child():
+    import asyncio
+
+    import httpx  # the client isn't part of the app's startup
+
+    started = time.perf_counter()
+    import app.main
+    timings = {"import": time.perf_counter() - started}
+
+    started = time.perf_counter()
+    application = app.main.create_app()
+    timings["create_app"] = time.perf_counter() - started
+
+    async def run():
+        started = time.perf_counter()
+        async with _lifespan(application):
+            timings["lifespan"] = time.perf_counter() - started
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                started = time.perf_counter()
+                response = await client.get("/")
+                timings["first_request"] = time.perf_counter() - started
+                assert response.status_code == 200, response.text
+
+                started = time.perf_counter()
+                response = await client.post("/login/token", data={"username": "nobody@example.com", "password": "x"})
+                timings["first_db_request"] = time.perf_counter() - started
+                assert response.status_code == 401, response.text
+
+    asyncio.run(run())
+    print(json.dumps(timings))
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(application):
+    # The ASGI lifespan protocol, as a server speaks it: through the whole
+    # middleware stack, so whatever warms up there is counted here too
+    import asyncio
+
+    received, sent = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(application({"type": "lifespan", "asgi": {"version": "3.0"}}, received.get, sent.put))
+    await received.put({"type": "lifespan.startup"})
+    message = await sent.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"Startup failed: {message.get('message')}")
+    try:
+        yield
+    finally:
+        await received.put({"type": "lifespan.shutdown"})
+        await sent.get()
+        await task
+
+
+def _measure_in_process(env: dict, cwd: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        env=env, cwd=cwd, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _measure_server(env: dict, cwd: str, timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "app.main:create_app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"uvicorn did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# --- Reporting ---
+
+def _summary(samples: list) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {"median_ms": statistics.median(ms), "min_ms": min(ms), "max_ms": max(ms)}
+
+
+def compare(previous_path: str, phases: dict):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)["phases"]
+    print(f"\nCompared with {previous_path} (positive = slower):")
+    for phase, summary in phases.items():
+        before = previous.get(phase)
+        if before and before["median_ms"]:
+            change = (summary["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+            print(f"  {phase:<17} {change:+7.1f}%")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child()
+        return
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+    env["PYTHONPATH"] = repo_root + os.pathsep + env.get("PYTHONPATH", "")
+
+    # The schema, made once outside the measured processes
+    subprocess.run(
+        [sys.executable, "-c", "from app import database, models; database.Base.metadata.create_all(database.engine)"],
+        env=env, cwd=repo_root, check=True,
+    )
+
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(args.runs):
+        for phase, seconds in _measure_in_process(env, workdir).items():
+            samples[phase].append(seconds)
+    samples["total"] = [sum(run) for run in zip(*(samples[phase] for phase in PHASES))]
+    if args.server:
+        samples["server_first_response"] = [_measure_server(env, workdir) for _ in range(args.runs)]
+
+    phases = {phase: _summary(values) for phase, values in samples.items()}
+    for phase, summary in phases.items():
+        print(f"{phase:<22} median {summary['median_ms']:>8.1f} ms   min {summary['min_ms']:>8.1f}   max {summary['max_ms']:>8.1f}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "phases": phases,
+    }
+    output = args.output or os.path.join(
+        repo_root, "benchmarks", "results", f"startup-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        compare(args.compare, phases)
+
+
+if __name__ == "__main__":
+    main()
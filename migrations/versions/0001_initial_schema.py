@@ -0,0 +1,82 @@
+"""initial schema
+
+The tables as main.py used to create them with Base.metadata.create_all().
+Databases that were created that way already have them, so each table
+is only created if it is missing; `alembic upgrade head` then adopts them.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("reg_number", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("role", sa.Enum("student", "lecturer", name="userrole"), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_reg_number", "users", ["reg_number"], unique=True)
+        op.create_index("ix_users_full_name", "users", ["full_name"])
+
+    if "assignments" not in existing:
+        op.create_table(
+            "assignments",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=False),
+            sa.Column("deadline", sa.DateTime(), nullable=True),
+            sa.Column("lecturer_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["lecturer_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_assignments_id", "assignments", ["id"])
+        op.create_index("ix_assignments_title", "assignments", ["title"])
+
+    if "submissions" not in existing:
+        op.create_table(
+            "submissions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("file_path", sa.String(), nullable=False),
+            sa.Column("submitted_at", sa.DateTime(), nullable=True),
+            sa.Column("grade", sa.Integer(), nullable=True),
+            sa.Column("feedback", sa.String(), nullable=True),
+            sa.Column("student_id", sa.Integer(), nullable=True),
+            sa.Column("assignment_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["assignment_id"], ["assignments.id"]),
+            sa.ForeignKeyConstraint(["student_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_submissions_id", "submissions", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("submissions")
+    op.drop_table("assignments")
+    op.drop_table("users")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
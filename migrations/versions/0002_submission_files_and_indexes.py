@@ -0,0 +1,86 @@
+"""submission file metadata, unique upsert key and foreign-key indexes
+
+- submissions.file_size / checksum / original_filename (streamed,
+  content-addressed uploads)
+- one submission per (student_id, assignment_id); duplicates left over
+  from the old racy upsert are removed first, keeping the newest row
+- indexes for the foreign keys we filter on:
+    assignments (lecturer_id, id)  -> lecturer listing
+    submissions (assignment_id, id) -> per-assignment listing
+    submissions (student_id, assignment_id) unique -> "my submission" + upsert
+  plus assignments.deadline and submissions.checksum
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    names = {i["name"] for i in inspector.get_indexes(table)}
+    names |= {u["name"] for u in inspector.get_unique_constraints(table)}
+    return names
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = _columns("submissions")
+    with op.batch_alter_table("submissions") as batch:
+        if "file_size" not in columns:
+            batch.add_column(sa.Column("file_size", sa.Integer(), nullable=True))
+        if "checksum" not in columns:
+            batch.add_column(sa.Column("checksum", sa.String(), nullable=True))
+        if "original_filename" not in columns:
+            batch.add_column(sa.Column("original_filename", sa.String(), nullable=True))
+
+    op.execute(
+        "DELETE FROM submissions WHERE id NOT IN "
+        "(SELECT MAX(id) FROM submissions GROUP BY student_id, assignment_id)"
+    )
+
+    indexes = _indexes("submissions")
+    if "uq_submissions_student_assignment" not in indexes:
+        with op.batch_alter_table("submissions") as batch:
+            batch.create_unique_constraint(
+                "uq_submissions_student_assignment", ["student_id", "assignment_id"]
+            )
+    if "ix_submissions_assignment_id_id" not in indexes:
+        op.create_index("ix_submissions_assignment_id_id", "submissions", ["assignment_id", "id"])
+    if "ix_submissions_checksum" not in indexes:
+        op.create_index("ix_submissions_checksum", "submissions", ["checksum"])
+
+    indexes = _indexes("assignments")
+    if "ix_assignments_lecturer_id_id" not in indexes:
+        op.create_index("ix_assignments_lecturer_id_id", "assignments", ["lecturer_id", "id"])
+    if "ix_assignments_deadline" not in indexes:
+        op.create_index("ix_assignments_deadline", "assignments", ["deadline"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_assignments_deadline", table_name="assignments")
+    op.drop_index("ix_assignments_lecturer_id_id", table_name="assignments")
+    op.drop_index("ix_submissions_checksum", table_name="submissions")
+    op.drop_index("ix_submissions_assignment_id_id", table_name="submissions")
+    with op.batch_alter_table("submissions") as batch:
+        batch.drop_constraint("uq_submissions_student_assignment", type_="unique")
+        batch.drop_column("original_filename")
+        batch.drop_column("checksum")
+        batch.drop_column("file_size")
@@ -0,0 +1,72 @@
+"""assignment_stats and assignment_grade_counts for the gradebook
+
+Summary tables maintained on every submission write (see app/gradebook.py),
+filled here from the submissions that already exist.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "assignment_stats",
+        sa.Column("assignment_id", sa.Integer(), nullable=False),
+        sa.Column("submission_count", sa.Integer(), nullable=False),
+        sa.Column("graded_count", sa.Integer(), nullable=False),
+        sa.Column("grade_sum", sa.Integer(), nullable=False),
+        sa.Column("late_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["assignment_id"], ["assignments.id"]),
+        sa.PrimaryKeyConstraint("assignment_id"),
+    )
+    op.create_table(
+        "assignment_grade_counts",
+        sa.Column("assignment_id", sa.Integer(), nullable=False),
+        sa.Column("grade", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["assignment_id"], ["assignments.id"]),
+        sa.PrimaryKeyConstraint("assignment_id", "grade"),
+    )
+
+    # Backfill from what is already there. late_count is left at 0: deadlines
+    # are still in local time here and submitted_at is UTC, so 0008 counts
+    # it once the deadlines are in UTC too.
+    op.execute(
+        """
+        INSERT INTO assignment_stats (assignment_id, submission_count, graded_count, grade_sum, late_count, updated_at)
+        SELECT assignment_id, COUNT(*), COUNT(grade), COALESCE(SUM(grade), 0), 0, CURRENT_TIMESTAMP
+        FROM submissions
+        WHERE assignment_id IS NOT NULL
+        GROUP BY assignment_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO assignment_grade_counts (assignment_id, grade, count)
+        SELECT assignment_id, grade, COUNT(*)
+        FROM submissions
+        WHERE grade IS NOT NULL AND assignment_id IS NOT NULL
+        GROUP BY assignment_id, grade
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("assignment_grade_counts")
+    op.drop_table("assignment_stats")
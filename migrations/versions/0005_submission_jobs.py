@@ -0,0 +1,60 @@
+"""background processing: submission_jobs and submissions.processing_status
+
+Submissions get processing_status / content_type, filled in by the
+background pipeline (app/jobs.py) whose queue is the submission_jobs table.
+Existing submissions are marked "done"; they are not re-processed.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("submissions") as batch:
+        batch.add_column(sa.Column("processing_status", sa.String(), nullable=False, server_default="done"))
+        batch.add_column(sa.Column("content_type", sa.String(), nullable=True))
+    # The server default only fills existing rows; new ones get theirs from the app
+    with op.batch_alter_table("submissions") as batch:
+        batch.alter_column("processing_status", server_default=None)
+
+    op.create_table(
+        "submission_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("submission_id", sa.Integer(), nullable=False),
+        sa.Column("checksum", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["submission_id"], ["submissions.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_submission_jobs_status_run_after", "submission_jobs", ["status", "run_after"])
+    op.create_index("ix_submission_jobs_submission_id", "submission_jobs", ["submission_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_submission_jobs_submission_id", table_name="submission_jobs")
+    op.drop_index("ix_submission_jobs_status_run_after", table_name="submission_jobs")
+    op.drop_table("submission_jobs")
+    with op.batch_alter_table("submissions") as batch:
+        batch.drop_column("content_type")
+        batch.drop_column("processing_status")
@@ -0,0 +1,41 @@
+"""compression at rest: submissions.stored_size and content_encoding
+
+stored_size is how many bytes a submission's blob takes on disk and
+content_encoding says whether (and how) it is compressed (see app/storage.py).
+Existing blobs are uncompressed, so they get stored_size = file_size.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("submissions") as batch:
+        batch.add_column(sa.Column("stored_size", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("content_encoding", sa.String(), nullable=True))
+    op.execute("UPDATE submissions SET stored_size = file_size")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Compressed blobs would be unreadable without content_encoding
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT 1 FROM submissions WHERE content_encoding IS NOT NULL LIMIT 1")).first():
+        raise RuntimeError("Some submissions are stored compressed; decompress them before downgrading")
+    with op.batch_alter_table("submissions") as batch:
+        batch.drop_column("content_encoding")
+        batch.drop_column("stored_size")
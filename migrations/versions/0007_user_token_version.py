@@ -0,0 +1,41 @@
+"""token revocation: users.token_version and tokens_revoked_at
+
+Access tokens carry the token_version they were issued with; bumping it
+revokes them (see app/revocation.py). tokens_revoked_at is when that last
+happened, so workers only load recent revocations.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("tokens_revoked_at", sa.DateTime(), nullable=True))
+        batch.create_index("ix_users_tokens_revoked_at", ["tokens_revoked_at"])
+    # The server default only fills existing rows; new ones get theirs from the app
+    with op.batch_alter_table("users") as batch:
+        batch.alter_column("token_version", server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("users") as batch:
+        batch.drop_index("ix_users_tokens_revoked_at")
+        batch.drop_column("tokens_revoked_at")
+        batch.drop_column("token_version")
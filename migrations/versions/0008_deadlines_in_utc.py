@@ -0,0 +1,76 @@
+"""assignments.deadline in UTC, and the gradebook's late counts recounted
+
+Deadlines used to be stored in the server's local time while submitted_at
+is UTC, so late_count compared two clocks. Existing deadlines are converted
+from the local time of the machine running this migration (run it where the
+app runs), and late_count is counted again from the submissions. The
+assignment lists' cache versions are bumped so no client keeps a copy with
+the old deadlines (it would otherwise get 304s for it).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 09:00:00
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Typed, so SQLite hands back datetimes rather than strings
+assignments = sa.table("assignments", sa.column("id", sa.Integer()), sa.column("deadline", sa.DateTime()))
+cache_versions = sa.table(
+    "cache_versions",
+    sa.column("scope", sa.String()),
+    sa.column("version", sa.Integer()),
+    sa.column("updated_at", sa.DateTime()),
+)
+
+RECOUNT_LATE = """
+    UPDATE assignment_stats SET late_count = (
+        SELECT COUNT(*)
+        FROM submissions s JOIN assignments a ON a.id = s.assignment_id
+        WHERE s.assignment_id = assignment_stats.assignment_id
+          AND a.deadline IS NOT NULL AND s.submitted_at > a.deadline
+    )
+"""
+
+
+def _convert_deadlines(convert) -> None:
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(assignments.c.id, assignments.c.deadline).where(assignments.c.deadline.isnot(None)))
+    for assignment_id, deadline in rows.all():
+        conn.execute(
+            assignments.update().where(assignments.c.id == assignment_id).values(deadline=convert(deadline))
+        )
+
+
+def _bump_assignment_lists() -> None:
+    # Same scopes as etags.assignments_scope(); every list that shows a deadline
+    op.execute(
+        cache_versions.update()
+        .where(sa.or_(cache_versions.c.scope == "assignments", cache_versions.c.scope.like("assignments:lecturer:%")))
+        .values(version=cache_versions.c.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Naive local -> naive UTC (astimezone() on a naive datetime assumes local time)
+    _convert_deadlines(lambda deadline: deadline.astimezone(timezone.utc).replace(tzinfo=None))
+    op.execute(RECOUNT_LATE)
+    _bump_assignment_lists()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert_deadlines(lambda deadline: deadline.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None))
+    _bump_assignment_lists()
@@ -0,0 +1,85 @@
+# tests/conftest.py
+
+# The tests run the real app against a throwaway SQLite database. The
+# environment has to be set before anything imports app.settings.
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+_workdir = tempfile.mkdtemp(prefix="app-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'tests.db')}"
+os.environ["JWT_SECRET_KEY"] = "tests"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["USER_CACHE_MAX_SIZE"] = "0"  # query budgets count the user lookup every time
+os.chdir(_workdir)  # uploads/ ends up in the temp dir
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database, revocation
+from app.main import create_app
+
+
+@pytest.fixture
+def db_schema():
+    # Empty tables for every test; revocations are per user id, so forget those too
+    database.Base.metadata.drop_all(database.engine)
+    database.Base.metadata.create_all(database.engine)
+    revocation.revocations.replace({}, time.time())
+
+
+@pytest.fixture
+def client(db_schema):
+    with TestClient(create_app()) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client):
+    def login(email: str, password: str = "secret1") -> dict:
+        response = client.post("/login/token", data={"username": email, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture
+def lecturer(client, login):
+    client.post("/users/", json={"email": "lecturer@example.com", "password": "secret1", "role": "lecturer"})
+    return login("lecturer@example.com")
+
+
+@pytest.fixture
+def student(client, login):
+    client.post("/users/", json={"email": "s0@example.com", "password": "secret1", "reg_number": "R0000"})
+    return login("s0@example.com")
+
+
+@pytest.fixture
+def processed(client):
+    # Waits for the background job (see jobs.py) to finish with a submission;
+    # until then it still changes underneath the test
+    def processed(headers: dict, assignment_id: int, timeout: float = 5) -> dict:
+        give_up_at = time.monotonic() + timeout
+        while True:
+            submission = client.get(f"/submissions/me/{assignment_id}", headers=headers).json()
+            if submission["processing_status"] != "pending" or time.monotonic() > give_up_at:
+                return submission
+            time.sleep(0.02)
+    return processed
+
+
+@pytest.fixture
+def open_assignment(client, lecturer):
+    # An assignment due tomorrow, owned by `headers` (the lecturer fixture by default)
+    def open_assignment(title: str = "A1", headers: dict = None) -> int:
+        deadline = datetime.now(timezone.utc) + timedelta(days=1)
+        response = client.post(
+            "/assignments/", json={"title": title, "description": "d", "deadline": deadline.isoformat()},
+            headers=headers or lecturer,
+        )
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return open_assignment
@@ -0,0 +1,51 @@
+# tests/test_accounts.py
+
+from app import accounts, auth, crud, revocation
+
+
+def test_deactivated_student_loses_their_tokens(client, student):
+    assert accounts.set_active("s0@example.com", False) is not None
+
+    assert client.get("/assignments/", headers=student).status_code == 401
+    assert client.get("/users/me", headers=student).status_code == 401
+    response = client.post("/login/token", data={"username": "s0@example.com", "password": "secret1"})
+    assert response.status_code == 403
+
+
+def test_reactivated_student_logs_in_again(client, student, login):
+    accounts.set_active("s0@example.com", False)
+    accounts.set_active("s0@example.com", True)
+
+    # Their old token stays revoked; a new login works
+    assert client.get("/assignments/", headers=student).status_code == 401
+    assert client.get("/users/me", headers=login("s0@example.com")).json()["is_active"] is True
+
+
+def test_deactivation_reaches_other_workers_on_reload(client, student, monkeypatch):
+    # Another worker: nothing revoked locally until it reloads from the table
+    fresh = revocation.RevocationSet()
+    monkeypatch.setattr(revocation, "revocations", fresh)
+    monkeypatch.setattr(auth, "revocations", fresh)
+    monkeypatch.setattr(crud, "revocations", revocation.RevocationSet())
+    accounts.set_active("s0@example.com", False)
+
+    assert client.get("/assignments/", headers=student).status_code == 200
+    revocation.refresh()
+    assert client.get("/assignments/", headers=student).status_code == 401
+
+
+def test_deactivation_is_not_in_the_api(client, lecturer, student):
+    # Anyone can sign up as a lecturer, so lecturers can't lock students out
+    user_id = client.get("/users/me", headers=student).json()["id"]
+    assert client.post(f"/users/{user_id}/deactivate", headers=lecturer).status_code == 404
+    assert accounts.set_active("nobody@example.com", False) is None
+
+
+def test_password_change_revokes_old_tokens(client, student):
+    response = client.put(
+        "/users/me/password", json={"current_password": "secret1", "new_password": "secret2"}, headers=student
+    )
+    assert response.status_code == 200
+    assert client.get("/assignments/", headers=student).status_code == 401
+    new = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/assignments/", headers=new).status_code == 200
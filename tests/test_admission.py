@@ -0,0 +1,96 @@
+# tests/test_admission.py
+
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from jose import jwt
+
+from app import admission
+from app.settings import settings
+
+
+def test_turned_away_upload_keeps_its_arrival_time(client, lecturer, student, login, monkeypatch):
+    deadline = datetime.now(timezone.utc) + timedelta(seconds=1)
+    assignment_id = client.post(
+        "/assignments/", json={"title": "A1", "description": "d", "deadline": deadline.isoformat()}, headers=lecturer
+    ).json()["id"]
+    upload = lambda headers: client.post(
+        f"/submissions/{assignment_id}", files={"file": ("a.txt", b"work")}, headers=headers
+    )
+
+    # Every slot busy: the upload waits, times out, and is told to retry
+    controller = admission.upload_admission
+    monkeypatch.setattr(controller, "queue_timeout", 0.05)
+    monkeypatch.setattr(controller.backend, "_running", controller.max_concurrent)
+    response = upload(student)
+    assert response.status_code == 503
+    token = response.headers["Upload-Arrival"]
+    monkeypatch.setattr(controller.backend, "_running", 0)
+
+    time.sleep(max((deadline - datetime.now(timezone.utc)).total_seconds(), 0) + 0.1)
+    assert upload(student).status_code == 400
+    # Only for the student it was issued to
+    client.post("/users/", json={"email": "s1@example.com", "password": "secret1", "reg_number": "R0001"})
+    assert upload({**login("s1@example.com"), "Upload-Arrival": token}).status_code == 400
+    assert upload({**student, "Upload-Arrival": token}).status_code == 200
+
+
+def claims(token: str) -> dict:
+    return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def test_retrying_does_not_extend_the_arrival_token(client, lecturer, student, monkeypatch):
+    deadline = datetime.now(timezone.utc) + timedelta(hours=1)
+    assignment_id = client.post(
+        "/assignments/", json={"title": "A1", "description": "d", "deadline": deadline.isoformat()}, headers=lecturer
+    ).json()["id"]
+    upload = lambda headers: client.post(
+        f"/submissions/{assignment_id}", files={"file": ("a.txt", b"work")}, headers=headers
+    )
+    controller = admission.upload_admission
+    monkeypatch.setattr(controller, "queue_timeout", 0.01)
+    monkeypatch.setattr(controller.backend, "_running", controller.max_concurrent)
+
+    first = upload(student).headers["Upload-Arrival"]
+    time.sleep(1.1)  # exp has one-second resolution
+    token = first
+    for _ in range(3):
+        response = upload({**student, "Upload-Arrival": token})
+        assert response.status_code == 503
+        token = response.headers["Upload-Arrival"]
+    # Same arrival time, and still the expiry of the first 503
+    assert claims(token)["arr"] == claims(first)["arr"]
+    assert claims(token)["exp"] == claims(first)["exp"]
+
+    # Over the student's own limit isn't our wait, so no token for it
+    user_key = admission._user_key({"headers": [(b"authorization", student["Authorization"].encode())]})
+    monkeypatch.setattr(controller.backend, "_users", {user_key: controller.max_per_user})
+    response = upload(student)
+    assert response.status_code == 429
+    assert "Upload-Arrival" not in response.headers
+
+
+def request_with(arrived_at: float, admitted_at: float):
+    return SimpleNamespace(scope={"state": {"arrived_at": arrived_at, "admitted_at": admitted_at}})
+
+
+def test_body_must_arrive_within_the_grace_period():
+    grace = settings.UPLOAD_BODY_GRACE_SECONDS
+    now = time.time()
+    deadline = datetime.utcfromtimestamp(now - grace - 60)
+    # Started before the deadline, still trickling in long after it
+    assert admission.received_too_late(request_with(now - grace - 120, now - grace - 120), deadline)
+    # Queued past the deadline, then read promptly: time in the queue doesn't count
+    assert not admission.received_too_late(request_with(now - grace - 120, now - 1), deadline)
+    assert not admission.received_too_late(request_with(now, now), None)
+
+
+def test_queueing_never_takes_an_upload_past_the_hard_cap():
+    cap = settings.UPLOAD_ARRIVAL_TOKEN_SECONDS + settings.UPLOAD_BODY_GRACE_SECONDS
+    now = time.time()
+    # Arrived in time, got a slot long after the deadline (a retry chain)
+    deadline = datetime.utcfromtimestamp(now - cap - 1)
+    assert admission.received_too_late(request_with(now - cap - 60, now), deadline)
+    deadline = datetime.utcfromtimestamp(now - cap + 10)
+    assert not admission.received_too_late(request_with(now - cap, now), deadline)
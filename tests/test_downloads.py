@@ -0,0 +1,54 @@
+# tests/test_downloads.py
+
+import pytest
+
+from app import database, models
+from app.settings import settings
+
+
+@pytest.fixture
+def submission_id(client, lecturer, student, open_assignment):
+    return client.post(
+        f"/submissions/{open_assignment()}", files={"file": ("essay.txt", b"my essay")}, headers=student
+    ).json()["id"]
+
+
+def test_only_the_student_and_their_lecturer_can_download(client, lecturer, student, login, submission_id):
+    url = f"/submissions/{submission_id}/file"
+    for headers in (student, lecturer):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert response.content == b"my essay"
+        assert 'filename="essay.txt"' in response.headers["content-disposition"]
+
+    client.post("/users/", json={"email": "s1@example.com", "password": "secret1", "reg_number": "R0001"})
+    client.post("/users/", json={"email": "other@example.com", "password": "secret1", "role": "lecturer"})
+    assert client.get(url, headers=login("s1@example.com")).status_code == 403
+    assert client.get(url, headers=login("other@example.com")).status_code == 403
+    assert client.get(url).status_code == 401
+    assert client.get("/submissions/999/file", headers=lecturer).status_code == 404
+    # uploads/ isn't served as static files any more
+    with database.SessionLocal() as db:
+        file_path = db.get(models.Submission, submission_id).file_path
+    assert client.get("/" + file_path).status_code == 404
+
+
+def test_ranges_are_supported(client, student, submission_id):
+    response = client.get(f"/submissions/{submission_id}/file", headers={**student, "Range": "bytes=3-7"})
+    assert response.status_code == 206
+    assert response.content == b"essay"
+
+
+def test_stored_path_outside_uploads_is_refused(client, student, submission_id):
+    with database.SessionLocal() as db:
+        db.get(models.Submission, submission_id).file_path = "uploads/../../../etc/passwd"
+        db.commit()
+    assert client.get(f"/submissions/{submission_id}/file", headers=student).status_code == 404
+
+
+def test_proxy_sends_the_file_after_the_check(client, student, submission_id, monkeypatch):
+    monkeypatch.setattr(settings, "FILE_DELIVERY", "x-accel")
+    response = client.get(f"/submissions/{submission_id}/file", headers=student)
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["X-Accel-Redirect"].startswith(settings.FILE_ACCEL_PREFIX + "blobs/")
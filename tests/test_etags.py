@@ -0,0 +1,41 @@
+# tests/test_etags.py
+
+
+def test_assignment_list_is_revalidated(client, lecturer, student, open_assignment):
+    open_assignment()
+    first = client.get("/assignments/", headers=student)
+    etag = first.headers["ETag"]
+
+    again = client.get("/assignments/", headers={**student, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    since = client.get("/assignments/", headers={**student, "If-Modified-Since": first.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+    # Another page is another body, so another tag
+    assert client.get("/assignments/?limit=1", headers=student).headers["ETag"] != etag
+    # A new assignment invalidates everyone's copy
+    open_assignment("A2")
+    changed = client.get("/assignments/", headers={**student, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+    assert changed.headers["ETag"] != etag
+
+
+def test_own_submission_changes_when_graded(client, lecturer, student, processed, open_assignment):
+    assignment_id = open_assignment()
+    submission_id = client.post(
+        f"/submissions/{assignment_id}", files={"file": ("a.txt", b"work")}, headers=student
+    ).json()["id"]
+    # Finishing the processing job bumps the version too
+    assert processed(student, assignment_id)["processing_status"] == "done"
+    etag = client.get(f"/submissions/me/{assignment_id}", headers=student).headers["ETag"]
+    assert client.get(
+        f"/submissions/me/{assignment_id}", headers={**student, "If-None-Match": etag}
+    ).status_code == 304
+
+    client.put(f"/submissions/{submission_id}/grade", json={"grade": 80, "feedback": "ok"}, headers=lecturer)
+    response = client.get(f"/submissions/me/{assignment_id}", headers={**student, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["grade"] == 80
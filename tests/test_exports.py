@@ -0,0 +1,62 @@
+# tests/test_exports.py
+
+import csv
+import io
+import os
+import zipfile
+
+from app import database, models
+
+
+def test_export_zips_every_submission_with_a_manifest(client, lecturer, login, open_assignment):
+    assignment_id = open_assignment()
+    files = {"CS/2024/001": ("essay.PDF", b"%PDF-1.4 first"), "CS/2024/002": ("notes.txt", b"second " * 1000)}
+    submission_ids = []
+    for i, (reg_number, upload) in enumerate(files.items()):
+        email = f"s{i}@example.com"
+        client.post("/users/", json={"email": email, "password": "secret1", "reg_number": reg_number})
+        submission_ids.append(client.post(
+            f"/submissions/{assignment_id}", files={"file": upload}, headers=login(email)
+        ).json()["id"])
+    client.put(f"/submissions/{submission_ids[0]}/grade", json={"grade": 75, "feedback": "fine"}, headers=lecturer)
+
+    response = client.get(f"/submissions/assignment/{assignment_id}/export", headers=lecturer)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == ["CS_2024_001.pdf", "CS_2024_002.txt", "manifest.csv"]
+    assert archive.read("CS_2024_001.pdf") == b"%PDF-1.4 first"
+    assert archive.getinfo("CS_2024_001.pdf").compress_type == zipfile.ZIP_STORED
+    assert archive.read("CS_2024_002.txt") == b"second " * 1000
+
+    manifest = {row["reg_number"]: row for row in csv.DictReader(io.StringIO(archive.read("manifest.csv").decode()))}
+    assert manifest["CS/2024/001"]["grade"] == "75"
+    assert manifest["CS/2024/001"]["original_filename"] == "essay.PDF"
+    assert manifest["CS/2024/002"]["grade"] == ""
+    assert {row["status"] for row in manifest.values()} == {"ok"}
+
+
+def test_export_lists_missing_files_and_carries_on(client, lecturer, student, open_assignment):
+    assignment_id = open_assignment()
+    submission_id = client.post(
+        f"/submissions/{assignment_id}", files={"file": ("a.txt", b"gone")}, headers=student
+    ).json()["id"]
+    with database.SessionLocal() as db:
+        db.get(models.Submission, submission_id).file_path = os.path.join("uploads", "nowhere.txt")
+        db.commit()
+
+    archive = zipfile.ZipFile(io.BytesIO(
+        client.get(f"/submissions/assignment/{assignment_id}/export", headers=lecturer).content
+    ))
+    assert archive.namelist() == ["manifest.csv"]
+    [row] = csv.DictReader(io.StringIO(archive.read("manifest.csv").decode()))
+    assert (row["file"], row["status"]) == ("", "missing")
+
+
+def test_only_the_owning_lecturer_can_export(client, lecturer, student, login, open_assignment):
+    assignment_id = open_assignment()
+    client.post("/users/", json={"email": "other@example.com", "password": "secret1", "role": "lecturer"})
+    url = f"/submissions/assignment/{assignment_id}/export"
+    assert client.get(url, headers=login("other@example.com")).status_code == 403
+    assert client.get(url, headers=student).status_code == 403
+    assert client.get("/submissions/assignment/999/export", headers=lecturer).status_code == 404
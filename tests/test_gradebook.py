@@ -0,0 +1,119 @@
+# tests/test_gradebook.py
+
+# Late counts compare submitted_at and the deadline on one clock (UTC),
+# whatever time zone the server runs in.
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, insert, select
+
+from app import crud, database, etags, models
+from app.settings import settings
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+@pytest.fixture(params=["America/New_York", "Asia/Tokyo"])
+def server_tz(request):
+    old = os.environ.get("TZ")
+    os.environ["TZ"] = request.param
+    time.tzset()
+    yield request.param
+    if old is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = old
+    time.tzset()
+
+
+def create_assignment(client, lecturer, deadline):
+    response = client.post(
+        "/assignments/", json={"title": "A1", "description": "d", "deadline": deadline.isoformat()}, headers=lecturer
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def late_count(client, lecturer, assignment_id):
+    return client.get(f"/assignments/{assignment_id}/stats", headers=lecturer).json()["late_count"]
+
+
+def test_upload_before_the_deadline_is_not_late(client, server_tz, lecturer, student):
+    # A deadline without an offset is the server's local time
+    assignment = create_assignment(client, lecturer, datetime.now() + timedelta(hours=1))
+
+    response = client.post(f"/submissions/{assignment['id']}", files={"file": ("a.txt", b"work")}, headers=student)
+    assert response.status_code == 200, response.text
+    assert late_count(client, lecturer, assignment["id"]) == 0
+
+    with database.SessionLocal() as db:
+        crud.rebuild_assignment_stats(db, assignment["id"])
+    assert late_count(client, lecturer, assignment["id"]) == 0
+
+
+def test_upload_after_the_deadline_is_rejected(client, server_tz, lecturer, student):
+    assignment = create_assignment(client, lecturer, datetime.now() - timedelta(minutes=1))
+
+    response = client.post(f"/submissions/{assignment['id']}", files={"file": ("a.txt", b"work")}, headers=student)
+    assert response.status_code == 400
+
+
+def test_rebuild_counts_late_submissions_in_utc(client, server_tz, lecturer, login):
+    deadline = datetime.now() - timedelta(hours=1)
+    assignment = create_assignment(client, lecturer, deadline)
+    deadline_utc = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # Rows written around crud (e.g. a bulk load): one on time, one late
+    with database.SessionLocal() as db:
+        for i, submitted_at in enumerate([deadline_utc - timedelta(minutes=5), deadline_utc + timedelta(minutes=5)]):
+            client.post("/users/", json={"email": f"s{i}@example.com", "password": "secret1", "reg_number": f"R{i}"})
+            student_id = crud.get_user_by_email(db, f"s{i}@example.com").id
+            db.add(models.Submission(
+                file_path=f"f{i}", student_id=student_id, assignment_id=assignment["id"], submitted_at=submitted_at,
+            ))
+        db.commit()
+        crud.rebuild_assignment_stats(db, assignment["id"])
+
+    assert late_count(client, lecturer, assignment["id"]) == 1
+
+
+def test_deadlines_are_stored_and_sent_in_utc(client, lecturer, student):
+    deadline = datetime(2030, 6, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+    assignment = create_assignment(client, lecturer, deadline)
+    assert assignment["deadline"] == "2030-06-01T10:00:00Z"
+    # The fast list path says the same
+    listed = client.get("/assignments/", headers=student).json()
+    assert [a["deadline"] for a in listed] == ["2030-06-01T10:00:00Z"]
+
+
+def test_migration_converts_deadlines_and_invalidates_cached_lists(server_tz, tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS)
+    command.upgrade(config, "0007")
+
+    local_deadline = datetime(2030, 6, 1, 12, 0)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User).values(id=1, email="l@example.com", hashed_password="x", role="lecturer"))
+        conn.execute(insert(models.Assignment).values(
+            id=1, title="A1", description="d", deadline=local_deadline, lecturer_id=1
+        ))
+        conn.execute(insert(models.CacheVersion), [
+            {"scope": scope, "version": 3} for scope in (*etags.assignment_scopes(1), etags.submission_scope(2, 1))
+        ])
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        deadline = conn.execute(select(models.Assignment.deadline)).scalar_one()
+        versions = dict(conn.execute(select(models.CacheVersion.scope, models.CacheVersion.version)).all())
+    engine.dispose()
+    assert deadline == local_deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    # Clients holding a list with the old deadlines don't get a 304 for it
+    assert versions == {"assignments": 4, "assignments:lecturer:1": 4, "submission:2:1": 3}
@@ -0,0 +1,46 @@
+# tests/test_grading.py
+
+
+def test_bulk_grading_reports_each_item(client, lecturer, login, open_assignment):
+    mine = open_assignment()
+    client.post("/users/", json={"email": "other@example.com", "password": "secret1", "role": "lecturer"})
+    other_lecturer = login("other@example.com")
+    theirs = open_assignment("B1", headers=other_lecturer)
+
+    submission_ids = []
+    for i in range(3):
+        email = f"s{i}@example.com"
+        client.post("/users/", json={"email": email, "password": "secret1", "reg_number": f"R000{i}"})
+        submission_ids.append(client.post(
+            f"/submissions/{mine if i < 2 else theirs}", files={"file": ("a.txt", b"work")}, headers=login(email)
+        ).json()["id"])
+
+    response = client.put("/submissions/grades", json={"items": [
+        {"submission_id": submission_ids[0], "grade": 70, "feedback": "ok"},
+        {"submission_id": submission_ids[1], "grade": 90, "feedback": "good"},
+        {"submission_id": submission_ids[0], "grade": 10, "feedback": "again"},
+        {"submission_id": submission_ids[2], "grade": 0, "feedback": "not mine"},
+        {"submission_id": 999, "grade": 50, "feedback": "nobody"},
+    ]}, headers=lecturer)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["graded"], body["failed"]) == (2, 3)
+    assert [item["status"] for item in body["results"]] == ["graded", "graded", "duplicate", "forbidden", "not_found"]
+
+    grades = {s["id"]: s["grade"] for s in client.get(f"/submissions/assignment/{mine}", headers=lecturer).json()}
+    assert grades == {submission_ids[0]: 70, submission_ids[1]: 90}
+    assert client.get(f"/submissions/assignment/{theirs}", headers=other_lecturer).json()[0]["grade"] is None
+    # The gradebook moved with them
+    stats = client.get(f"/assignments/{mine}/stats", headers=lecturer).json()
+    assert (stats["graded_count"], stats["ungraded_count"], stats["mean"]) == (2, 0, 80)
+
+
+def test_students_cannot_bulk_grade(client, lecturer, student, open_assignment):
+    submission_id = client.post(
+        f"/submissions/{open_assignment()}", files={"file": ("a.txt", b"work")}, headers=student
+    ).json()["id"]
+    response = client.put(
+        "/submissions/grades", json={"items": [{"submission_id": submission_id, "grade": 100, "feedback": "me"}]},
+        headers=student,
+    )
+    assert response.status_code == 403
@@ -0,0 +1,115 @@
+# tests/test_jobs.py
+
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import database, jobs, models, storage
+from app.settings import settings
+
+
+def test_uploads_are_processed_in_the_background(client, lecturer, student, processed):
+    deadline = datetime.now(timezone.utc) + timedelta(days=1)
+    assignment_id = client.post(
+        "/assignments/", json={"title": "A1", "description": "d", "deadline": deadline.isoformat()}, headers=lecturer
+    ).json()["id"]
+    response = client.post(
+        f"/submissions/{assignment_id}", files={"file": ("essay.txt", b"%PDF-1.4 really a pdf")}, headers=student
+    )
+    # The upload answers before the processing is done
+    assert response.json()["processing_status"] == "pending"
+
+    submission = processed(student, assignment_id)
+    assert submission["processing_status"] == "done"
+    # From its first bytes, not its name
+    assert submission["content_type"] == "application/pdf"
+
+
+@pytest.fixture
+def job(db_schema):
+    # A submission with a stored file and its queued job, without the app (so no runner)
+    path = f"upload-{uuid.uuid4().hex}.txt"
+    with open(path, "wb") as f:
+        f.write(uuid.uuid4().bytes)
+    stored = storage._store_file(path, "a.txt")
+    with database.SessionLocal() as db:
+        student = models.User(email="s0@example.com", hashed_password="x", role=models.UserRole.student)
+        db.add(student)
+        db.flush()
+        submission = models.Submission(
+            file_path=stored.path, file_size=stored.size, checksum=stored.checksum,
+            student_id=student.id, assignment_id=1, submitted_at=datetime.utcnow(), processing_status="pending",
+        )
+        db.add(submission)
+        db.flush()
+        db.add(models.SubmissionJob(submission_id=submission.id, checksum=stored.checksum))
+        db.commit()
+        return submission.id
+
+
+def job_state(submission_id: int):
+    with database.SessionLocal() as db:
+        job = db.query(models.SubmissionJob).filter_by(submission_id=submission_id).one()
+        submission = db.get(models.Submission, submission_id)
+        return job, submission.processing_status
+
+
+def test_a_job_is_claimed_once(job):
+    [job_id] = jobs.claim_jobs(10)
+    assert jobs.claim_jobs(10) == []
+    jobs.run_job(job_id)
+    finished, status = job_state(job)
+    assert (finished.status, finished.attempts, status) == ("done", 1, "done")
+
+
+def test_a_dead_workers_job_is_claimed_again(job, monkeypatch):
+    [job_id] = jobs.claim_jobs(10)
+    monkeypatch.setattr(settings, "JOB_TIMEOUT_SECONDS", -1)
+    assert jobs.claim_jobs(10) == [job_id]
+
+
+def test_failing_steps_are_retried_with_backoff_then_given_up(job, monkeypatch):
+    def flaky(submission):
+        raise OSError("disk went away")
+    monkeypatch.setattr(jobs, "PIPELINE", [flaky])
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 2)
+
+    jobs.run_job(*jobs.claim_jobs(10))
+    retry, status = job_state(job)
+    assert (retry.status, status) == ("pending", "pending")
+    assert "disk went away" in retry.last_error
+    assert retry.run_after > datetime.utcnow() + timedelta(seconds=settings.JOB_RETRY_DELAY_SECONDS - 1)
+    # Not due yet
+    assert jobs.claim_jobs(10) == []
+
+    with database.SessionLocal() as db:
+        db.get(models.SubmissionJob, retry.id).run_after = datetime.utcnow()
+        db.commit()
+    jobs.run_job(*jobs.claim_jobs(10))
+    failed, status = job_state(job)
+    assert (failed.status, failed.attempts, status) == ("failed", 2, "failed")
+
+
+def test_a_corrupt_file_fails_straight_away(job):
+    with database.SessionLocal() as db:
+        path = db.get(models.Submission, job).file_path
+    with open(path, "ab") as f:
+        f.write(b"tampered")
+
+    jobs.run_job(*jobs.claim_jobs(10))
+    failed, status = job_state(job)
+    assert (failed.status, failed.attempts, status) == ("failed", 1, "failed")
+    assert failed.last_error.startswith("PermanentJobError")
+
+
+def test_a_replaced_file_makes_the_job_stale(job):
+    with database.SessionLocal() as db:
+        db.get(models.Submission, job).checksum = "resubmitted"
+        db.commit()
+
+    jobs.run_job(*jobs.claim_jobs(10))
+    finished, status = job_state(job)
+    # Done without touching the submission; the new file has its own job
+    assert (finished.status, status) == ("done", "pending")
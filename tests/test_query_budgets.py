@@ -0,0 +1,8 @@
+# tests/test_query_budgets.py
+
+from benchmarks import query_budgets
+
+
+def test_hot_endpoints_stay_within_their_query_budgets(db_schema, capsys):
+    failed = query_budgets.main()
+    assert failed == 0, capsys.readouterr().out
@@ -0,0 +1,8 @@
+# tests/test_serialization.py
+
+from benchmarks import serialization
+
+
+def test_fast_list_path_matches_the_response_model():
+    # main() asserts the two paths produce identical JSON
+    serialization.main(["--rows", "50", "--repeat", "1"])
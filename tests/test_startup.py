@@ -0,0 +1,39 @@
+# tests/test_startup.py
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app import database, revocation
+from app.main import create_app
+
+
+def test_revoked_tokens_load_even_if_the_warm_up_fails(db_schema, monkeypatch):
+    async def broken_warm_up(size):
+        raise OSError("database is still starting")
+    monkeypatch.setattr(database, "warm_up", broken_warm_up)
+    fresh = revocation.RevocationSet()
+    monkeypatch.setattr(revocation, "revocations", fresh)
+
+    with TestClient(create_app()) as client:
+        assert client.get("/").status_code == 200
+        assert fresh.loaded_at is not None
+
+
+def test_a_failed_first_load_is_retried_straight_away(db_schema, monkeypatch):
+    monkeypatch.setattr(revocation, "revocations", revocation.RevocationSet())
+    load = revocation.refresh
+    calls = []
+
+    def flaky_refresh():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise OSError("database is still starting")
+        return load()
+    monkeypatch.setattr(revocation, "refresh", flaky_refresh)
+
+    with TestClient(create_app()):
+        time.sleep(1.5)
+    # Not REVOCATION_REFRESH_SECONDS later
+    assert len(calls) == 2
+    assert revocation.revocations.loaded_at is not None
@@ -0,0 +1,102 @@
+# tests/test_storage.py
+
+import gzip
+import hashlib
+import os
+import uuid
+
+from app import database, models, storage
+from app.settings import settings
+
+
+def submit(client, headers, assignment_id: int, content: bytes, filename: str = "work.txt"):
+    response = client.post(f"/submissions/{assignment_id}", files={"file": (filename, content)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def stored_paths(*submission_ids):
+    with database.SessionLocal() as db:
+        return [db.get(models.Submission, id).file_path for id in submission_ids]
+
+
+def collect_garbage(grace_seconds: int = 0):
+    with database.SessionLocal() as db:
+        return storage.collect_garbage(db, grace_seconds=grace_seconds)
+
+
+def test_identical_files_are_stored_once(client, lecturer, student, login, open_assignment):
+    content = uuid.uuid4().bytes * 100
+    first = submit(client, student, open_assignment("A1"), content)
+    second = submit(client, student, open_assignment("A2"), content)
+
+    first_path, second_path = stored_paths(first["id"], second["id"])
+    assert first_path == second_path == storage.blob_path(first["checksum"])
+    assert first["checksum"] == second["checksum"]
+    with open(first_path, "rb") as f:
+        assert f.read() == content
+
+
+def test_gc_removes_only_unreferenced_blobs(client, lecturer, student, open_assignment):
+    shared = uuid.uuid4().bytes * 100
+    assignment_ids = [open_assignment("A1"), open_assignment("A2")]
+    shared_checksum = [submit(client, student, id, shared) for id in assignment_ids][0]["checksum"]
+    replaced = submit(client, student, assignment_ids[0], uuid.uuid4().bytes)
+    [replaced_path] = stored_paths(replaced["id"])
+
+    # Resubmitting leaves the first version's blob behind...
+    resubmitted = submit(client, student, assignment_ids[0], uuid.uuid4().bytes)
+    assert resubmitted["id"] == replaced["id"]
+    [current_path] = stored_paths(resubmitted["id"])
+    # ...but it is only collected once it's older than the grace period
+    assert collect_garbage(grace_seconds=3600) == 0
+    assert os.path.exists(replaced_path)
+
+    assert collect_garbage() >= 1
+    assert not os.path.exists(replaced_path)
+    # Still referenced: the resubmission, and the file in the other assignment
+    assert os.path.exists(current_path)
+    assert os.path.exists(storage.blob_path(shared_checksum))
+
+
+def test_compressible_files_are_stored_compressed(client, lecturer, student, monkeypatch, open_assignment):
+    monkeypatch.setattr(settings, "STORAGE_COMPRESSION", "gzip")
+    text = b"the same line again\n" * 2000 + uuid.uuid4().bytes
+    submission = submit(client, student, open_assignment(), text, "notes.txt")
+    [path] = stored_paths(submission["id"])
+    assert path == storage.blob_path(submission["checksum"], "gzip")
+    # Size and checksum are still those of what was uploaded
+    assert submission["file_size"] == len(text)
+    assert submission["checksum"] == hashlib.sha256(text).hexdigest()
+    assert os.path.getsize(path) < len(text) / 10
+    with gzip.open(path) as f:
+        assert f.read() == text
+
+    url = f"/submissions/{submission['id']}/file"
+    # Sent as stored to clients that take gzip...
+    response = client.get(url, headers={**student, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == text  # (decoded by the client)
+    # ...and decompressed for anyone else
+    response = client.get(url, headers={**student, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Content-Length"] == str(len(text))
+    assert response.content == text
+
+
+def test_compressed_formats_and_incompressible_files_are_stored_as_is(client, lecturer, student, monkeypatch, open_assignment):
+    monkeypatch.setattr(settings, "STORAGE_COMPRESSION", "gzip")
+    assignment_ids = [open_assignment("A1"), open_assignment("A2")]
+    # By name, even though the contents would compress
+    pdf = submit(client, student, assignment_ids[0], b"%PDF-1.4 " + b"a" * 5000, "essay.pdf")
+    # Compressing didn't pay off
+    noise = submit(client, student, assignment_ids[1], os.urandom(5000), "data.bin")
+    for submission in (pdf, noise):
+        [path] = stored_paths(submission["id"])
+        assert path == storage.blob_path(submission["checksum"])
+
+
+def test_compression_is_off_by_default(client, lecturer, student, open_assignment):
+    submission = submit(client, student, open_assignment(), b"plain text " * 1000, "notes.txt")
+    [path] = stored_paths(submission["id"])
+    assert path == storage.blob_path(submission["checksum"])
@@ -0,0 +1,115 @@
+# tests/test_uploads.py
+
+import asyncio
+import fcntl
+
+from app import storage, uploads
+from app.settings import settings
+
+
+def test_oversized_upload_is_refused_before_the_route_runs(client, lecturer, student, monkeypatch, open_assignment):
+    assignment_id = open_assignment()
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 1000)
+    stored = []
+    monkeypatch.setattr(storage, "store_stream", lambda *args, **kwargs: stored.append(args))
+
+    too_big = b"x" * (1000 + uploads.MULTIPART_OVERHEAD_BYTES + 1)
+    # From the Content-Length...
+    response = client.post(f"/submissions/{assignment_id}", files={"file": ("a.txt", too_big)}, headers=student)
+    assert response.status_code == 413
+    # ...and, without one, by counting the chunks
+    response = client.post(
+        f"/submissions/{assignment_id}",
+        content=iter([b"x" * 4096] * 20),
+        headers={**student, "Content-Type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
+    assert stored == []
+
+
+def test_body_limit_stops_reading_at_the_limit():
+    chunks = [{"type": "http.request", "body": b"x" * 1000, "more_body": True}] * 100
+    pulled = []
+    sent = []
+
+    async def receive():
+        pulled.append(1)
+        return chunks[len(pulled) - 1]
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        # Reads everything, like the multipart parser
+        while (await receive())["more_body"]:
+            pass
+
+    middleware = uploads.UploadSizeLimitMiddleware(app, max_bytes=0)
+    scope = {"type": "http", "method": "POST", "path": "/submissions/1", "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    assert len(pulled) == uploads.MULTIPART_OVERHEAD_BYTES // 1000 + 1
+
+
+def test_resumable_upload(client, lecturer, student, login, open_assignment):
+    assignment_id = open_assignment()
+    data = b"0123456789" * 100
+    upload_id = client.post(
+        "/submissions/uploads/",
+        json={"assignment_id": assignment_id, "filename": "big.txt", "total_size": len(data)},
+        headers=student,
+    ).json()["upload_id"]
+    put = lambda offset, body: client.put(
+        f"/submissions/uploads/{upload_id}", params={"offset": offset}, content=body, headers=student
+    )
+
+    assert put(0, data[:400]).headers["Upload-Offset"] == "400"
+    # A resend of the same chunk is told where to carry on from
+    response = put(0, data[:400])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "400"
+    # Going past the declared size is cut off again
+    assert put(400, data[400:] + b"extra").status_code == 413
+    assert client.get(f"/submissions/uploads/{upload_id}", headers=student).headers["Upload-Offset"] == "400"
+    assert client.post(f"/submissions/uploads/{upload_id}/complete", headers=student).status_code == 409
+
+    # Nobody else can see or finish it
+    client.post("/users/", json={"email": "s1@example.com", "password": "secret1", "reg_number": "R0001"})
+    assert client.get(f"/submissions/uploads/{upload_id}", headers=login("s1@example.com")).status_code == 404
+
+    assert put(400, data[400:]).headers["Upload-Offset"] == str(len(data))
+    response = client.post(f"/submissions/uploads/{upload_id}/complete", headers=student)
+    assert response.status_code == 200, response.text
+    submission_id = response.json()["id"]
+    assert client.get(f"/submissions/{submission_id}/file", headers=student).content == data
+    # The session is gone once it has become a submission
+    assert client.get(f"/submissions/uploads/{upload_id}", headers=student).status_code == 404
+    assert put(len(data), b"more").status_code == 404
+
+
+def test_chunk_waits_for_another_workers_lock():
+    session = uploads._create_session(user_id=1, assignment_id=1, filename="a.txt", total_size=10)
+    part_path = uploads.session_data_path(session)
+
+    async def append_while_locked():
+        # Another worker holds the .part file (flock locks are per open file)
+        other = open(part_path, "ab")
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)
+        other.write(b"12345")
+        other.flush()
+
+        async def chunk():
+            yield b"abcde"
+
+        append = asyncio.create_task(uploads.append_chunk(session, 0, chunk()))
+        await asyncio.sleep(0.2)
+        assert not append.done()
+        other.close()
+        return await asyncio.gather(append, return_exceptions=True)
+
+    [result] = asyncio.run(append_while_locked())
+    # It checked the offset only after the other write had landed
+    assert result.status_code == 409
+    assert result.headers["Upload-Offset"] == "5"
+    uploads._discard_session(session["upload_id"])